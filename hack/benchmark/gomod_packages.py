@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Compare _create_packages_from_parsed_data with the previous linear-scan implementation.
+
+Generates a synthetic `go list -deps` output resembling a large project (thousands of modules,
+tens of thousands of packages, some of them in nested modules and without module info) and
+times both implementations.
+
+Usage: hack/benchmark/gomod_packages.py [--modules N] [--packages N] [--repeat N]
+"""
+import argparse
+import random
+import timeit
+from pathlib import Path
+from typing import Iterable, Union
+
+from hermeto.core.package_managers.gomod import (
+    Module,
+    Package,
+    ParsedModule,
+    ParsedPackage,
+    StandardPackage,
+    _create_packages_from_parsed_data,
+)
+
+
+def create_packages_linear_scan(
+    modules: list[Module], parsed_packages: Iterable[ParsedPackage]
+) -> list[Union[Package, StandardPackage]]:
+    """Create packages, scanning all the modules for each one without module info (previous version)."""
+    indexed_modules = {module.original_name: module for module in modules}
+
+    def _create_package(package: ParsedPackage) -> Union[Package, StandardPackage]:
+        if package.standard:
+            return StandardPackage(name=package.import_path)
+
+        if package.module is None:
+            path = Path(package.import_path)
+            matched_name = max(
+                filter(path.is_relative_to, indexed_modules.keys()), key=len, default=None
+            )
+            if not matched_name:
+                raise RuntimeError("Package parent module was not found")
+            module = indexed_modules[matched_name]
+        else:
+            module = indexed_modules[package.module.path]
+
+        relative_path = Path(package.import_path).relative_to(module.original_name)
+        return Package(relative_path=str(relative_path).removeprefix("."), module=module)
+
+    return [_create_package(package) for package in parsed_packages]
+
+
+def generate_data(n_modules: int, n_packages: int) -> tuple[list[Module], list[ParsedPackage]]:
+    """Generate modules (some nested in others) and packages, a third of them without module info."""
+    rng = random.Random(42)
+    names = []
+    for i in range(n_modules):
+        if names and rng.random() < 0.2:
+            # a nested module, e.g. k8s.io/kubernetes/staging/src/k8s.io/api
+            names.append(f"{rng.choice(names)}/staging/mod{i}")
+        else:
+            names.append(f"github.com/org{i % 100}/repo{i}")
+    modules = [
+        Module(name=name, original_name=name, real_path=name, version="v1.0.0") for name in names
+    ]
+
+    packages = []
+    for i in range(n_packages):
+        if rng.random() < 0.1:
+            packages.append(ParsedPackage(import_path=f"std/pkg{i}", standard=True))
+            continue
+
+        name = rng.choice(names)
+        import_path = f"{name}/pkg/sub{i}"
+        if rng.random() < 0.3:
+            packages.append(ParsedPackage(import_path=import_path))
+        else:
+            module = ParsedModule(path=name, version="v1.0.0")
+            packages.append(ParsedPackage(import_path=import_path, module=module))
+    return modules, packages
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", type=int, default=1_000)
+    parser.add_argument("--packages", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    modules, packages = generate_data(args.modules, args.packages)
+    if _create_packages_from_parsed_data(modules, packages) != create_packages_linear_scan(
+        modules, packages
+    ):
+        raise SystemExit("The implementations produced different results!")
+
+    for name, func in [
+        ("linear scan", create_packages_linear_scan),
+        ("trie", _create_packages_from_parsed_data),
+    ]:
+        best = min(timeit.repeat(lambda: func(modules, packages), number=1, repeat=args.repeat))
+        print(f"{name:>12}: {best:.3f}s ({args.modules} modules, {args.packages} packages)")
+
+
+if __name__ == "__main__":
+    main()
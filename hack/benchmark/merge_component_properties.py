@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""Compare merge_component_properties with the previous sort + groupby implementation.
+
+Generates components resembling a large npm monorepo (many workspaces sharing most of their
+dependencies, with differing dev/bundled flags) and times both implementations.
+
+Usage: hack/benchmark/merge_component_properties.py [--components N] [--unique N] [--repeat N]
+"""
+import argparse
+import random
+import timeit
+from functools import reduce
+from itertools import groupby
+from typing import Iterable
+
+from hermeto.core.models.property_semantics import Property, PropertyEnum, PropertySet
+from hermeto.core.models.sbom import Component, merge_component_properties
+
+
+def merge_component_properties_groupby(components: Iterable[Component]) -> list[Component]:
+    """Sort and de-duplicate components while merging their `properties` (previous version)."""
+    components = sorted(components, key=Component.key)
+    grouped_components = groupby(components, key=Component.key)
+
+    def merge_component_group(component_group: Iterable[Component]) -> Component:
+        component_group = list(component_group)
+        prop_sets = (PropertySet.from_properties(c.properties) for c in component_group)
+        merged_prop_set = reduce(PropertySet.merge, prop_sets)
+        component = component_group[0]
+        return component.model_copy(update={"properties": merged_prop_set.to_properties()})
+
+    return [merge_component_group(g) for _, g in grouped_components]
+
+
+def generate_components(n_components: int, n_unique: int) -> list[Component]:
+    """Generate components with n_unique distinct purls and randomly assigned npm flags."""
+    rng = random.Random(42)
+    flags = [
+        [],
+        [Property(name=PropertyEnum.PROP_CDX_NPM_PACKAGE_DEVELOPMENT, value="true")],
+        [Property(name=PropertyEnum.PROP_CDX_NPM_PACKAGE_BUNDLED, value="true")],
+    ]
+    components = []
+    for _ in range(n_components):
+        i = rng.randrange(n_unique)
+        components.append(
+            Component(
+                name=f"pkg{i}",
+                version="1.0.0",
+                purl=f"pkg:npm/pkg{i}@1.0.0",
+                properties=list(rng.choice(flags)),
+            )
+        )
+    return components
+
+
+def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--components", type=int, default=80_000)
+    parser.add_argument("--unique", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    components = generate_components(args.components, args.unique)
+    if merge_component_properties(components) != merge_component_properties_groupby(components):
+        raise SystemExit("The implementations produced different results!")
+
+    for name, func in [
+        ("groupby", merge_component_properties_groupby),
+        ("dict-indexed", merge_component_properties),
+    ]:
+        best = min(timeit.repeat(lambda: func(components), number=1, repeat=args.repeat))
+        print(f"{name:>12}: {best:.3f}s ({args.components} components, {args.unique} unique)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import hashlib
+import logging
+import os
+import threading
+from collections import defaultdict
+from os import PathLike
+from pathlib import Path
+from typing import Iterable, Mapping, NamedTuple, Optional, Union
+
+from hermeto.core.checksum import SUPPORTED_ALGORITHMS, ChecksumInfo
+from hermeto.core.config import get_config
+from hermeto.core.utils import get_cache_dir, link_or_copy_file
+
+log = logging.getLogger(__name__)
+
+READ_CHUNK = 1048576
+
+
+class CacheStats(NamedTuple):
+    """Number of artifacts in the cache and the disk space they take up (in bytes)."""
+
+    artifacts: int
+    size: int
+
+
+class _Artifact(NamedTuple):
+    paths: list[Path]
+    size: int
+    last_used: float
+
+
+class ArtifactCache:
+    """A content-addressed store of downloaded artifacts, shared across runs.
+
+    Artifacts are stored as <root>/<algorithm>/<digest[:2]>/<digest>. An artifact that is known
+    by several checksums (e.g. both sha256 and sha512) is stored once and hard-linked under all
+    of them. Artifacts get materialized in the output directory as hard links where possible.
+
+    The modification time of an artifact is bumped on every use, the least recently used
+    artifacts are the first to go when the cache gets pruned.
+    """
+
+    def __init__(self, root: Path) -> None:
+        """Initialize an ArtifactCache rooted at the specified directory."""
+        self.root = root
+
+    @classmethod
+    def default(cls) -> "ArtifactCache":
+        """Return the cache located in the application's global cache directory."""
+        return cls(get_cache_dir() / "artifacts")
+
+    @classmethod
+    def from_config(cls) -> Optional["ArtifactCache"]:
+        """Return the default cache if enabled in the configuration, None otherwise."""
+        if not get_config().artifact_cache_enabled:
+            return None
+        return cls.default()
+
+    def _entry_path(self, checksum: ChecksumInfo) -> Optional[Path]:
+        algorithm, digest = checksum.algorithm.lower(), checksum.hexdigest.lower()
+        if algorithm not in SUPPORTED_ALGORITHMS or not digest.isalnum():
+            return None
+        return self.root.joinpath(algorithm, digest[:2], digest)
+
+    def lookup(self, checksums: Iterable[ChecksumInfo]) -> Optional[Path]:
+        """Return the path of a cached artifact matching any of the checksums, if there is one."""
+        for checksum in checksums:
+            entry = self._entry_path(checksum)
+            if entry is not None and entry.is_file():
+                return entry
+        return None
+
+    def restore(
+        self,
+        checksums: Iterable[ChecksumInfo],
+        to_path: Union[str, PathLike[str]],
+        size: Optional[int] = None,
+    ) -> bool:
+        """Materialize a cached artifact matching any of the checksums at the specified path.
+
+        The artifact is verified against its checksum (and size, if known) first. Artifacts are
+        hard-linked into output directories, where they can get modified, an entry that no
+        longer matches is removed from the cache.
+
+        :param size: the expected size of the artifact in bytes
+        :return: True on cache hit, False otherwise
+        """
+        for checksum in checksums:
+            entry = self._entry_path(checksum)
+            if entry is None or not entry.is_file():
+                continue
+
+            if not self._matches(entry, checksum, size):
+                log.warning("Removing %s from the artifact cache, it doesn't match", entry.name)
+                entry.unlink(missing_ok=True)
+                continue
+
+            dest = Path(to_path)
+            dest.unlink(missing_ok=True)
+            link_or_copy_file(entry, dest)
+            # mark the entry as recently used
+            os.utime(entry)
+            log.debug("Restored %s from the artifact cache", dest.name)
+            return True
+
+        return False
+
+    @staticmethod
+    def _matches(entry: Path, checksum: ChecksumInfo, size: Optional[int]) -> bool:
+        if size is not None and entry.stat().st_size != size:
+            return False
+        algorithm = checksum.algorithm.lower()
+        return _get_hexdigest(entry, algorithm) == checksum.hexdigest.lower()
+
+    def store(
+        self,
+        file_path: Union[str, PathLike[str]],
+        checksums: Iterable[ChecksumInfo],
+        hexdigests: Optional[Mapping[str, str]] = None,
+    ) -> None:
+        """Add a downloaded file to the cache under all the checksums it matches.
+
+        Files which don't match any of the checksums are not stored, an unverified file
+        must never end up under a checksum key.
+
+        :param hexdigests: the digests of the file by algorithm, if already computed (e.g. while
+            downloading it), only the missing ones get computed by reading the file
+        """
+        file_path = Path(file_path)
+        digests_by_algorithm = {
+            algorithm.lower(): digest.lower() for algorithm, digest in (hexdigests or {}).items()
+        }
+
+        for checksum in checksums:
+            entry = self._entry_path(checksum)
+            if entry is None or entry.exists():
+                continue
+
+            algorithm = checksum.algorithm.lower()
+            if algorithm not in digests_by_algorithm:
+                digests_by_algorithm[algorithm] = _get_hexdigest(file_path, algorithm)
+
+            if digests_by_algorithm[algorithm] != checksum.hexdigest.lower():
+                log.debug("%s does not match %s, not caching it", file_path.name, checksum)
+                continue
+
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            # the same artifact may be stored from several threads at once, don't let them clash
+            tmp_entry = entry.with_name(f"{entry.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_entry.unlink(missing_ok=True)
+            try:
+                link_or_copy_file(file_path, tmp_entry)
+                # if another thread stored the entry in the meantime, this replaces it with
+                # a file of the same content
+                os.replace(tmp_entry, entry)
+            finally:
+                tmp_entry.unlink(missing_ok=True)
+            log.debug("Stored %s in the artifact cache as %s", file_path.name, checksum)
+
+    def _artifacts(self) -> list[_Artifact]:
+        """Collect all cached artifacts, entries hard-linked to each other count as one."""
+        paths_by_inode: dict[tuple[int, int], list[Path]] = defaultdict(list)
+        stats: dict[tuple[int, int], os.stat_result] = {}
+
+        if not self.root.exists():
+            return []
+
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = Path(dirpath, filename)
+                st = path.stat()
+                inode = (st.st_dev, st.st_ino)
+                paths_by_inode[inode].append(path)
+                stats[inode] = st
+
+        return [
+            _Artifact(paths, stats[inode].st_size, stats[inode].st_mtime)
+            for inode, paths in paths_by_inode.items()
+        ]
+
+    def stats(self) -> CacheStats:
+        """Return the number of cached artifacts and their total size."""
+        artifacts = self._artifacts()
+        return CacheStats(len(artifacts), sum(artifact.size for artifact in artifacts))
+
+    def prune(self, max_size: int) -> CacheStats:
+        """Evict the least recently used artifacts until the cache fits into max_size bytes.
+
+        :return: the number of evicted artifacts and the disk space freed up
+        """
+        artifacts = sorted(self._artifacts(), key=lambda artifact: artifact.last_used)
+        total_size = sum(artifact.size for artifact in artifacts)
+        evicted, freed = 0, 0
+
+        for artifact in artifacts:
+            if total_size <= max_size:
+                break
+            for path in artifact.paths:
+                path.unlink(missing_ok=True)
+            total_size -= artifact.size
+            evicted += 1
+            freed += artifact.size
+
+        if evicted:
+            log.info("Evicted %d artifact(s) (%d bytes) from the artifact cache", evicted, freed)
+        return CacheStats(evicted, freed)
+
+
+def _get_hexdigest(file_path: Path, algorithm: str) -> str:
+    hasher = hashlib.new(algorithm)
+    with open(file_path, "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            hasher.update(chunk)
+    return hasher.hexdigest()
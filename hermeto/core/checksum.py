@@ -4,7 +4,7 @@ import logging
 from collections import defaultdict
 from os import PathLike
 from pathlib import Path
-from typing import Iterable, NamedTuple, Optional, Union
+from typing import Callable, Iterable, NamedTuple, Optional, Union
 
 from hermeto.core.errors import PackageRejected
 
@@ -66,11 +66,62 @@ def must_match_any_checksum(
     """
     filename = Path(file_path).name
     log.info("Verifying checksums of %s", filename)
+    _must_match_any(
+        filename,
+        expected_checksums,
+        lambda algorithm: _get_hexdigest(file_path, algorithm, chunk_size),
+    )
+
+
+class IncrementalChecksums:
+    """Compute the checksums of a file chunk by chunk, e.g. while it is being downloaded.
+
+    Only the algorithms of the expected checksums are computed, so that the file can be
+    verified without reading it again once all the chunks have been processed.
+    """
+
+    def __init__(self, expected_checksums: Iterable[ChecksumInfo]) -> None:
+        """Initialize hashers for all the supported algorithms of the expected checksums."""
+        self.expected_checksums = list(expected_checksums)
+        self._hashers = {
+            algorithm: hashlib.new(algorithm)
+            for algorithm in _group_by_algorithm(self.expected_checksums)
+            if algorithm in SUPPORTED_ALGORITHMS
+        }
+
+    def update(self, chunk: bytes) -> None:
+        """Feed the next chunk of the file to all the hashers."""
+        for hasher in self._hashers.values():
+            hasher.update(chunk)
+
+    def hexdigests(self) -> dict[str, str]:
+        """Return the digests of the processed chunks by algorithm."""
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in self._hashers.items()}
+
+    def must_match_any(self, filename: str) -> None:
+        """Verify that the processed chunks match at least one of the expected checksums.
+
+        :param filename: the name of the file, for logging and error messages
+        :raises PackageRejected: if none of the expected checksums matched
+        """
+        log.info("Verifying checksums of %s", filename)
+        _must_match_any(
+            filename,
+            self.expected_checksums,
+            lambda algorithm: self._hashers[algorithm].hexdigest(),
+        )
+
+
+def _must_match_any(
+    filename: str,
+    expected_checksums: Iterable[ChecksumInfo],
+    get_hexdigest: Callable[[str], str],
+) -> None:
     mismatches: list[_MismatchInfo] = []
 
     for algorithm, expected_digests in _group_by_algorithm(expected_checksums).items():
         if algorithm in SUPPORTED_ALGORITHMS:
-            digest = _get_hexdigest(file_path, algorithm, chunk_size)
+            digest = get_hexdigest(algorithm)
         else:
             digest = None
 
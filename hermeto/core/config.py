@@ -19,15 +19,44 @@ class Config(BaseModel, extra="forbid"):
     default_environment_variables: dict = {}
     gomod_download_max_tries: int = 5
     gomod_strict_vendor: bool = True
+    # don't fetch the tags of the source repository if it already has some
+    gomod_skip_tag_fetch: bool = False
     subprocess_timeout: int = 3600
 
     # matches aiohttp default timeout:
     # https://docs.aiohttp.org/en/v3.9.5/client_reference.html#aiohttp.ClientSession
     requests_timeout: int = 300
     concurrency_limit: int = 5
+    # limits of concurrent downloads from specific hosts (within concurrency_limit)
+    download_concurrency_limits: dict[str, int] = {}
+    # adapt the concurrent downloads from each host to its responses
+    adaptive_download_concurrency: bool = False
+    # the number of concurrent git fetches from a single host (within concurrency_limit)
+    git_concurrency_limit_per_host: int = 4
 
     allow_yarnberry_processing: bool = True
 
+    # run the requested package managers concurrently instead of one after another
+    parallel_package_managers: bool = False
+
+    # reuse the output of package managers whose inputs didn't change since the previous run
+    incremental_fetch: bool = False
+
+    # reuse downloaded artifacts across runs, keyed by their checksums
+    artifact_cache_enabled: bool = False
+    artifact_cache_max_size: int = 10 * 1024**3
+
+    # keep bare mirrors of VCS dependencies and fetch them incrementally
+    git_mirror_cache_enabled: bool = False
+    # produce tarballs of VCS dependencies with git archive (without the .git directory)
+    git_archive_tarballs: bool = False
+    # keep the downloaded Go modules and serve them to the go command as a local module proxy
+    gomod_cache_enabled: bool = False
+
+    # keep PyPI project pages on disk and revalidate them with conditional requests
+    pypi_index_cache_enabled: bool = False
+    pypi_index_cache_offline: bool = False
+
     @model_validator(mode="before")
     @classmethod
     def _print_deprecation_warning(cls, data: Any) -> Any:
@@ -0,0 +1,200 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Mapping, Optional
+
+from hermeto.core.config import get_config
+
+log = logging.getLogger(__name__)
+
+# Responses which mean that the host wants us to slow down
+THROTTLING_STATUSES = frozenset({429, 503})
+
+# In adaptive mode, each host starts with this many concurrent downloads (at most)
+ADAPTIVE_INITIAL_LIMIT = 2
+
+# A response which takes this many times longer than the fastest one (and at least
+# LATENCY_MIN_INCREASE seconds longer) means that the host is getting overloaded
+LATENCY_FACTOR = 4
+LATENCY_MIN_INCREASE = 0.5
+
+
+@dataclass
+class HostStats:
+    """Metrics of the downloads from a single host."""
+
+    files: int = 0
+    bytes: int = 0
+    throttled: int = 0
+    # the time between the first download starting and the last one finishing
+    first_start: Optional[float] = None
+    last_end: Optional[float] = None
+    max_concurrency: int = 0
+
+    @property
+    def duration(self) -> float:
+        """Return the time spent downloading from the host, in seconds."""
+        if self.first_start is None or self.last_end is None:
+            return 0.0
+        return self.last_end - self.first_start
+
+    @property
+    def throughput(self) -> float:
+        """Return the achieved throughput in bytes per second."""
+        return self.bytes / self.duration if self.duration else 0.0
+
+
+@dataclass
+class _HostState:
+    max_limit: int
+    limit: float
+    # slow start: the limit grows exponentially up to this threshold, then linearly
+    threshold: float
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+    active: int = 0
+    min_latency: Optional[float] = None
+    last_decrease: float = float("-inf")
+    stats: HostStats = field(default_factory=HostStats)
+
+
+class HostLimits:
+    """Limits of concurrent downloads from each host.
+
+    Every host is limited to its configured limit, or to the default limit if it has none.
+
+    In adaptive mode, the configured limit is only the upper bound. The actual limit follows
+    AIMD (additive increase, multiplicative decrease), as TCP congestion control does: it grows
+    with every successful response and gets halved when the host signals that it is overloaded,
+    i.e. responds with 429/503, fails to respond, or responds much slower than it used to. Only
+    requests which started after the previous decrease can cause another one, so a burst of
+    failures from the same congestion halves the limit just once.
+
+    Also collects per-host metrics. Must only be used from a single event loop.
+    """
+
+    def __init__(
+        self,
+        default_limit: int,
+        per_host: Optional[Mapping[str, int]] = None,
+        adaptive: bool = False,
+    ) -> None:
+        """Initialize HostLimits.
+
+        :param default_limit: the limit of hosts which are not in per_host
+        :param per_host: limits of specific hosts
+        :param adaptive: adapt the limits to the responses of each host
+        """
+        self.default_limit = default_limit
+        self.per_host = dict(per_host or {})
+        self.adaptive = adaptive
+        self._hosts: dict[str, _HostState] = {}
+
+    @classmethod
+    def from_config(cls) -> "HostLimits":
+        """Create the limits configured for the application."""
+        config = get_config()
+        return cls(
+            config.concurrency_limit,
+            config.download_concurrency_limits,
+            config.adaptive_download_concurrency,
+        )
+
+    def _state(self, host: str) -> _HostState:
+        if host not in self._hosts:
+            max_limit = max(1, self.per_host.get(host, self.default_limit))
+            limit = min(ADAPTIVE_INITIAL_LIMIT, max_limit) if self.adaptive else max_limit
+            self._hosts[host] = _HostState(max_limit=max_limit, limit=limit, threshold=max_limit)
+        return self._hosts[host]
+
+    def limit(self, host: str) -> int:
+        """Return the current limit of concurrent downloads from a host."""
+        return int(self._state(host).limit)
+
+    @asynccontextmanager
+    async def acquire(self, host: str) -> AsyncIterator[None]:
+        """Wait until a download from the host is allowed, hold the slot until the context exits."""
+        state = self._state(host)
+        async with state.condition:
+            await state.condition.wait_for(lambda: state.active < int(state.limit))
+            state.active += 1
+
+        stats = state.stats
+        stats.max_concurrency = max(stats.max_concurrency, state.active)
+        if stats.first_start is None:
+            stats.first_start = time.monotonic()
+        try:
+            yield
+        finally:
+            stats.last_end = time.monotonic()
+            async with state.condition:
+                state.active -= 1
+                state.condition.notify_all()
+
+    def record_download(self, host: str, size: int) -> None:
+        """Record a successfully downloaded file."""
+        stats = self._state(host).stats
+        stats.files += 1
+        stats.bytes += size
+
+    async def on_response(
+        self, host: str, status: Optional[int], started: float, latency: float
+    ) -> None:
+        """Adapt the limit of a host to a response (or a failure to respond).
+
+        :param host: the host the request was sent to
+        :param status: the status of the response, None if the request failed
+        :param started: when the request started (time.monotonic())
+        :param latency: how long it took to get the response headers (or the failure)
+        """
+        state = self._state(host)
+        throttled = status is None or status in THROTTLING_STATUSES
+        if status in THROTTLING_STATUSES:
+            state.stats.throttled += 1
+        if not self.adaptive:
+            return
+
+        if not throttled:
+            if state.min_latency is None or latency < state.min_latency:
+                state.min_latency = latency
+            elif latency > max(
+                state.min_latency * LATENCY_FACTOR, state.min_latency + LATENCY_MIN_INCREASE
+            ):
+                throttled = True
+
+        async with state.condition:
+            if throttled:
+                if started > state.last_decrease:
+                    state.limit = state.threshold = max(1.0, state.limit / 2)
+                    state.last_decrease = time.monotonic()
+                    log.debug("Decreased the concurrency limit of %s to %d", host, state.limit)
+            elif state.limit < state.threshold:
+                # +1 per response doubles the limit with every round of requests
+                state.limit = min(state.limit + 1, state.max_limit)
+            else:
+                # +1 per round of requests
+                state.limit = min(state.limit + 1 / state.limit, state.max_limit)
+            state.condition.notify_all()
+
+    def stats(self) -> dict[str, HostStats]:
+        """Return the metrics of the downloads from each host."""
+        return {host: state.stats for host, state in self._hosts.items()}
+
+    def log_stats(self) -> None:
+        """Log the achieved throughput of each host."""
+        for host, stats in sorted(self.stats().items()):
+            if not stats.files:
+                continue
+            log.info(
+                "Downloaded %d files (%.1f MiB) from %s in %.1fs: %.2f MiB/s, "
+                "up to %d concurrent downloads, throttled %d times",
+                stats.files,
+                stats.bytes / 1024**2,
+                host or "<unknown host>",
+                stats.duration,
+                stats.throughput / 1024**2,
+                stats.max_concurrency,
+                stats.throttled,
+            )
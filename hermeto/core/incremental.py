@@ -0,0 +1,308 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import Counter
+from pathlib import Path, PurePosixPath
+from typing import Any, Iterable, Optional
+
+import git
+import pydantic
+
+from hermeto import APP_NAME
+from hermeto.core.config import get_config
+from hermeto.core.errors import NotAGitRepo, UnsupportedFeature
+from hermeto.core.models.input import PackageInput, PackageManagerType, Request
+from hermeto.core.models.output import RequestOutput
+from hermeto.core.scm import get_repo_id
+
+log = logging.getLogger(__name__)
+
+READ_CHUNK = 1048576
+
+# Files (matched from the right, like PurePath.match) which determine the output of each
+# package manager. Explicitly specified lockfiles and requirements files are added on top.
+_INPUT_FILE_PATTERNS: dict[PackageManagerType, tuple[str, ...]] = {
+    "bundler": ("Gemfile", "Gemfile.lock", "gems.rb", "gems.locked", "*.gemspec", ".bundle/config"),
+    "cargo": ("Cargo.toml", "Cargo.lock", ".cargo/config", ".cargo/config.toml"),
+    "generic": ("artifacts.lock.yaml",),
+    # the gomod SBOM lists the packages imported by the sources, any .go file matters
+    "gomod": ("go.mod", "go.sum", "go.work", "go.work.sum", "*.go", "vendor/modules.txt"),
+    "npm": ("package.json", "package-lock.json", "npm-shrinkwrap.json"),
+    "pip": ("requirements*.txt", "setup.py", "setup.cfg", "pyproject.toml", "PKG-INFO"),
+    "rpm": ("rpms.lock.yaml",),
+    "yarn": (
+        "package.json",
+        "yarn.lock",
+        ".yarnrc",
+        ".yarnrc.yml",
+        ".yarn/releases/*",
+        ".yarn/plugins/*",
+        ".yarn/plugins/*/*",
+        ".yarn/patches/*",
+    ),
+}
+
+# Subdirectories of the output directory which each package manager writes into. Some of them
+# are written by more than one package manager (pip vendors the crates of its Rust dependencies
+# the same way cargo does).
+_DEPS_DIRS: dict[PackageManagerType, tuple[str, ...]] = {
+    "bundler": ("deps/bundler", "bundler/config_override"),
+    "cargo": ("deps/cargo",),
+    "generic": ("deps/generic",),
+    "gomod": ("deps/gomod",),
+    "npm": ("deps/npm",),
+    "pip": ("deps/pip", "deps/cargo", ".cargo"),
+    "rpm": ("deps/rpm",),
+    "yarn": ("deps/yarn", "deps/yarn-classic"),
+}
+
+_SKIPPED_DIRS = {".git", "node_modules"}
+
+
+class _Fragment(pydantic.BaseModel):
+    """The recorded result of running one package manager."""
+
+    inputs_digest: str
+    # relative path in the output directory -> sha256 hexdigest
+    deps_files: dict[str, str]
+    output: RequestOutput
+
+
+class FetchManifest:
+    """Digests of the inputs of each package manager and the outputs they produced.
+
+    The manifest lives in the output directory, one fragment per package manager. When the inputs
+    of a package manager (its lockfiles, package options, flags, configuration, the version of
+    the application and the origin and commit of the source repository) are the same as in the
+    previous run and the downloaded files are still intact, the previous output gets reused
+    instead of fetching everything again.
+
+    The versions of Go modules also depend on the tags of the source repository. The gomod output
+    is only reused if the tags are not fetched from the remote (see gomod_skip_tag_fetch), the
+    local tags are then part of the inputs.
+    """
+
+    def __init__(self, request: Request) -> None:
+        """Initialize the manifest for the specified request.
+
+        The digests of the inputs are computed right away, before any package manager gets a
+        chance to modify the source directory.
+        """
+        self.source_dir = request.source_dir.path
+        self.output_dir = request.output_dir.path
+        self.root = self.output_dir / f".{APP_NAME}-manifest"
+
+        requested_types = sorted(set(pkg.type for pkg in request.packages))
+        # the SBOM components of the main packages refer to the commit of the source repository
+        try:
+            self._repo_id: Optional[list[str]] = list(get_repo_id(self.source_dir))
+        except (NotAGitRepo, UnsupportedFeature):
+            self._repo_id = None
+        # None means that the output of the package manager must not be reused
+        self._inputs_digests: dict[PackageManagerType, Optional[str]] = {
+            type_: self._compute_inputs_digest(request, type_) for type_ in requested_types
+        }
+        # Directories written by more than one of the requested package managers. Their content
+        # can't be attributed to a single package manager, so neither of them gets reused. The
+        # directories are cleared only once, before the first of them runs, so that they don't
+        # remove each other's files.
+        owners = Counter(deps_dir for type_ in requested_types for deps_dir in _DEPS_DIRS[type_])
+        self._shared_deps_dirs = {deps_dir for deps_dir, count in owners.items() if count > 1}
+        self._cleared_deps_dirs: set[str] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, request: Request) -> Optional["FetchManifest"]:
+        """Return the manifest for the request if enabled in the configuration, None otherwise."""
+        if not get_config().incremental_fetch:
+            return None
+        return cls(request)
+
+    def _fragment_path(self, type_: PackageManagerType) -> Path:
+        return self.root / f"{type_}.json"
+
+    def _compute_inputs_digest(self, request: Request, type_: PackageManagerType) -> Optional[str]:
+        packages = [pkg for pkg in request.packages if pkg.type == type_]
+        hasher = hashlib.sha256()
+
+        def update(data: Any) -> None:
+            hasher.update(json.dumps(data, sort_keys=True).encode())
+
+        if type_ == "gomod":
+            tags = self._get_local_tags()
+            if tags is None:
+                return None
+            update(tags)
+
+        update(importlib.metadata.version("hermeto"))
+        update(get_config().model_dump(mode="json"))
+        update(sorted(request.flags))
+        update(self._repo_id)
+        update([pkg.model_dump(mode="json") for pkg in packages])
+        for relpath, digest in sorted(self._find_input_files(type_, packages).items()):
+            update([relpath, digest])
+
+        return hasher.hexdigest()
+
+    def _get_local_tags(self) -> Optional[str]:
+        """Return the tags (and the objects they point to) the Go module versions are based on.
+
+        Return None if the tags get fetched from the remote, the local ones don't tell the result.
+        """
+        if self._repo_id is None or not get_config().gomod_skip_tag_fetch:
+            return None
+        repo = git.Repo(self.source_dir, search_parent_directories=True)
+        tags = repo.git.for_each_ref("--format=%(refname) %(objectname)", "refs/tags")
+        # without any local tags, gomod fetches them from the remote
+        return tags or None
+
+    def _find_input_files(
+        self, type_: PackageManagerType, packages: Iterable[PackageInput]
+    ) -> dict[str, str]:
+        patterns = _INPUT_FILE_PATTERNS[type_]
+        input_files: dict[str, str] = {}
+
+        def add(path: Path) -> None:
+            try:
+                relpath = path.relative_to(self.source_dir).as_posix()
+            except ValueError:
+                relpath = str(path)
+            if relpath not in input_files and path.is_file():
+                input_files[relpath] = _get_sha256(path)
+
+        for package in packages:
+            package_dir = self.source_dir / package.path
+            for dirpath, dirnames, filenames in os.walk(package_dir):
+                dirnames[:] = [name for name in dirnames if name not in _SKIPPED_DIRS]
+                for filename in filenames:
+                    path = Path(dirpath, filename)
+                    relpath = PurePosixPath(path.relative_to(self.source_dir).as_posix())
+                    if any(relpath.match(pattern) for pattern in patterns):
+                        add(path)
+
+            for attr in ("lockfile", "requirements_files", "requirements_build_files"):
+                value = getattr(package, attr, None)
+                for path in value if isinstance(value, list) else [value]:
+                    if path is not None:
+                        # absolute paths stay absolute when joined
+                        add(package_dir / path)
+
+        return input_files
+
+    def prune(self, requested_types: Iterable[PackageManagerType]) -> None:
+        """Remove the downloads and fragments of package managers which are no longer requested.
+
+        Directories which also belong to one of the requested package managers are kept.
+        """
+        requested_types = set(requested_types)
+        kept_dirs = {deps_dir for type_ in requested_types for deps_dir in _DEPS_DIRS[type_]}
+        for type_ in _DEPS_DIRS.keys() - requested_types:
+            for deps_dir in set(_DEPS_DIRS[type_]) - kept_dirs:
+                shutil.rmtree(self.output_dir / deps_dir, ignore_errors=True)
+            self._fragment_path(type_).unlink(missing_ok=True)
+
+    def _remove_deps(self, type_: PackageManagerType) -> None:
+        for deps_dir in _DEPS_DIRS[type_]:
+            if deps_dir in self._shared_deps_dirs:
+                with self._lock:
+                    if deps_dir in self._cleared_deps_dirs:
+                        continue
+                    self._cleared_deps_dirs.add(deps_dir)
+            shutil.rmtree(self.output_dir / deps_dir, ignore_errors=True)
+
+    def load_output(self, type_: PackageManagerType) -> Optional[RequestOutput]:
+        """Return the output of the previous run of a package manager, if it can be reused.
+
+        If it can't be reused, remove the previously downloaded files of the package manager
+        to make room for a fresh run.
+        """
+        output = self._load_output(type_)
+        if output is None:
+            self._remove_deps(type_)
+            self._fragment_path(type_).unlink(missing_ok=True)
+        return output
+
+    def _load_output(self, type_: PackageManagerType) -> Optional[RequestOutput]:
+        try:
+            fragment = _Fragment.model_validate_json(self._fragment_path(type_).read_text())
+        except FileNotFoundError:
+            return None
+        except pydantic.ValidationError as e:
+            log.debug("Ignoring malformed manifest fragment for %s: %s", type_, e)
+            return None
+
+        if shared_dirs := self._shared_deps_dirs.intersection(_DEPS_DIRS[type_]):
+            log.debug(
+                "%s shares %s with other package managers, not reusing its output",
+                type_,
+                ", ".join(sorted(shared_dirs)),
+            )
+            return None
+
+        if self._inputs_digests[type_] is None:
+            log.debug("The output of %s depends on the remote state, not reusing it", type_)
+            return None
+
+        if fragment.inputs_digest != self._inputs_digests[type_]:
+            log.debug("The inputs of %s changed since the previous run", type_)
+            return None
+
+        for relpath, digest in fragment.deps_files.items():
+            path = self.output_dir / relpath
+            if not path.is_file() or _get_sha256(path) != digest:
+                log.debug("%s was modified or removed since the previous run", path)
+                return None
+
+        output = fragment.output
+        for project_file in output.build_config.project_files:
+            if not project_file.abspath.is_absolute():
+                project_file.abspath = self.source_dir / project_file.abspath
+
+        return output
+
+    def save_output(
+        self, type_: PackageManagerType, output: RequestOutput, source_dir: Path
+    ) -> None:
+        """Record the output of a package manager, along with the digests of its downloads.
+
+        :param type_: the package manager type
+        :param output: the output produced by the package manager
+        :param source_dir: the source directory the package manager ran in (may be a copy)
+        """
+        inputs_digest = self._inputs_digests[type_]
+        if inputs_digest is None:
+            return
+
+        output = output.model_copy(deep=True)
+        for project_file in output.build_config.project_files:
+            try:
+                project_file.abspath = project_file.abspath.relative_to(source_dir)
+            except ValueError:
+                # the file is not in the source directory, keep the absolute path
+                continue
+
+        deps_files = {}
+        for deps_dir in _DEPS_DIRS[type_]:
+            for dirpath, _, filenames in os.walk(self.output_dir / deps_dir):
+                for filename in filenames:
+                    path = Path(dirpath, filename)
+                    if not path.is_symlink():
+                        relpath = path.relative_to(self.output_dir).as_posix()
+                        deps_files[relpath] = _get_sha256(path)
+
+        fragment = _Fragment(inputs_digest=inputs_digest, deps_files=deps_files, output=output)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._fragment_path(type_).write_text(fragment.model_dump_json())
+
+
+def _get_sha256(file_path: Path) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            hasher.update(chunk)
+    return hasher.hexdigest()
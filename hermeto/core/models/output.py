@@ -2,12 +2,17 @@ import logging
 import string
 from copy import deepcopy
 from pathlib import Path
-from typing import Any, Dict, Literal, Optional, Set
+from typing import Any, Dict, Iterable, Iterator, Literal, Optional, Set
 
 import pydantic
 
 from hermeto.core.errors import BaseError
-from hermeto.core.models.sbom import Component, Sbom, merge_component_properties
+from hermeto.core.models.sbom import (
+    Component,
+    Sbom,
+    iter_merged_components,
+    merge_component_properties,
+)
 from hermeto.core.models.validators import unique_sorted
 
 log = logging.getLogger(__name__)
@@ -160,33 +165,53 @@ class RequestOutput(pydantic.BaseModel):
         """
         return Sbom(components=merge_component_properties(self.components))
 
+    def iter_sbom_components(self) -> Iterator[Component]:
+        """Yield the de-duplicated components of the SBOM for this RequestOutput one at a time.
+
+        The same components as in generate_sbom(), without building the whole list of them.
+        """
+        return iter_merged_components(self.components)
+
     def __add__(self, other: "RequestOutput") -> "RequestOutput":
         if not isinstance(other, self.__class__):
             raise TypeError(f"Cannot add {type(other)} to {self.__class__.__name__}")
-        components = self.components + other.components
-        env_vars = (
-            self.build_config.environment_variables + other.build_config.environment_variables
-        )
-        project_files = self.build_config.project_files + other.build_config.project_files
-
-        # The original implementation could produce different results depending
-        # on the merge order:
-        #    options=output.build_config.options if output.build_config.options else None,
-        # where output is bound when looping through a list of outputs:
-        #    for output in outputs:
-        # Since options are a dict I am opting for simply merging it here,
-        # however this is prone to the same problem and might produce different
-        # results depending on the order of arguments. This has to be addressed
-        # in BuildConfig.
-        # deepcopying everything to protect against potential cross-talk through
-        # mutable values.
-        lhs, rhs = deepcopy(self.build_config.options), deepcopy(other.build_config.options)
-        options = lhs if lhs is not None else rhs
-        if lhs is not None and rhs is not None:
-            # The if-guard above is not enough to convince mypy that options
-            # cannot be None at this point.
-            options.update(rhs)  # type: ignore
-        return self.__class__.from_obj_list(
+        return self.merge_all([self, other])
+
+    @classmethod
+    def merge_all(cls, outputs: Iterable["RequestOutput"]) -> "RequestOutput":
+        """Combine any number of RequestOutputs into one.
+
+        Unlike adding the outputs one by one, the lists are only accumulated and validated
+        (de-duplicated) once at the end.
+        """
+        components: list[Component] = []
+        env_vars: list[EnvironmentVariable] = []
+        project_files: list[ProjectFile] = []
+        options: Optional[Dict[str, Any]] = None
+
+        for output in outputs:
+            components.extend(output.components)
+            env_vars.extend(output.build_config.environment_variables)
+            project_files.extend(output.build_config.project_files)
+
+            # The original implementation could produce different results depending
+            # on the merge order:
+            #    options=output.build_config.options if output.build_config.options else None,
+            # where output is bound when looping through a list of outputs:
+            #    for output in outputs:
+            # Since options are a dict I am opting for simply merging it here,
+            # however this is prone to the same problem and might produce different
+            # results depending on the order of arguments. This has to be addressed
+            # in BuildConfig.
+            # deepcopying everything to protect against potential cross-talk through
+            # mutable values.
+            if output.build_config.options is not None:
+                if options is None:
+                    options = deepcopy(output.build_config.options)
+                else:
+                    options.update(deepcopy(output.build_config.options))
+
+        return cls.from_obj_list(
             components=components,
             environment_variables=env_vars,
             project_files=project_files,
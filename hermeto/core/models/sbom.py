@@ -3,11 +3,24 @@ import hashlib
 import json
 import logging
 import re
+import textwrap
 from collections import defaultdict
-from functools import cached_property, partial, reduce
-from itertools import chain, groupby
+from functools import cached_property, partial
+from itertools import chain
 from pathlib import Path
-from typing import Annotated, Any, Dict, Iterable, Literal, Optional, Union
+from typing import (
+    Annotated,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    Literal,
+    Mapping,
+    Optional,
+    Sequence,
+    TextIO,
+    Union,
+)
 from urllib.parse import urlparse
 
 import pydantic
@@ -144,14 +157,19 @@ class Sbom(pydantic.BaseModel):
     version: int = 1
 
     def __add__(self, other: Union["Sbom", "SPDXSbom"]) -> "Sbom":
-        if isinstance(other, self.__class__):
-            return Sbom(
-                components=merge_component_properties(
-                    chain.from_iterable(s.components for s in [self, other])
-                )
+        return self.merge_all([other])
+
+    def merge_all(self, others: Iterable[Union["Sbom", "SPDXSbom"]]) -> "Sbom":
+        """Merge any number of SBOMs into this one, converting them to CycloneDX if needed.
+
+        The components of all the SBOMs are de-duplicated in a single pass, which makes this
+        cheaper than adding the SBOMs one by one.
+        """
+        return Sbom(
+            components=merge_component_properties(
+                chain(self.components, *(other.to_cyclonedx().components for other in others))
             )
-        else:
-            return self + other.to_cyclonedx()
+        )
 
     @pydantic.field_validator("components")
     def _unique_components(cls, components: list[Component]) -> list[Component]:
@@ -171,73 +189,117 @@ class Sbom(pydantic.BaseModel):
             doc_namespace: SPDX document namespace. Namespace is URI of indicating
 
         """
-
-        def create_document_root() -> SPDXPackage:
-            return SPDXPackage(name="", versionInfo="", SPDXID="SPDXRef-DocumentRoot-File-")
-
-        def create_root_relationship() -> SPDXRelation:
-            return SPDXRelation(
-                spdxElementId="SPDXRef-DOCUMENT",
-                comment="",
-                relatedSpdxElement="SPDXRef-DocumentRoot-File-",
-                relationshipType="DESCRIBES",
-            )
-
-        def link_to_root(packages: list[SPDXPackage]) -> list[SPDXRelation]:
-            relationships, root_id, rtype = [], "SPDXRef-DocumentRoot-File-", "CONTAINS"
-            pRel = partial(SPDXRelation, spdxElementId=root_id, comment="", relationshipType=rtype)
-            for package in packages:
-                if package.SPDXID == "SPDXRef-DocumentRoot-File-":
-                    continue
-                relationships.append(pRel(relatedSpdxElement=package.SPDXID))
-            return relationships
-
-        def libs_to_packages(libraries: list[Component]) -> list[SPDXPackage]:
-            packages, annottr, now = [], f"Tool: {APP_NAME}:jsonencoded", spdx_now()
-            args = dict(annotator=annottr, annotationDate=now, annotationType="OTHER")
-            pAnnotation = partial(SPDXPackageAnnotation, **args)
-
-            mkcomm = lambda p: json.dumps(dict(name=f"{p.name}", value=f"{p.value}"))
-            hashdict = lambda c: dict(name=c.name, version=c.version, purl=c.purl)
-            erefbase = dict(referenceCategory="PACKAGE-MANAGER", referenceType="purl")
-            erefdict = lambda c: dict(referenceLocator=c.purl, **erefbase)
-
-            for component in libraries:
-                package_hash = SPDXPackage._calculate_package_hash_from_dict(hashdict(component))
-
-                if component.version:
-                    human_readable_id = f"{component.name}-{component.version}"
-                else:
-                    human_readable_id = component.name
-
-                packages.append(
-                    SPDXPackage(
-                        SPDXID=sanitize_spdxid(
-                            f"SPDXRef-Package-{human_readable_id}-{package_hash}"
-                        ),
-                        name=component.name,
-                        versionInfo=component.version,
-                        externalRefs=[erefdict(component)],
-                        annotations=[pAnnotation(comment=mkcomm(p)) for p in component.properties],
-                    )
-                )
-            return packages
-
-        # Main function body.
-        packages = [create_document_root()] + libs_to_packages(self.components)
-        relationships = [create_root_relationship()] + link_to_root(packages)
-        creator = lambda tool: [f"Tool: {tool.name}", f"Organization: {tool.vendor}"]
+        now = spdx_now()
+        packages = [_spdx_document_root()] + [
+            _component_to_spdx_package(component, now) for component in self.components
+        ]
+        relationships = list(_iter_spdx_relationships(self.components))
         return SPDXSbom(
             packages=packages,
             relationships=relationships,
             documentNamespace=doc_namespace,
-            creationInfo=SPDXCreationInfo(
-                creators=sum([creator(tool) for tool in self.metadata.tools], []),
-                created=spdx_now(),
-            ),
+            creationInfo=_spdx_creation_info(self.metadata),
+        )
+
+
+_SPDX_ROOT_ID = "SPDXRef-DocumentRoot-File-"
+
+
+def _spdx_document_root() -> "SPDXPackage":
+    return SPDXPackage(name="", versionInfo="", SPDXID=_SPDX_ROOT_ID)
+
+
+def _spdx_creation_info(metadata: Metadata) -> "SPDXCreationInfo":
+    creators = [
+        creator
+        for tool in metadata.tools
+        for creator in (f"Tool: {tool.name}", f"Organization: {tool.vendor}")
+    ]
+    return SPDXCreationInfo(creators=creators, created=spdx_now())
+
+
+def _spdx_package_id(component: Component) -> str:
+    hash_dict = dict(name=component.name, version=component.version, purl=component.purl)
+    package_hash = SPDXPackage._calculate_package_hash_from_dict(hash_dict)
+
+    if component.version:
+        human_readable_id = f"{component.name}-{component.version}"
+    else:
+        human_readable_id = component.name
+
+    return sanitize_spdxid(f"SPDXRef-Package-{human_readable_id}-{package_hash}")
+
+
+def _component_to_spdx_package(component: Component, annotation_date: str) -> "SPDXPackage":
+    annotations = [
+        SPDXPackageAnnotation(
+            annotator=f"Tool: {APP_NAME}:jsonencoded",
+            annotationDate=annotation_date,
+            annotationType="OTHER",
+            comment=json.dumps(dict(name=f"{prop.name}", value=f"{prop.value}")),
+        )
+        for prop in component.properties
+    ]
+    external_ref = dict(
+        referenceCategory="PACKAGE-MANAGER", referenceType="purl", referenceLocator=component.purl
+    )
+    return SPDXPackage(
+        SPDXID=_spdx_package_id(component),
+        name=component.name,
+        versionInfo=component.version,
+        externalRefs=[external_ref],
+        annotations=annotations,
+    )
+
+
+def _iter_spdx_relationships(components: Iterable[Component]) -> Iterator["SPDXRelation"]:
+    """Yield the relationships of a converted CycloneDX SBOM: the root contains every package."""
+    yield SPDXRelation(
+        spdxElementId="SPDXRef-DOCUMENT",
+        comment="",
+        relatedSpdxElement=_SPDX_ROOT_ID,
+        relationshipType="DESCRIBES",
+    )
+    for component in components:
+        yield SPDXRelation(
+            spdxElementId=_SPDX_ROOT_ID,
+            comment="",
+            relatedSpdxElement=_spdx_package_id(component),
+            relationshipType="CONTAINS",
         )
 
 
+def _iter_spdx_packages(
+    components: Sequence[Component], annotation_date: str
+) -> Iterator["SPDXPackage"]:
+    """Yield the packages of a converted CycloneDX SBOM, as SPDXSbom would sort and merge them.
+
+    Only the sort keys of the packages are held in memory, each package is created right
+    before it is yielded.
+    """
+    # the document root first, then the components, grouped by their parsed purls
+    groups: dict[int, list[int]] = {hash(("", "", "")): [-1]}
+    for i, component in enumerate(components):
+        purl_key = hash(sum(hash(purl) for purl in _parse_purls([component.purl])))
+        groups.setdefault(purl_key, []).append(i)
+
+    def package(i: int) -> SPDXPackage:
+        if i < 0:
+            return _spdx_document_root()
+        return _component_to_spdx_package(components[i], annotation_date)
+
+    def sort_key(indexes: list[int]) -> tuple[str, str]:
+        if indexes[0] < 0:
+            return ("", "")
+        first = components[indexes[0]]
+        return (first.name, first.version or "")
+
+    # sorted() is stable, packages with the same name and version keep their order
+    for indexes in sorted(groups.values(), key=sort_key):
+        (merged,) = SPDXSbom.deduplicate_spdx_packages(package(i) for i in indexes)
+        yield merged
+
+
 class SPDXPackageExternalRefReferenceLocatorURI(pydantic.BaseModel):
     """SPDX Package External Reference with URI reference locator."""
 
@@ -588,33 +650,45 @@ class SPDXSbom(pydantic.BaseModel):
         return out
 
     def __add__(self, other: Union["SPDXSbom", Sbom]) -> "SPDXSbom":
-        if isinstance(other, self.__class__):
-            # Packages are not going to be modified so it is OK to just pass
-            # references around.
-            merged_packages = self.packages + other.non_root_packages
-            # Relationships, on the other hand, are amended, so new
-            # relationships will be constructed. Further, identical
-            # relationships should be dropped. Deduplication based on building
-            # a set is considered safe because all fields of all elements are
-            # used to compute a hash.
+        return self.merge_all([other])
+
+    def merge_all(self, others: Iterable[Union["SPDXSbom", Sbom]]) -> "SPDXSbom":
+        """Merge any number of SBOMs into this one, converting them to SPDX if needed.
+
+        The result is the same as adding the SBOMs one by one, but the packages get
+        de-duplicated and the document copied only once rather than after every merged SBOM.
+        The root of this SBOM becomes the root of the merged one.
+        """
+        merged_packages = list(self.packages)
+        # Relationships are amended, so new relationships will be constructed. Further,
+        # identical relationships should be dropped. Deduplication based on a dict is
+        # considered safe because all fields of all elements are used to compute a hash,
+        # and unlike a set, it keeps the order deterministic.
+        merged_relationships = dict.fromkeys(rel.model_copy() for rel in self.relationships)
+
+        for other in others:
+            if isinstance(other, Sbom):
+                other = other.to_spdx(doc_namespace="NOASSERTION")
+            elif not isinstance(other, SPDXSbom):
+                self_class = self.__class__.__name__
+                other_class = other.__class__.__name__
+                raise ValueError(f"Cannot merge {other_class} to {self_class}")
+
+            # Packages are not going to be modified (deduplication copies them), so it is OK
+            # to just pass references around.
+            merged_packages.extend(other.non_root_packages)
             processed_other = self.retarget_and_prune_relationships(from_sbom=other, to_sbom=self)
-            merged_relationships = list(set(self.relationships + processed_other))
-            res = self.model_copy(
-                update={
-                    # At the moment of writing pydantic does not deem it necessary to
-                    # validate updated fields because we should just trust them [1].
-                    "packages": self.deduplicate_spdx_packages(merged_packages),
-                    "relationships": merged_relationships,
-                },
-                deep=True,
-            )
-            return res
-        elif isinstance(other, Sbom):
-            return self + other.to_spdx(doc_namespace="NOASSERTION")
-        else:
-            self_class = self.__class__.__name__
-            other_class = other.__class__.__name__
-            raise ValueError(f"Cannot merge {other_class} to {self_class}")
+            merged_relationships.update(dict.fromkeys(processed_other))
+
+        return self.model_copy(
+            update={
+                # At the moment of writing pydantic does not deem it necessary to
+                # validate updated fields because we should just trust them [1].
+                "packages": self.deduplicate_spdx_packages(merged_packages),
+                "relationships": list(merged_relationships),
+                "creationInfo": self.creationInfo.model_copy(deep=True),
+            },
+        )
 
     def to_spdx(self, *a: Any, **k: Any) -> Self:
         """Return self, ignore arguments, self is already a SPDX document."""
@@ -670,17 +744,130 @@ class SPDXSbom(pydantic.BaseModel):
 
 def merge_component_properties(components: Iterable[Component]) -> list[Component]:
     """Sort and de-duplicate components while merging their `properties`."""
-    components = sorted(components, key=Component.key)
-    grouped_components = groupby(components, key=Component.key)
+    return list(iter_merged_components(components))
 
-    def merge_component_group(component_group: Iterable[Component]) -> Component:
-        component_group = list(component_group)
-        prop_sets = (PropertySet.from_properties(c.properties) for c in component_group)
-        merged_prop_set = reduce(PropertySet.merge, prop_sets)
-        component = component_group[0]
-        return component.model_copy(update={"properties": merged_prop_set.to_properties()})
 
-    return [merge_component_group(g) for _, g in grouped_components]
+def iter_merged_components(components: Iterable[Component]) -> Iterator[Component]:
+    """Sort and de-duplicate components while merging their `properties`, yield the results.
+
+    Components are indexed by their key (purl). Distinct PropertySets are interned and referred
+    to by their index, so identical property lists are parsed and merged only once, and a new
+    Component is created only for each unique key, right before it is yielded.
+    """
+    prop_sets: list[PropertySet] = []
+    prop_set_ids: dict[PropertySet, int] = {}
+    ids_by_properties: dict[tuple[tuple[str, str], ...], int] = {}
+    merged_ids: dict[tuple[int, int], int] = {}
+
+    def intern(prop_set: PropertySet) -> int:
+        if prop_set not in prop_set_ids:
+            prop_set_ids[prop_set] = len(prop_sets)
+            prop_sets.append(prop_set)
+        return prop_set_ids[prop_set]
+
+    merged: dict[str, tuple[Component, int]] = {}
+    for component in components:
+        props_key = tuple((prop.name, prop.value) for prop in component.properties)
+        prop_set_id = ids_by_properties.get(props_key)
+        if prop_set_id is None:
+            prop_set_id = intern(PropertySet.from_properties(component.properties))
+            ids_by_properties[props_key] = prop_set_id
+
+        key = component.key()
+        if key not in merged:
+            merged[key] = (component, prop_set_id)
+            continue
+
+        first_component, merged_id = merged[key]
+        if merged_id != prop_set_id:
+            pair = (merged_id, prop_set_id)
+            if pair not in merged_ids:
+                merged_ids[pair] = intern(prop_sets[merged_id].merge(prop_sets[prop_set_id]))
+            merged[key] = (first_component, merged_ids[pair])
+
+    properties: dict[int, list[Property]] = {}
+    for key in sorted(merged):
+        component, prop_set_id = merged[key]
+        if prop_set_id not in properties:
+            properties[prop_set_id] = prop_sets[prop_set_id].to_properties()
+        yield component.model_copy(update={"properties": list(properties[prop_set_id])})
+
+
+def write_sbom_json(sbom: Union[Sbom, SPDXSbom], fileobj: TextIO) -> None:
+    """Write the SBOM to a file as JSON, one component (or package, relationship) at a time.
+
+    The output is the same as sbom.model_dump_json(indent=2, by_alias=True, exclude_none=True),
+    but the JSON document of the whole SBOM never has to be held in memory at once.
+
+    :param sbom: the SBOM to write
+    :param fileobj: a file opened for writing text
+    """
+    streamed_fields = ["components"] if isinstance(sbom, Sbom) else ["packages", "relationships"]
+    _write_model_json(sbom, {name: getattr(sbom, name) for name in streamed_fields}, fileobj)
+
+
+def write_cyclonedx_json(components: Iterable[Component], fileobj: TextIO) -> None:
+    """Write a CycloneDX SBOM of the components to a file as JSON, without building the SBOM.
+
+    The output is the same as write_sbom_json(Sbom(components=components), fileobj), but the
+    components are consumed one at a time, e.g. as iter_merged_components() produces them.
+
+    :param components: sorted and de-duplicated components, see iter_merged_components()
+    :param fileobj: a file opened for writing text
+    """
+    _write_model_json(Sbom(), {"components": components}, fileobj)
+
+
+def write_spdx_json(components: Iterable[Component], fileobj: TextIO, doc_namespace: str) -> None:
+    """Write an SPDX SBOM of the components to a file as JSON, without building the SBOM.
+
+    The output is the same as write_sbom_json(Sbom(components=components).to_spdx(...), fileobj),
+    but the SPDX packages and relationships are created one at a time while writing them. The
+    components themselves are held in memory, SPDX packages are sorted by a different key.
+
+    :param components: sorted and de-duplicated components, see iter_merged_components()
+    :param fileobj: a file opened for writing text
+    :param doc_namespace: the SPDX document namespace
+    """
+    components = list(components)
+    sbom = SPDXSbom(documentNamespace=doc_namespace, creationInfo=_spdx_creation_info(Metadata()))
+    streamed_fields = {
+        "packages": _iter_spdx_packages(components, sbom.creationInfo.created),
+        "relationships": _iter_spdx_relationships(components),
+    }
+    _write_model_json(sbom, streamed_fields, fileobj)
+
+
+def _write_model_json(
+    model: pydantic.BaseModel,
+    streamed_fields: Mapping[str, Iterable[pydantic.BaseModel]],
+    fileobj: TextIO,
+) -> None:
+    """Write a model as JSON, taking the items of the streamed list fields from the iterables."""
+    model_fields = type(model).model_fields
+    fields = [name for name in model_fields if getattr(model, name) is not None]
+
+    fileobj.write("{")
+    for i, name in enumerate(fields):
+        fileobj.write(",\n" if i else "\n")
+        if name in streamed_fields:
+            field_info = model_fields[name]
+            key = field_info.serialization_alias or field_info.alias or name
+            fileobj.write(f"  {json.dumps(key)}: [")
+            empty = True
+            for item in streamed_fields[name]:
+                fileobj.write("\n" if empty else ",\n")
+                empty = False
+                item_json = item.model_dump_json(indent=2, by_alias=True, exclude_none=True)
+                fileobj.write(textwrap.indent(item_json, "    "))
+            fileobj.write("]" if empty else "\n  ]")
+        else:
+            field_json = model.model_dump_json(
+                include={name}, indent=2, by_alias=True, exclude_none=True
+            )
+            # strip the enclosing braces, keep the indented '"key": value'
+            fileobj.write(field_json[2:-2])
+    fileobj.write("\n}" if fields else "}")
 
 
 # References
@@ -13,14 +13,16 @@ from hermeto.core.models.output import EnvironmentVariable, ProjectFile, Request
 from hermeto.core.models.property_semantics import PropertySet
 from hermeto.core.models.sbom import Component
 from hermeto.core.package_managers.bundler.parser import (
+    GemDependency,
     GemPlatformSpecificDependency,
     GitDependency,
     ParseResult,
     PathDependency,
+    download_gems,
     parse_lockfile,
 )
 from hermeto.core.rooted_path import RootedPath
-from hermeto.core.scm import get_repo_id
+from hermeto.core.scm import GitFetchPool, get_repo_id
 
 log = logging.getLogger(__name__)
 
@@ -84,14 +86,31 @@ def _resolve_bundler_package(
 
     components = [Component(name=name, version=version, purl=main_package_purl.to_string())]
     git_paths = []
+    with GitFetchPool.from_config() as git_pool:
+        # clone the git dependencies while the gems are being downloaded
+        # several gems can come from one repository, which must only be cloned once;
+        # forks of a repository at the same commit share the target directory too
+        git_deps: dict[FSDepName, GitDependency] = {}
+        for dep in dependencies:
+            if isinstance(dep, GitDependency):
+                git_deps.setdefault(dep.dir_name, dep)
+        git_downloads = [
+            git_pool.submit(str(dep.url), dep.download_to, deps_dir) for dep in git_deps.values()
+        ]
+        download_gems([dep for dep in dependencies if isinstance(dep, GemDependency)], deps_dir)
+        for dep in dependencies:
+            if isinstance(dep, PathDependency):
+                dep.download_to(deps_dir)
+        for git_download in git_downloads:
+            git_download.result()
+
     for dep in dependencies:
-        dep.download_to(deps_dir)
         if isinstance(dep, GemPlatformSpecificDependency):
             properties = PropertySet(bundler_package_binary=True).to_properties()
         else:
             properties = []
         if isinstance(dep, GitDependency):
-            git_paths.append((dep.name, dep.repo_name + "-" + dep.ref[:12]))
+            git_paths.append((dep.name, dep.dir_name))
 
         c = Component(name=dep.name, version=dep.version, purl=dep.purl, properties=properties)
         components.append(c)
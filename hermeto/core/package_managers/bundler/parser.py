@@ -1,9 +1,11 @@
 import json
 import logging
+import re
 import subprocess
 from functools import cached_property
+from os import PathLike
 from pathlib import Path
-from typing import Annotated, Optional, Union
+from typing import Annotated, Iterable, Optional, Union
 from urllib.parse import urljoin, urlparse
 
 import pydantic
@@ -11,10 +13,11 @@ from git import Repo
 from packageurl import PackageURL
 from typing_extensions import Self
 
-from hermeto.core.errors import PackageManagerError, PackageRejected
-from hermeto.core.package_managers.general import download_binary_file
+from hermeto.core.checksum import ChecksumInfo
+from hermeto.core.errors import PackageManagerError, PackageRejected, UnexpectedFormat
+from hermeto.core.package_managers.general import download_files
 from hermeto.core.rooted_path import PathOutsideRoot, RootedPath
-from hermeto.core.scm import get_repo_id
+from hermeto.core.scm import GitMirrorCache, get_repo_id, retry_git_operation
 from hermeto.core.utils import run_cmd
 
 log = logging.getLogger(__name__)
@@ -22,6 +25,8 @@ log = logging.getLogger(__name__)
 GEMFILE = "Gemfile"
 GEMFILE_LOCK = "Gemfile.lock"
 
+_CHECKSUMS_ENTRY = re.compile(r"  (\S+) \((\S+)\)(?: ((?:\w+=\w+,?)+))?")
+
 AcceptedUrl = Annotated[
     pydantic.HttpUrl,
     pydantic.UrlConstraints(allowed_schemes=["https"]),
@@ -56,11 +61,11 @@ class GemDependency(_GemMetadata):
 
     Attributes:
         source:     The source URL of the gem as stated in 'remote' field from Gemfile.lock.
-        checksum:   The checksum of the gem.
+        checksums:  The checksums of the gem from the CHECKSUMS section of Gemfile.lock.
     """
 
     source: str
-    checksum: Optional[str] = None
+    checksums: list[ChecksumInfo] = []
 
     @cached_property
     def purl(self) -> str:
@@ -68,16 +73,19 @@ class GemDependency(_GemMetadata):
         purl = PackageURL(type="gem", name=self.name, version=self.version)
         return purl.to_string()
 
-    @cached_property
+    @property
+    def full_name(self) -> str:
+        """Return the name of the gem as used in file names and in the CHECKSUMS section."""
+        return f"{self.name}-{self.version}"
+
+    @property
     def remote_location(self) -> str:
         """Return remote location to download this gem from."""
-        return urljoin(self.source, f"downloads/{self.name}-{self.version}.gem")
+        return urljoin(self.source, f"downloads/{self.full_name}.gem")
 
     def download_to(self, deps_dir: RootedPath) -> None:
         """Download represented gem to specified file system location."""
-        fs_location = deps_dir.join_within_root(Path(f"{self.name}-{self.version}.gem"))
-        log.info("Downloading gem %s", self.name)
-        download_binary_file(self.remote_location, fs_location)
+        download_gems([self], deps_dir)
 
 
 class GemPlatformSpecificDependency(GemDependency):
@@ -91,23 +99,37 @@ class GemPlatformSpecificDependency(GemDependency):
     platform: str
 
     @property
-    def remote_location(self) -> str:
-        """Return remote location to download this gem from."""
-        return urljoin(self.source, f"downloads/{self.name}-{self.version}-{self.platform}.gem")
-
-    def download_to(self, deps_dir: RootedPath) -> None:
-        """Download represented gem to specified file system location."""
-        fs_location = deps_dir.join_within_root(
-            Path(f"{self.name}-{self.version}-{self.platform}.gem")
-        )
-        log.info(
-            "Downloading platform-specific gem %s-%s-%s", self.name, self.version, self.platform
-        )
+    def full_name(self) -> str:
+        """Return the name of the gem as used in file names and in the CHECKSUMS section."""
         # A combination of Ruby v.3.0.7 and some Bundler dependencies results in
         # -gnu suffix being dropped from some platforms. This was observed on
         # sqlite3-aarch-linux-gnu. We discourage using outdated platforms
         # for building dependencies and cnsider this to be a limitation of Ruby.
-        download_binary_file(self.remote_location, fs_location)
+        return f"{self.name}-{self.version}-{self.platform}"
+
+
+def download_gems(gems: Iterable[GemDependency], deps_dir: RootedPath) -> None:
+    """Download gems concurrently, verify the ones that have checksums while downloading them.
+
+    :param gems: the gems to download
+    :param deps_dir: the directory to download the gems to
+    :raises PackageRejected: if a gem does not match its checksums
+    """
+    files_to_download: dict[str, Union[str, PathLike[str]]] = {}
+    checksums: dict[str, list[ChecksumInfo]] = {}
+
+    for gem in gems:
+        if isinstance(gem, GemPlatformSpecificDependency):
+            log.info("Downloading platform-specific gem %s", gem.full_name)
+        else:
+            log.info("Downloading gem %s", gem.full_name)
+        files_to_download[gem.remote_location] = deps_dir.join_within_root(f"{gem.full_name}.gem")
+        if gem.checksums:
+            checksums[gem.remote_location] = gem.checksums
+        else:
+            log.warning("Missing checksum for gem %s, integrity check skipped.", gem.full_name)
+
+    download_files(files_to_download, checksums=checksums)
 
 
 class GitDependency(_GemMetadata):
@@ -137,12 +159,15 @@ class GitDependency(_GemMetadata):
         parse_result = urlparse(str(self.url))
         return Path(parse_result.path).stem
 
-    def download_to(self, deps_dir: RootedPath) -> None:
-        """Download git repository to the output directory with a specific name."""
+    @cached_property
+    def dir_name(self) -> str:
+        """Get the name of the directory the repository is cloned to."""
         short_ref_length = 12
-        short_ref = self.ref[:short_ref_length]
+        return f"{self.repo_name}-{self.ref[:short_ref_length]}"
 
-        git_repo_path = deps_dir.join_within_root(f"{self.repo_name}-{short_ref}")
+    def download_to(self, deps_dir: RootedPath) -> None:
+        """Download git repository to the output directory with a specific name."""
+        git_repo_path = deps_dir.join_within_root(self.dir_name)
         if git_repo_path.path.exists():
             log.info("Skipping existing git repository %s", self.url)
             return
@@ -150,11 +175,24 @@ class GitDependency(_GemMetadata):
         git_repo_path.path.mkdir(parents=True)
 
         log.info("Cloning git repository %s", self.url)
-        repo = Repo.clone_from(
-            url=str(self.url),
-            to_path=git_repo_path.path,
-            env={"GIT_TERMINAL_PROMPT": "0"},
+        url = clone_from = str(self.url)
+        if mirror_cache := GitMirrorCache.from_config():
+            try:
+                clone_from = str(mirror_cache.update(url, self.ref))
+            except Exception as ex:
+                log.warning("Failed updating the git mirror of %s, cloning directly: %s", url, ex)
+
+        repo = retry_git_operation(
+            lambda: Repo.clone_from(
+                url=clone_from,
+                to_path=git_repo_path.path,
+                env={"GIT_TERMINAL_PROMPT": "0"},
+            ),
+            f"cloning {clone_from}",
         )
+        if clone_from != url:
+            # the repository was cloned from the local mirror, make it look like a regular clone
+            repo.remote().set_url(url)
 
         if self.branch is not None:
             repo.git.checkout(self.branch)
@@ -224,6 +262,7 @@ def parse_lockfile(package_dir: RootedPath, allow_binary: bool = False) -> Parse
         raise PackageManagerError(f"Failed to parse {lockfile_path}")
 
     json_output = json.loads(output)
+    checksums = _parse_checksums(lockfile_path.path.read_text())
 
     bundler_version: str = json_output["bundler_version"]
     log.info("Package %s is bundled with version %s", package_dir.path.name, bundler_version)
@@ -233,7 +272,8 @@ def parse_lockfile(package_dir: RootedPath, allow_binary: bool = False) -> Parse
     for dep in dependencies:
         if dep["type"] == "rubygems":
             if dep["platform"] == "ruby":
-                result.append(GemDependency(**dep))
+                full_name = "-".join([dep["name"], dep["version"]])
+                result.append(GemDependency(**dep, checksums=checksums.get(full_name, [])))
             else:
                 full_name = "-".join([dep["name"], dep["version"], dep["platform"]])
                 log.info("Found a binary dependency %s", full_name)
@@ -242,7 +282,9 @@ def parse_lockfile(package_dir: RootedPath, allow_binary: bool = False) -> Parse
                         "Will download binary dependency %s because 'allow_binary' is set to True",
                         full_name,
                     )
-                    result.append(GemPlatformSpecificDependency(**dep))
+                    result.append(
+                        GemPlatformSpecificDependency(**dep, checksums=checksums.get(full_name, []))
+                    )
                 else:
                     # No need to force a platform if we skip the packages.
                     log.warning(
@@ -256,3 +298,37 @@ def parse_lockfile(package_dir: RootedPath, allow_binary: bool = False) -> Parse
             result.append(PathDependency(**dep, root=package_dir))
 
     return result
+
+
+def _parse_checksums(lockfile_content: str) -> dict[str, list[ChecksumInfo]]:
+    """Parse the CHECKSUMS section of a Gemfile.lock (Bundler 2.5.0 and newer).
+
+    The entries look like `name (version[-platform]) sha256=<hexdigest>[,<algorithm>=<digest>]`.
+    Gems from git or path sources are listed without checksums.
+
+    :return: the checksums of the gems, indexed by their full name (name-version[-platform])
+    """
+    checksums: dict[str, list[ChecksumInfo]] = {}
+    lines = iter(lockfile_content.splitlines())
+
+    for line in lines:
+        if line == "CHECKSUMS":
+            break
+
+    # the section ends with an empty line, or with the end of the file
+    for line in lines:
+        if not line.strip():
+            break
+        match = _CHECKSUMS_ENTRY.fullmatch(line)
+        if not match:
+            raise UnexpectedFormat(
+                f"Invalid entry in the CHECKSUMS section of {GEMFILE_LOCK}: {line!r}"
+            )
+
+        name, version, digests = match.groups()
+        if digests:
+            checksums[f"{name}-{version}"] = [
+                ChecksumInfo(*digest.split("=", 1)) for digest in digests.split(",")
+            ]
+
+    return checksums
@@ -1,10 +1,15 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import asyncio
 import logging
+import os
 import ssl
+import threading
+import time
 import types
+from contextlib import contextmanager
 from os import PathLike
-from typing import Any, Dict, Optional, Set, Union
+from pathlib import Path
+from typing import Any, Collection, Coroutine, Dict, Iterator, Mapping, Optional, TypeVar, Union
 from urllib.parse import urlparse
 
 import aiohttp
@@ -12,8 +17,11 @@ import aiohttp_retry
 import requests
 from requests.auth import AuthBase
 
+from hermeto.core.artifact_cache import ArtifactCache
+from hermeto.core.checksum import ChecksumInfo, IncrementalChecksums
 from hermeto.core.config import get_config
-from hermeto.core.errors import FetchError
+from hermeto.core.errors import FetchError, PackageRejected
+from hermeto.core.host_limits import HostLimits
 from hermeto.core.http_requests import (
     DEFAULT_RETRY_OPTIONS,
     SAFE_REQUEST_METHODS,
@@ -24,6 +32,8 @@ pkg_requests_session = get_requests_session(retry_options={"allowed_methods": SA
 
 log = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 def download_binary_file(
     url: str,
@@ -63,52 +73,266 @@ async def _async_download_binary_file(
     auth: Optional[aiohttp.BasicAuth] = None,
     ssl_context: Optional[ssl.SSLContext] = None,
     chunk_size: int = 8192,
-) -> None:
+    checksums: Collection[ChecksumInfo] = (),
+    size: Optional[int] = None,
+) -> dict[str, str]:
     """
     Download a binary file (such as a TAR archive) from a URL using asyncio.
 
+    The file is written to a temporary .part file next to the download path and verified
+    while being written. It only gets renamed to the download path if it matches the
+    expected size and checksums, so the download path never holds a partial or corrupted file.
+
+    If the transfer breaks off midway, the download resumes where it stopped with a Range
+    request. If-Range makes sure that the rest of the file comes from the same version of it
+    (per its ETag or Last-Modified date), otherwise the server sends the whole file again.
+
     :param aiohttp_retry.RetryClient session: Aiohttp interface for making HTTP requests.
     :param str url: URL for file download
     :param str download_path: File path location
     :param aiohttp.BasicAuth auth: Authentication for the URL
     :param int chunk_size: Chunk size param for Response.content.read()
+    :param checksums: The file must match at least one of these checksums (if any)
+    :param size: The expected size of the file in bytes (if known)
+    :return: The digests of the file by algorithm (for the algorithms of the checksums)
     :raise FetchError: If download failed
+    :raise PackageRejected: If the file does not match the expected size or checksums
     """
+    download_path = Path(download_path)
+    part_path = download_path.with_name(f"{download_path.name}.part")
+    incremental_checksums = IncrementalChecksums(checksums)
+    received = 0
+    validator: Optional[str] = None
+    attempts = int(DEFAULT_RETRY_OPTIONS["total"])
+    backoff_factor = float(DEFAULT_RETRY_OPTIONS["backoff_factor"])
+
     try:
-        timeout = aiohttp.ClientTimeout(total=get_config().requests_timeout)
+        with open(part_path, "wb") as f:
+            for attempt in range(1, attempts + 1):
+                headers = {}
+                if received and validator:
+                    headers = {"Range": f"bytes={received}-", "If-Range": validator}
+                streaming = False
 
-        log.debug(
-            f"aiohttp.ClientSession.get(url: {url}, timeout: {timeout}, raise_for_status: True)"
-        )
-        async with session.get(
-            url, timeout=timeout, auth=auth, raise_for_status=True, ssl=ssl_context
-        ) as resp:
-            with open(download_path, "wb") as f:
-                while True:
-                    chunk = await resp.content.read(chunk_size)
-                    if not chunk:
-                        break
-                    f.write(chunk)
-
-    except Exception as exception:
-        log.error(f"Unsuccessful download: {url}")
-        # "from None" since we have the exception context in the logs
-        raise FetchError(
-            (f"exception_name: {exception.__class__.__name__}, " f"details: {exception}")
-        ) from None
+                try:
+                    timeout = aiohttp.ClientTimeout(total=get_config().requests_timeout)
+
+                    log.debug(
+                        f"aiohttp.ClientSession.get(url: {url}, timeout: {timeout}, "
+                        f"raise_for_status: True, headers: {headers})"
+                    )
+                    async with session.get(
+                        url,
+                        timeout=timeout,
+                        auth=auth,
+                        raise_for_status=True,
+                        ssl=ssl_context,
+                        headers=headers,
+                    ) as resp:
+                        if resp.status == 206:
+                            _check_content_range(resp, received)
+                        elif received:
+                            log.debug("Cannot resume %s, downloading it from the start", url)
+                            f.seek(0)
+                            f.truncate()
+                            received = 0
+                            incremental_checksums = IncrementalChecksums(checksums)
+                        validator = _get_validator(resp)
+
+                        streaming = True
+                        while True:
+                            chunk = await resp.content.read(chunk_size)
+                            if not chunk:
+                                break
+                            received += len(chunk)
+                            if size is not None and received > size:
+                                # no point in downloading the rest of the file
+                                raise _unexpected_size(download_path.name, size, f"over {size}")
+                            incremental_checksums.update(chunk)
+                            f.write(chunk)
+                    break
+
+                except PackageRejected:
+                    raise
+                except Exception as exception:
+                    # failures to get a response were already retried by the session
+                    if streaming and attempt < attempts:
+                        delay = backoff_factor * 2 ** (attempt - 1)
+                        log.debug(
+                            "Download of %s broke off after %d bytes (%s), resuming in %.1fs",
+                            url,
+                            received,
+                            exception,
+                            delay,
+                        )
+                        await asyncio.sleep(delay)
+                        continue
+
+                    log.error(f"Unsuccessful download: {url}")
+                    # "from None" since we have the exception context in the logs
+                    raise FetchError(
+                        (
+                            f"exception_name: {exception.__class__.__name__}, "
+                            f"details: {exception}"
+                        )
+                    ) from None
+
+        if size is not None and received != size:
+            raise _unexpected_size(download_path.name, size, str(received))
+        if checksums:
+            incremental_checksums.must_match_any(download_path.name)
+
+        os.replace(part_path, download_path)
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
 
     log.debug(f"Download completed - {url}")
+    return incremental_checksums.hexdigests()
+
+
+def _get_validator(resp: aiohttp.ClientResponse) -> Optional[str]:
+    """Get the value for the If-Range header of requests that resume the download."""
+    etag = resp.headers.get("ETag")
+    # If-Range only works with strong ETags
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+def _check_content_range(resp: aiohttp.ClientResponse, received: int) -> None:
+    content_range = resp.headers.get("Content-Range", "")
+    if not content_range.startswith(f"bytes {received}-"):
+        raise FetchError(
+            f"Cannot resume the download from byte {received}, got Content-Range: {content_range!r}"
+        )
+
+
+def _unexpected_size(filename: str, expected_size: int, actual_size: str) -> PackageRejected:
+    return PackageRejected(
+        f"Unexpected size of {filename}: expected {expected_size} bytes, got {actual_size}",
+        solution=(
+            "Please check if the expected size is correct.\n"
+            "Caution is advised; the file may have been tampered with!"
+        ),
+    )
 
 
 async def async_download_files(
     files_to_download: Dict[str, Union[str, PathLike[str]]],
     concurrency_limit: int,
     ssl_context: Optional[ssl.SSLContext] = None,
+    checksums: Optional[Mapping[str, Collection[ChecksumInfo]]] = None,
+    sizes: Optional[Mapping[str, int]] = None,
+    discard_mismatches: bool = False,
+    session: Optional[aiohttp_retry.RetryClient] = None,
+    semaphore: Optional[asyncio.Semaphore] = None,
+    host_limits: Optional[HostLimits] = None,
 ) -> None:
     """Asynchronous function to download files.
 
+    Files are verified against their expected checksums and sizes while being downloaded.
+
+    If the artifact cache is enabled, files with known checksums are restored from the cache
+    instead of being downloaded, and newly downloaded files are added to the cache.
+
+    Besides the overall concurrency limit, the downloads from each host are limited as well,
+    see HostLimits.
+
     :param files_to_download: Dict of files to download with file paths
     :param concurrency_limit: Max number of concurrent tasks (downloads).
+    :param checksums: Expected checksums of the files, indexed by URL (also used as cache keys)
+    :param sizes: Expected sizes of the files in bytes, indexed by URL
+    :param discard_mismatches: Don't fail on files that don't match the expected checksums or
+        sizes, just leave them out of the output directory
+    :param session: Reuse this session (and its open connections) instead of creating a new one
+    :param semaphore: Budget of concurrent downloads shared with other callers
+    :param host_limits: Per-host limits shared with other callers (and with the session)
+    :raise PackageRejected: If a file does not match the expected checksums or size
+    """
+    if checksums is None:
+        checksums = {}
+    if sizes is None:
+        sizes = {}
+
+    cache = ArtifactCache.from_config()
+    if cache is not None:
+        # verifying the cached files means reading them, keep that off the (shared) event loop
+        files_to_download = await asyncio.get_running_loop().run_in_executor(
+            None, _restore_from_cache, cache, files_to_download, checksums, sizes
+        )
+
+    async def download(
+        session: aiohttp_retry.RetryClient,
+        semaphore: asyncio.Semaphore,
+        host_limits: HostLimits,
+        url: str,
+        download_path: Union[str, PathLike[str]],
+    ) -> None:
+        host = urlparse(url).hostname or ""
+        # wait for the host before taking from the overall budget, so that the downloads
+        # waiting for a busy host don't hold up the downloads from other hosts
+        async with host_limits.acquire(host), semaphore:
+            try:
+                hexdigests = await _async_download_binary_file(
+                    session,
+                    url,
+                    download_path,
+                    ssl_context=ssl_context,
+                    checksums=checksums.get(url, ()),
+                    size=sizes.get(url),
+                )
+            except PackageRejected:
+                if not discard_mismatches:
+                    raise
+                log.warning(
+                    "Download '%s' was removed from the output directory",
+                    Path(download_path).name,
+                )
+            else:
+                if os.path.exists(download_path):
+                    host_limits.record_download(host, os.path.getsize(download_path))
+                    if cache is not None and url in checksums:
+                        await _store_in_cache(cache, download_path, checksums[url], hexdigests)
+
+    async def download_all(
+        session: aiohttp_retry.RetryClient,
+        semaphore: asyncio.Semaphore,
+        host_limits: HostLimits,
+    ) -> None:
+        tasks = {
+            asyncio.create_task(download(session, semaphore, host_limits, url, download_path))
+            for url, download_path in files_to_download.items()
+        }
+        if not tasks:
+            return
+
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            # Check for exceptions
+            await asyncio.gather(*done)
+        finally:
+            # Don't leave any downloads running in the background (the session may be shared)
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(concurrency_limit)
+
+    if session is not None:
+        await download_all(session, semaphore, host_limits or HostLimits.from_config())
+    else:
+        host_limits = HostLimits.from_config()
+        async with _create_retry_client(host_limits) as session:
+            await download_all(session, semaphore, host_limits)
+        host_limits.log_stats()
+
+
+def _create_retry_client(host_limits: Optional[HostLimits] = None) -> aiohttp_retry.RetryClient:
+    """Create a client session which retries failed requests. Must be called inside a loop.
+
+    :param host_limits: report the responses (and failures) of every attempt to these limits
     """
 
     async def on_request_start(
@@ -116,49 +340,214 @@ async def async_download_files(
         trace_config_ctx: types.SimpleNamespace,
         params: aiohttp.TraceRequestStartParams,
     ) -> None:
+        trace_config_ctx.started = time.monotonic()
+        trace_config_ctx.host = params.url.host or ""
         current_attempt = trace_config_ctx.trace_request_ctx["current_attempt"]
         if current_attempt > 1:
             file_name = params.url.path.split("/")[-1]
             log.debug(f"Attempt {current_attempt}/{retry_options.attempts} - {file_name}")
 
+    async def on_request_end(
+        session: aiohttp.ClientSession,
+        trace_config_ctx: types.SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        if host_limits is not None:
+            await host_limits.on_response(
+                trace_config_ctx.host,
+                params.response.status,
+                trace_config_ctx.started,
+                time.monotonic() - trace_config_ctx.started,
+            )
+
+    async def on_request_exception(
+        session: aiohttp.ClientSession,
+        trace_config_ctx: types.SimpleNamespace,
+        params: aiohttp.TraceRequestExceptionParams,
+    ) -> None:
+        if host_limits is not None:
+            await host_limits.on_response(
+                trace_config_ctx.host,
+                None,
+                trace_config_ctx.started,
+                time.monotonic() - trace_config_ctx.started,
+            )
+
     trace_config = aiohttp.TraceConfig()
     trace_config.on_request_start.append(on_request_start)
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_request_exception.append(on_request_exception)
     num_attempts: int = int(DEFAULT_RETRY_OPTIONS["total"])
-    retry_options = aiohttp_retry.JitterRetry(attempts=num_attempts, retry_all_server_errors=True)
-    retry_client = aiohttp_retry.RetryClient(
+    retry_options = aiohttp_retry.JitterRetry(
+        attempts=num_attempts,
+        retry_all_server_errors=True,
+        # the host is rate limiting us, try again after a while
+        statuses={429},
+    )
+    return aiohttp_retry.RetryClient(
         retry_options=retry_options,
         trace_configs=[trace_config],
         # respect proxy settings and .netrc
         trust_env=True,
     )
 
-    async with retry_client as session:
-        tasks: Set[asyncio.Task] = set()
 
-        for url, download_path in files_to_download.items():
-            if len(tasks) >= concurrency_limit:
-                # Wait for some download to finish before adding a new one
-                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
-                # Check for exceptions
-                try:
-                    await asyncio.gather(*done)
-                except FetchError:
-                    # Close retry_client if any request fails (other tasks can be running,
-                    # if a task is closed with the client open, an Warning is raised).
-                    await retry_client.close()
-                    for t in tasks:
-                        t.cancel()
-                    raise
+class DownloadService:
+    """Run the downloads of all package managers in a request on a single event loop.
 
-            tasks.add(
-                asyncio.create_task(
-                    _async_download_binary_file(
-                        session, url, download_path, ssl_context=ssl_context
-                    )
-                )
+    The event loop runs in a background thread and keeps one client session for the whole
+    lifetime of the service, so connections to the same host are kept alive and reused
+    across package managers (and across the architectures of an RPM lockfile). All downloads
+    share one budget of concurrent requests (and the per-host limits), no matter how many callers
+    submit them. The per-host download metrics get logged when the service stops.
+    """
+
+    def __init__(self, concurrency_limit: int) -> None:
+        """Initialize a DownloadService, the service needs to be started using 'with'."""
+        self.concurrency_limit = concurrency_limit
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="download-service", daemon=True
+        )
+        self._session: Optional[aiohttp_retry.RetryClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._host_limits: Optional[HostLimits] = None
+
+    def __enter__(self) -> "DownloadService":
+        self._thread.start()
+        self._run(self._start())
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        try:
+            if self._session is not None:
+                self._run(self._session.close())
+            if self._host_limits is not None:
+                self._host_limits.log_stats()
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+
+    async def _start(self) -> None:
+        # the session and the semaphore must be created inside the service's loop
+        self._host_limits = HostLimits.from_config()
+        self._session = _create_retry_client(self._host_limits)
+        self._semaphore = asyncio.Semaphore(self.concurrency_limit)
+
+    def _run(self, coro: Coroutine[Any, Any, T]) -> T:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def download_files(
+        self,
+        files_to_download: Dict[str, Union[str, PathLike[str]]],
+        ssl_context: Optional[ssl.SSLContext] = None,
+        checksums: Optional[Mapping[str, Collection[ChecksumInfo]]] = None,
+        sizes: Optional[Mapping[str, int]] = None,
+        discard_mismatches: bool = False,
+    ) -> None:
+        """Download files on the service's loop, block until all of them are done.
+
+        See async_download_files for the description of the parameters.
+        """
+        self._run(
+            async_download_files(
+                files_to_download,
+                self.concurrency_limit,
+                ssl_context=ssl_context,
+                checksums=checksums,
+                sizes=sizes,
+                discard_mismatches=discard_mismatches,
+                session=self._session,
+                semaphore=self._semaphore,
+                host_limits=self._host_limits,
             )
+        )
+
+
+_download_service: Optional[DownloadService] = None
+
+
+@contextmanager
+def shared_download_service() -> Iterator[DownloadService]:
+    """Start a download service that download_files() will use until the context exits."""
+    global _download_service
+
+    with DownloadService(get_config().concurrency_limit) as service:
+        _download_service = service
+        try:
+            yield service
+        finally:
+            _download_service = None
 
-        await asyncio.gather(*tasks)
+
+def download_files(
+    files_to_download: Dict[str, Union[str, PathLike[str]]],
+    ssl_context: Optional[ssl.SSLContext] = None,
+    checksums: Optional[Mapping[str, Collection[ChecksumInfo]]] = None,
+    sizes: Optional[Mapping[str, int]] = None,
+    discard_mismatches: bool = False,
+) -> None:
+    """Download files, block until all of them are done.
+
+    Use the shared download service if one is running, otherwise run the downloads
+    in a new event loop.
+
+    See async_download_files for the description of the parameters.
+    """
+    kwargs: dict[str, Any] = {
+        "ssl_context": ssl_context,
+        "checksums": checksums,
+        "sizes": sizes,
+        "discard_mismatches": discard_mismatches,
+    }
+    if _download_service is not None:
+        _download_service.download_files(files_to_download, **kwargs)
+    else:
+        asyncio.run(
+            async_download_files(files_to_download, get_config().concurrency_limit, **kwargs)
+        )
+
+
+def _restore_from_cache(
+    cache: ArtifactCache,
+    files_to_download: Dict[str, Union[str, PathLike[str]]],
+    checksums: Mapping[str, Collection[ChecksumInfo]],
+    sizes: Mapping[str, int],
+) -> Dict[str, Union[str, PathLike[str]]]:
+    """Restore verified cached files, return the files which still need to be downloaded."""
+    remaining: Dict[str, Union[str, PathLike[str]]] = {}
+
+    for url, download_path in files_to_download.items():
+        if url in checksums and cache.restore(checksums[url], download_path, sizes.get(url)):
+            continue
+        # never write into an existing file, it may be a hard link to a cached artifact
+        Path(download_path).unlink(missing_ok=True)
+        remaining[url] = download_path
+
+    restored = len(files_to_download) - len(remaining)
+    if restored:
+        log.info("Restored %d file(s) from the artifact cache", restored)
+    return remaining
+
+
+async def _store_in_cache(
+    cache: ArtifactCache,
+    download_path: Union[str, PathLike[str]],
+    checksums: Collection[ChecksumInfo],
+    hexdigests: Mapping[str, str],
+) -> None:
+    """Store a verified download in the artifact cache, a cache failure never fails the download.
+
+    Reuses the digests computed while downloading, the file isn't read again unless some are
+    missing. Runs in an executor, to keep the file operations off the event loop.
+    """
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            None, cache.store, download_path, checksums, hexdigests
+        )
+    except Exception as e:
+        log.warning("Failed to store %s in the artifact cache: %s", Path(download_path).name, e)
 
 
 def extract_git_info(vcs_url: str) -> dict[str, Any]:
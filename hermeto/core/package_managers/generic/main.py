@@ -1,4 +1,3 @@
-import asyncio
 import logging
 import os
 from pathlib import Path
@@ -8,13 +7,12 @@ import yaml
 from pydantic import ValidationError
 
 from hermeto import APP_NAME
-from hermeto.core.checksum import must_match_any_checksum
-from hermeto.core.config import get_config
+from hermeto.core.checksum import ChecksumInfo
 from hermeto.core.errors import PackageRejected
 from hermeto.core.models.input import Request
 from hermeto.core.models.output import RequestOutput
 from hermeto.core.models.sbom import Component
-from hermeto.core.package_managers.general import async_download_files
+from hermeto.core.package_managers.general import download_files
 from hermeto.core.package_managers.generic.models import GenericLockfileV1
 from hermeto.core.rooted_path import RootedPath
 
@@ -64,17 +62,16 @@ def _resolve_generic_lockfile(lockfile_path: Path, output_dir: RootedPath) -> li
     log.info(f"Reading generic lockfile: {lockfile_path}")
     lockfile = _load_lockfile(lockfile_path, output_dir)
     to_download: dict[str, Union[str, os.PathLike[str]]] = {}
+    checksums: dict[str, list[ChecksumInfo]] = {}
 
     for artifact in lockfile.artifacts:
         # create the parent directory for the artifact
         Path.mkdir(Path(artifact.filename).parent, parents=True, exist_ok=True)
         to_download[str(artifact.download_url)] = artifact.filename
+        checksums[str(artifact.download_url)] = [artifact.formatted_checksum]
 
-    asyncio.run(async_download_files(to_download, get_config().concurrency_limit))
-
-    # verify checksums
-    for artifact in lockfile.artifacts:
-        must_match_any_checksum(artifact.filename, [artifact.formatted_checksum])
+    # checksums are verified while downloading
+    download_files(to_download, checksums=checksums)
     return [artifact.get_sbom_component() for artifact in lockfile.artifacts]
 
 
@@ -5,6 +5,7 @@ import shutil
 import subprocess
 import tempfile
 from collections import UserDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from functools import cached_property
 from itertools import chain
@@ -13,6 +14,7 @@ from types import TracebackType
 from typing import (
     TYPE_CHECKING,
     Any,
+    Generator,
     Iterable,
     Iterator,
     Literal,
@@ -45,7 +47,14 @@ from hermeto.core.models.property_semantics import PropertySet
 from hermeto.core.models.sbom import Component
 from hermeto.core.rooted_path import RootedPath
 from hermeto.core.scm import get_repo_id
-from hermeto.core.utils import get_cache_dir, load_json_stream, run_cmd
+from hermeto.core.utils import (
+    get_cache_dir,
+    iter_json_stream,
+    link_or_copy_file,
+    load_json_stream,
+    run_cmd,
+    stream_cmd,
+)
 
 log = logging.getLogger(__name__)
 
@@ -54,6 +63,9 @@ GOMOD_DOC = "https://github.com/hermetoproject/hermeto/blob/main/docs/gomod.md"
 GOMOD_INPUT_DOC = f"{GOMOD_DOC}#specifying-modules-to-process"
 VENDORING_DOC = f"{GOMOD_DOC}#vendoring"
 
+# the GOPROXY the go command uses when none is set
+DEFAULT_GOPROXY = "https://proxy.golang.org,direct"
+
 ModuleDict = dict[str, Any]
 
 
@@ -119,6 +131,7 @@ class ResolvedGoModule(NamedTuple):
 
     parsed_main_module: ParsedModule
     parsed_modules: Iterable[ParsedModule]
+    # listed lazily, 'go list' runs (and may fail) while the packages are being consumed
     parsed_packages: Iterable[ParsedPackage]
     modules_in_go_sum: frozenset["ModuleID"]
 
@@ -273,16 +286,40 @@ class Go:
         if params is None:
             params = {}
 
+        cmd = self._full_cmd(cmd)
+        if retry:
+            return self._retry(cmd, **params)
+
+        return self._run(cmd, **params)
+
+    def stream(self, cmd: list[str], params: Optional[dict] = None) -> Generator[str, None, None]:
+        """Run a Go command, yield its output in chunks as the command produces it.
+
+        Meant for commands with huge outputs, the output is never held in memory as a whole.
+        Unlike __call__, this doesn't support retries.
+
+        :param cmd: Go CLI options
+        :param params: additional subprocess arguments, e.g. 'env'
+        :returns: generator of the chunks of the Go command's output
+        :raises PackageManagerError: if the command fails (after all its output was yielded)
+        """
+        cmd = self._full_cmd(cmd)
+        try:
+            log.debug(f"Running '{cmd}'")
+            yield from stream_cmd(cmd, params or {})
+        except subprocess.CalledProcessError as e:
+            rc = e.returncode
+            raise PackageManagerError(
+                f"Go execution failed: `{' '.join(cmd)}` failed with {rc=}"
+            ) from e
+
+    def _full_cmd(self, cmd: list[str]) -> list[str]:
         # we check both values to silence the type checker complaining self._release might be None
         if self._install_toolchain and self._release:
             self._bin = self._install(self._release)
             self._install_toolchain = False
 
-        cmd = [self._bin] + cmd
-        if retry:
-            return self._retry(cmd, **params)
-
-        return self._run(cmd, **params)
+        return [self._bin] + cmd
 
     @property
     def version(self) -> version.Version:
@@ -583,11 +620,53 @@ def _create_modules_from_parsed_data(
     return [_create_module(module) for module in parsed_modules]
 
 
+class _ModuleTrie:
+    """A trie of module names, split into path segments, for finding the modules of packages.
+
+    Looking up the parent module of an import path costs one step per path segment, no matter
+    how many modules there are.
+    """
+
+    # path segments can't be empty, so the empty string can't clash with any of them
+    _MODULE = ""
+
+    def __init__(self, modules: Iterable[tuple[str, Module]]) -> None:
+        """Build the trie from (name, module) pairs."""
+        self._root: dict[str, Any] = {}
+        for name, module in modules:
+            node = self._root
+            for segment in name.split("/"):
+                node = node.setdefault(segment, {})
+            node[self._MODULE] = module
+
+    def longest_prefix(self, import_path: str) -> Optional[Module]:
+        """Return the module with the longest name that is a parent path of the import path."""
+        node = self._root
+        match = None
+        for segment in import_path.split("/"):
+            if segment not in node:
+                break
+            node = node[segment]
+            match = node.get(self._MODULE, match)
+        return match
+
+
+def _relative_import_path(import_path: str, module_name: str) -> str:
+    """Return the import path of a package relative to the name of its module."""
+    if import_path == module_name:
+        return ""
+    if not import_path.startswith(f"{module_name}/"):
+        raise ValueError(f"{import_path} is not a package of the {module_name} module")
+    return import_path[len(module_name) + 1 :]
+
+
 def _create_packages_from_parsed_data(
     modules: list[Module], parsed_packages: Iterable[ParsedPackage]
 ) -> list[Union[Package, StandardPackage]]:
     # in case of replacements, the packages still refer to their parent module by its original name
     indexed_modules = {module.original_name: module for module in modules}
+    # only built if there are packages without module info
+    module_trie: Optional[_ModuleTrie] = None
 
     def _create_package(package: ParsedPackage) -> Union[Package, StandardPackage]:
         if package.standard:
@@ -598,30 +677,23 @@ def _create_packages_from_parsed_data(
         else:
             module = indexed_modules[package.module.path]
 
-        relative_path = _resolve_package_relative_path(package, module)
+        relative_path = _relative_import_path(package.import_path, module.original_name)
 
-        return Package(relative_path=str(relative_path), module=module)
+        return Package(relative_path=relative_path, module=module)
 
     def _find_parent_module_by_name(package: ParsedPackage) -> Module:
-        """Return the longest module name that is contained in package's import_path."""
-        path = Path(package.import_path)
+        """Return the module with the longest name that is contained in package's import_path."""
+        nonlocal module_trie
+        if module_trie is None:
+            module_trie = _ModuleTrie(indexed_modules.items())
 
-        matched_name = max(
-            filter(path.is_relative_to, indexed_modules.keys()),
-            key=len,  # type: ignore
-            default=None,
-        )
+        module = module_trie.longest_prefix(package.import_path)
 
-        if not matched_name:
+        if not module:
             # This should be impossible
             raise RuntimeError("Package parent module was not found")
 
-        return indexed_modules[matched_name]
-
-    def _resolve_package_relative_path(package: ParsedPackage, module: Module) -> str:
-        """Return the path for a package relative to its parent module original name."""
-        relative_path = Path(package.import_path).relative_to(module.original_name)
-        return str(relative_path).removeprefix(".")
+        return module
 
     return [_create_package(package) for package in parsed_packages]
 
@@ -679,41 +751,50 @@ def fetch_gomod_source(request: Request) -> RequestOutput:
                 resolve_result = _resolve_gomod(
                     main_module_dir, request, Path(tmp_dir), version_resolver, go_work
                 )
-            except PackageManagerError:
-                log.error("Failed to fetch gomod dependencies")
-                raise
 
-            main_module = _create_main_module_from_parsed_data(
-                main_module_dir, repo_name, resolve_result.parsed_main_module
-            )
+                main_module = _create_main_module_from_parsed_data(
+                    main_module_dir, repo_name, resolve_result.parsed_main_module
+                )
 
-            modules = [main_module]
-            modules.extend(
-                _create_modules_from_parsed_data(
-                    main_module,
-                    main_module_dir,
-                    resolve_result.parsed_modules,
-                    resolve_result.modules_in_go_sum,
-                    version_resolver,
-                    go_work,
+                modules = [main_module]
+                modules.extend(
+                    _create_modules_from_parsed_data(
+                        main_module,
+                        main_module_dir,
+                        resolve_result.parsed_modules,
+                        resolve_result.modules_in_go_sum,
+                        version_resolver,
+                        go_work,
+                    )
                 )
-            )
 
-            packages = _create_packages_from_parsed_data(modules, resolve_result.parsed_packages)
+                # the packages are listed by 'go list' while they are being consumed here
+                packages = _create_packages_from_parsed_data(
+                    modules, resolve_result.parsed_packages
+                )
+            except PackageManagerError:
+                log.error("Failed to fetch gomod dependencies")
+                raise
 
             components.extend(module.to_component() for module in modules)
             components.extend(package.to_component() for package in packages)
 
         tmp_download_cache_dir = Path(tmp_dir).joinpath("pkg/mod/cache/download")
         if tmp_download_cache_dir.exists():
+            module_cache = GoModuleCache.from_config()
+            if module_cache:
+                module_cache.store(tmp_download_cache_dir)
+
             log.debug(
                 "Adding dependencies from %s to %s",
                 tmp_download_cache_dir,
                 gomod_download_dir,
             )
+            # the temporary directory gets deleted, linking the files is enough
             shutil.copytree(
                 tmp_download_cache_dir,
                 str(gomod_download_dir),
+                copy_function=_link_or_copy_over,
                 dirs_exist_ok=True,
             )
 
@@ -928,9 +1009,10 @@ def _go_list_deps(
     complete module list (roughly matching the list of downloaded modules).
     """
     cmd = ["list", "-e", "-deps", "-json=ImportPath,Module,Standard,Deps", pattern]
+    # the output can be hundreds of MBs for big projects, parse it while go list produces it
     return map(
         ParsedPackage.model_validate,
-        load_json_stream(go(cmd, run_params)),
+        iter_json_stream(go.stream(cmd, run_params)),
     )
 
 
@@ -954,15 +1036,35 @@ def _parse_packages(go_work: GoWork, go: Go, run_params: dict[str, Any]) -> Iter
     else:
         # If there are workspace modules we need to run 'list -e ./...' under every local module
         # path because 'go list' command isn't fully properly workspace context aware
-        for wsp in go_work.workspace_paths(go, run_params):
+        def list_workspace_packages(wsp: RootedPath) -> list[ParsedPackage]:
             log.debug(f"Querying workspace module '{wsp.path}' for list of packages")
-
             packages = list(_go_list_deps(go, "./...", run_params | {"cwd": wsp.path}))
-            log.debug(packages)
-            all_packages = chain(all_packages, packages)
+            log.debug(f"Found {len(packages)} packages in workspace module '{wsp.path}'")
+            return packages
+
+        workspace_paths = list(go_work.workspace_paths(go, run_params))
+        # the queries are read-only and spend their time in the go subprocesses, threads
+        # are good enough to run them concurrently
+        max_workers = max(1, min(get_config().concurrency_limit, len(workspace_paths)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # map() returns the results in workspace order, keeping the output deterministic
+            results = executor.map(list_workspace_packages, workspace_paths)
+            all_packages = _deduplicate_packages(chain.from_iterable(results))
     return iter(all_packages)
 
 
+def _deduplicate_packages(packages: Iterable[ParsedPackage]) -> list[ParsedPackage]:
+    """Drop the packages that were already listed, keep the first occurrence of each one.
+
+    Workspace modules depend on each other and on the same modules, the queries in different
+    workspace modules list many of the same packages.
+    """
+    unique_packages: dict[str, ParsedPackage] = {}
+    for package in packages:
+        unique_packages.setdefault(package.import_path, package)
+    return list(unique_packages.values())
+
+
 def _resolve_gomod(
     app_dir: RootedPath,
     request: Request,
@@ -1009,6 +1111,10 @@ def _resolve_gomod(
     if config.goproxy_url:
         env["GOPROXY"] = config.goproxy_url
 
+    module_cache = GoModuleCache.from_config()
+    if module_cache:
+        env["GOPROXY"] = module_cache.goproxy(config.goproxy_url)
+
     if "cgo-disable" in request.flags:
         env["CGO_ENABLED"] = "0"
 
@@ -1239,6 +1345,81 @@ class GoCacheTemporaryDirectory(tempfile.TemporaryDirectory[str]):
             super().__exit__(exc, value, tb)
 
 
+class GoModuleCache:
+    """Go modules downloaded in previous runs, shared across runs and gomod packages.
+
+    The cache has the layout of the module download cache (<root>/cache/download), which is
+    also the layout of a module proxy, so the go command can use it as a file:// GOPROXY. Only
+    the files a proxy serves for a specific version are kept (.info, .mod and .zip). Version
+    lists are not, looking up the latest versions always falls through to the next proxy.
+
+    Nothing in the cache is trusted: the go command verifies the modules it gets from the cache
+    against go.sum (and the checksum database) just like the ones it downloads.
+    """
+
+    CACHED_SUFFIXES = (".info", ".mod", ".zip")
+
+    def __init__(self, root: Path) -> None:
+        """Initialize a GoModuleCache rooted at the specified directory."""
+        self.root = root
+
+    @classmethod
+    def from_config(cls) -> Optional["GoModuleCache"]:
+        """Return the default cache if enabled in the configuration, None otherwise."""
+        if not get_config().gomod_cache_enabled:
+            return None
+        return cls(get_cache_dir() / "gomod")
+
+    @property
+    def download_dir(self) -> Path:
+        """Return the directory that serves as the module proxy."""
+        return self.root / "cache" / "download"
+
+    def goproxy(self, fallback: str) -> str:
+        """Return the GOPROXY value which uses the cache first, then the fallback proxies.
+
+        The go command only falls back to the next proxy if a module is not found in the
+        cache, which is what we want.
+        """
+        self.download_dir.mkdir(parents=True, exist_ok=True)
+        return f"{self.download_dir.as_uri()},{fallback or DEFAULT_GOPROXY}"
+
+    def store(self, download_dir: Path) -> None:
+        """Add the modules from a module download cache that are not in the cache yet.
+
+        Should only be called with modules which the go command already verified.
+        """
+        stored = 0
+        for dirpath, dirnames, filenames in os.walk(download_dir):
+            if Path(dirpath) == download_dir and "sumdb" in dirnames:
+                # checksum database tiles, the go command keeps those in GOMODCACHE as well
+                dirnames.remove("sumdb")
+
+            relpath = Path(dirpath).relative_to(download_dir)
+            for filename in filenames:
+                if relpath.name != "@v" or not filename.endswith(self.CACHED_SUFFIXES):
+                    continue
+
+                entry = self.download_dir / relpath / filename
+                if entry.exists():
+                    continue
+
+                entry.parent.mkdir(parents=True, exist_ok=True)
+                tmp_entry = entry.with_name(f"{entry.name}.{os.getpid()}.tmp")
+                tmp_entry.unlink(missing_ok=True)
+                link_or_copy_file(Path(dirpath, filename), tmp_entry)
+                os.replace(tmp_entry, entry)
+                stored += 1
+
+        log.debug("Added %d files to the Go module cache in %s", stored, self.root)
+
+
+def _link_or_copy_over(src: str, dst: str) -> None:
+    """Hard-link (or copy) src to dst, replacing dst if it exists. Usable with shutil.copytree."""
+    Path(dst).unlink(missing_ok=True)
+    link_or_copy_file(Path(src), Path(dst))
+
+
 class ModuleVersionResolver:
     """Resolves the versions of Go modules in a git repository."""
 
@@ -1252,6 +1433,11 @@ class ModuleVersionResolver:
         """Fetch tags from a git Repo and return a ModuleVersionResolver."""
         repo = git.Repo(repo_path)
         commit = repo.commit(repo.rev_parse("HEAD").hexsha)
+
+        if get_config().gomod_skip_tag_fetch and repo.git.for_each_ref("--count=1", "refs/tags"):
+            log.debug("The repository already has tags, not fetching them from the remote")
+            return cls(repo, commit)
+
         try:
             repo.remote().fetch(force=True, tags=True)
         except Exception as ex:
@@ -1264,56 +1450,76 @@ class ModuleVersionResolver:
         return cls(repo, commit)
 
     @cached_property
-    def _commit_tags(self) -> list[str]:
-        """Return the git tags pointing to the current commit."""
-        return self._get_commit_tags()
-
-    @cached_property
-    def _all_tags(self) -> list[str]:
-        """Return all of the git tags pointing to the current and preceding commits."""
-        return self._get_commit_tags(all_reachable=True)
-
-    def _get_commit_tags(self, all_reachable: bool = False) -> list[str]:
+    def _reachable_tags(self) -> dict[str, bool]:
         """
-        Return all of the tags associated with the current commit.
+        Return the tags on the current commit and all commits preceding it.
+
+        A single git command lists them all, along with the commits they point to.
 
-        :param all_reachable: True to get all tags on the current commit and all commits preceding
-                              it. False to get the tags on the current commit only.
-        :return: a list of tag names
-        :raises GitCommandError: if failed to fetch the tags on the Git repository
+        :return: the tag names (in git's order), mapped to whether they are on the current commit
+        :raises GitCommandError: if failed to get the tags from the Git repository
         """
+        # Get all the tags on the input commit and all that precede it.
+        # This is based on:
+        # https://github.com/golang/go/blob/0ac8739ad5394c3fe0420cf53232954fefb2418f/src/cmd/go/internal/modfetch/codehost/git.go#L659-L695
+        cmd = [
+            "git",
+            "for-each-ref",
+            # the object the tag points to and, for annotated tags, the commit it points to
+            "--format",
+            "%(refname:lstrip=2) %(objectname) %(*objectname)",
+            "refs/tags",
+            "--merged",
+            self._commit.hexsha,
+        ]
         try:
-            if all_reachable:
-                # Get all the tags on the input commit and all that precede it.
-                # This is based on:
-                # https://github.com/golang/go/blob/0ac8739ad5394c3fe0420cf53232954fefb2418f/src/cmd/go/internal/modfetch/codehost/git.go#L659-L695
-                cmd = [
-                    "git",
-                    "for-each-ref",
-                    "--format",
-                    "%(refname:lstrip=2)",
-                    "refs/tags",
-                    "--merged",
-                    self._commit.hexsha,
-                ]
-            else:
-                # Get the tags that point to this commit
-                cmd = ["git", "tag", "--points-at", self._commit.hexsha]
-
-            tag_names = self._repo.git.execute(
+            output = self._repo.git.execute(
                 cmd,
                 # these args are the defaults, but are required to let mypy know which override to match
                 # (the one that returns a string)
                 with_extended_output=False,
                 as_process=False,
                 stdout_as_string=True,
-            ).splitlines()
+            )
         except git.GitCommandError:
             msg = f"Failed to get the tags associated with the reference {self._commit.hexsha}"
             log.error(msg)
             raise
 
-        return tag_names
+        reachable_tags = {}
+        for line in output.splitlines():
+            # tag names can't contain spaces
+            tag_name, *objects = line.split(" ")
+            reachable_tags[tag_name] = self._commit.hexsha in objects
+        return reachable_tags
+
+    @cached_property
+    def _highest_semver_tags(self) -> dict[tuple[bool, Optional[str], int], str]:
+        """
+        Index the highest semantic version tags, parsing each tag only once.
+
+        :return: the names of the highest tags by (all_reachable, subpath, major version), where
+            all_reachable is False for the tags on the current commit, True for all of them
+        """
+        highest: dict[tuple[bool, Optional[str], int], tuple[semver.version.Version, str]] = {}
+
+        for tag_name, on_commit in self._reachable_tags.items():
+            # tags of modules in subdirectories are prefixed with the subpath, e.g. foo/v1.0.0
+            subpath, _, version_part = tag_name.rpartition("/")
+            if not version_part.startswith("v"):
+                continue
+            try:
+                semantic_version = self._get_semantic_version_from_tag(tag_name, subpath or None)
+            except ValueError:
+                log.debug("%s is not a semantic version tag", tag_name)
+                continue
+
+            for all_reachable in (True, False) if on_commit else (True,):
+                key = (all_reachable, subpath or None, semantic_version.major)
+                if key not in highest or semantic_version > highest[key][0]:
+                    highest[key] = (semantic_version, tag_name)
+
+        return {key: tag_name for key, (_, tag_name) in highest.items()}
 
     def get_golang_version(
         self,
@@ -1429,32 +1635,10 @@ class ModuleVersionResolver:
         :param subpath: path to the module, relative to the root repository folder
         :return: the highest semantic version tag if one is found
         """
-        tag_names = self._all_tags if all_reachable else self._commit_tags
-
-        # Keep only semantic version tags related to the path being processed
-        prefix = f"{subpath}/v" if subpath else "v"
-        filtered_tags = [tag_name for tag_name in tag_names if tag_name.startswith(prefix)]
-
-        not_semver_tag_msg = "%s is not a semantic version tag"
-        highest: Optional[dict[str, Any]] = None
-
-        for tag_name in filtered_tags:
-            try:
-                semantic_version = self._get_semantic_version_from_tag(tag_name, subpath)
-            except ValueError:
-                log.debug(not_semver_tag_msg, tag_name)
-                continue
-
-            # If the major version of the semantic version tag doesn't match the Go module's major
-            # version, then ignore it
-            if semantic_version.major != major_version:
-                continue
-
-            if highest is None or semantic_version > highest["semver"]:
-                highest = {"tag": tag_name, "semver": semantic_version}
-
-        if highest:
-            return self._repo.tags[highest["tag"]]
+        tag_name = self._highest_semver_tags.get((all_reachable, subpath, major_version))
+        if tag_name:
+            # same as self._repo.tags[tag_name], without listing all the tags
+            return git.TagReference(self._repo, f"refs/tags/{tag_name}")
 
         return None
 
@@ -24,4 +24,4 @@ def fetch_yarn_source(request: Request) -> RequestOutput:
                 fetched_packages.append(fetch_yarnberry_source(new_request))
             else:
                 raise e
-    return sum(fetched_packages, RequestOutput.empty())
+    return RequestOutput.merge_all(fetched_packages)
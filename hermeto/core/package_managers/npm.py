@@ -1,26 +1,25 @@
-import asyncio
 import copy
 import fnmatch
 import functools
 import json
 import logging
 import os.path
+from concurrent.futures import Future
 from pathlib import Path
 from typing import Any, Dict, Literal, NewType, Optional, TypedDict
 from urllib.parse import urlparse
 
 from packageurl import PackageURL
 
-from hermeto.core.checksum import ChecksumInfo, must_match_any_checksum
-from hermeto.core.config import get_config
+from hermeto.core.checksum import ChecksumInfo
 from hermeto.core.errors import PackageRejected, UnexpectedFormat, UnsupportedFeature
 from hermeto.core.models.input import Request
 from hermeto.core.models.output import ProjectFile, RequestOutput
 from hermeto.core.models.property_semantics import PropertySet
 from hermeto.core.models.sbom import Component
-from hermeto.core.package_managers.general import async_download_files
+from hermeto.core.package_managers.general import download_files
 from hermeto.core.rooted_path import RootedPath
-from hermeto.core.scm import RepoID, clone_as_tarball, get_repo_id
+from hermeto.core.scm import GitFetchPool, RepoID, clone_as_tarball, get_repo_id
 
 DEPENDENCY_TYPES = (
     "dependencies",
@@ -497,59 +496,65 @@ def _get_npm_dependencies(
     """
     files_to_download: dict[str, dict[str, Any]] = {}
     download_paths = {}
-    for url, info in deps_to_download.items():
-        url = _normalize_resolved_url(url)
-        dep_type = _classify_resolved_url(url)
+    git_downloads: dict[NormalizedUrl, Future[RootedPath]] = {}
+    with GitFetchPool.from_config() as git_pool:
+        for url, info in deps_to_download.items():
+            url = _normalize_resolved_url(url)
+            dep_type = _classify_resolved_url(url)
 
-        if dep_type == "file":
-            continue
-        elif dep_type == "git":
-            download_paths[url] = _clone_repo_pack_archive(url, download_dir)
-        else:
-            if dep_type == "registry":
-                archive_name = f'{info["name"]}-{info["version"]}.tgz'.removeprefix("@").replace(
-                    "/", "-"
+            if dep_type == "file":
+                continue
+            elif dep_type == "git":
+                # clone the git dependencies while the tarballs are being downloaded
+                git_downloads[url] = git_pool.submit(
+                    url, _clone_repo_pack_archive, url, download_dir
                 )
-                download_paths[url] = download_dir.join_within_root(archive_name)
-            else:  # dep_type == "https"
-                if info["integrity"]:
-                    algorithm, digest = ChecksumInfo.from_sri(info["integrity"])
-                else:
-                    raise PackageRejected(
-                        f"{info['name']} is missing integrity checksum. It is mandatory"
-                        f"for https dependencies.",
-                        solution="Please double-check provided package-lock.json that"
-                        " your dependencies specify integrity. Try to "
-                        "rerun `npm install` on your repository.",
+            else:
+                if dep_type == "registry":
+                    archive_name = f'{info["name"]}-{info["version"]}.tgz'.removeprefix(
+                        "@"
+                    ).replace("/", "-")
+                    download_paths[url] = download_dir.join_within_root(archive_name)
+                else:  # dep_type == "https"
+                    if info["integrity"]:
+                        algorithm, digest = ChecksumInfo.from_sri(info["integrity"])
+                    else:
+                        raise PackageRejected(
+                            f"{info['name']} is missing integrity checksum. It is mandatory"
+                            f"for https dependencies.",
+                            solution="Please double-check provided package-lock.json that"
+                            " your dependencies specify integrity. Try to "
+                            "rerun `npm install` on your repository.",
+                        )
+                    download_paths[url] = download_dir.join_within_root(
+                        f"external-{info['name']}",
+                        f"{info['name']}-external-{algorithm}-{digest}.tgz",
                     )
-                download_paths[url] = download_dir.join_within_root(
-                    f"external-{info['name']}",
-                    f"{info['name']}-external-{algorithm}-{digest}.tgz",
-                )
 
-                # Create missing directories
-                directory = os.path.dirname(download_paths[url])
-                os.makedirs(directory, exist_ok=True)
+                    # Create missing directories
+                    directory = os.path.dirname(download_paths[url])
+                    os.makedirs(directory, exist_ok=True)
 
-            files_to_download[url] = {
-                "download_path": download_paths[url],
-                "integrity": info["integrity"],
-            }
+                files_to_download[url] = {
+                    "download_path": download_paths[url],
+                    "integrity": info["integrity"],
+                }
 
-    # Asynchronously download tar files
-    asyncio.run(
-        async_download_files(
+        # Asynchronously download tar files
+        download_files(
             {url: item["download_path"] for (url, item) in files_to_download.items()},
-            get_config().concurrency_limit,
+            checksums={
+                url: [ChecksumInfo.from_sri(str(item["integrity"]))]
+                for (url, item) in files_to_download.items()
+                if item["integrity"]
+            },
         )
-    )
-    # Check integrity of downloaded packages
+        for url, git_download in git_downloads.items():
+            download_paths[url] = git_download.result()
+
+    # Integrity of downloaded packages is checked while downloading
     for url, item in files_to_download.items():
-        if item["integrity"]:
-            must_match_any_checksum(
-                item["download_path"], [ChecksumInfo.from_sri(str(item["integrity"]))]
-            )
-        else:
+        if not item["integrity"]:
             log.warning("Missing integrity for %s, integrity check skipped.", url)
 
     return download_paths
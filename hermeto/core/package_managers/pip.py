@@ -1,9 +1,9 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import ast
-import asyncio
 import configparser
 import functools
 import io
+import itertools
 import logging
 import os
 import os.path
@@ -12,6 +12,7 @@ import tarfile
 import urllib
 import zipfile
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from os import PathLike
 from pathlib import Path
@@ -20,6 +21,7 @@ from typing import (
     IO,
     TYPE_CHECKING,
     Any,
+    Collection,
     Iterable,
     Iterator,
     Literal,
@@ -36,7 +38,7 @@ from pybuild_deps import parsers
 from hermeto import APP_NAME
 from hermeto.core.models.input import CargoPackageInput
 from hermeto.core.rooted_path import RootedPath
-from hermeto.core.scm import clone_as_tarball, get_repo_id
+from hermeto.core.scm import GitFetchPool, clone_as_tarball, get_repo_id
 
 if TYPE_CHECKING:
     from typing_extensions import TypeGuard
@@ -55,10 +57,11 @@ from hermeto.core.models.property_semantics import PropertySet
 from hermeto.core.models.sbom import Component
 from hermeto.core.package_managers.cargo import fetch_cargo_source
 from hermeto.core.package_managers.general import (
-    async_download_files,
     download_binary_file,
+    download_files,
     extract_git_info,
 )
+from hermeto.core.package_managers.pip_index_cache import ProjectPageCache
 
 log = logging.getLogger(__name__)
 
@@ -231,7 +234,7 @@ def fetch_pip_source(request: Request) -> RequestOutput:
     )
 
     cargo_packages = _find_and_fetch_rust_dependencies(request, packages_containing_rust_code)
-    return pip_packages + cargo_packages
+    return RequestOutput.merge_all([pip_packages, cargo_packages])
 
 
 def _config_data() -> str:
@@ -270,7 +273,7 @@ def _find_and_fetch_rust_dependencies(
         ev = [EnvironmentVariable(name="CARGO_HOME", value="${output_dir}/.cargo")]
         pf = [ProjectFile(abspath=_config_path(request), template=_config_data())]
 
-        return result + RequestOutput.from_obj_list([], ev, pf)
+        return RequestOutput.merge_all([result, RequestOutput.from_obj_list([], ev, pf)])
 
     return RequestOutput.from_obj_list([], [], [])
 
@@ -1513,6 +1516,7 @@ def _process_req(
     pip_deps_dir: RootedPath,
     download_info: dict[str, Any],
     dpi: Optional[DistributionPackageInfo] = None,
+    dpi_verified: bool = False,
 ) -> dict[str, Any]:
     download_info["kind"] = req.kind
     download_info["requirement_file"] = str(requirements_file.file_path.subpath_from_root)
@@ -1533,7 +1537,8 @@ def _process_req(
     if dpi:
         if dpi.req_file_checksums:
             download_info["missing_req_file_checksum"] = False
-        if dpi.has_checksums_to_match:
+        # freshly downloaded artifacts have already been verified during the download
+        if dpi.has_checksums_to_match and not dpi_verified:
             _checksum_must_match_or_path_unlink(dpi.path, dpi.checksums_to_match)
         if dpi.package_type == "sdist":
             _check_metadata_in_sdist(dpi.path)
@@ -1563,21 +1568,12 @@ def _process_req(
 def _process_pypi_req(
     req: PipRequirement,
     requirements_file: PipRequirementsFile,
-    index_url: str,
+    artifacts: list[DistributionPackageInfo],
     pip_deps_dir: RootedPath,
-    allow_binary: bool,
+    verified_paths: Collection[Path] = (),
 ) -> list[dict[str, Any]]:
     download_infos: list[dict[str, Any]] = []
 
-    artifacts: list[DistributionPackageInfo] = _process_package_distributions(
-        req, pip_deps_dir, allow_binary, index_url
-    )
-
-    files: dict[str, Union[str, PathLike[str]]] = {
-        dpi.url: dpi.path for dpi in artifacts if not dpi.path.exists()
-    }
-    asyncio.run(async_download_files(files, get_config().concurrency_limit))
-
     for artifact in artifacts:
         download_infos.append(
             _process_req(
@@ -1586,21 +1582,60 @@ def _process_pypi_req(
                 pip_deps_dir,
                 artifact.download_info,
                 dpi=artifact,
+                dpi_verified=artifact.path in verified_paths,
             )
         )
 
     return download_infos
 
 
+def _resolve_pypi_reqs(
+    reqs: list[PipRequirement],
+    pip_deps_dir: RootedPath,
+    allow_binary: bool,
+    index_url: str,
+) -> list[list[DistributionPackageInfo]]:
+    """Query the index for all PyPI requirements concurrently.
+
+    :return: the artifacts to download for each of the requirements, in the same order
+    """
+    if not reqs:
+        return []
+
+    def process(req: PipRequirement) -> list[DistributionPackageInfo]:
+        return _process_package_distributions(req, pip_deps_dir, allow_binary, index_url)
+
+    max_workers = min(get_config().concurrency_limit, len(reqs))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(process, reqs))
+
+
+def _download_pypi_artifacts(artifacts: Iterable[DistributionPackageInfo]) -> set[Path]:
+    """Download the artifacts of all PyPI requirements in a single batch.
+
+    Artifacts are verified while being downloaded, the ones that don't match their checksums
+    are left out of the output directory.
+
+    :return: the paths of the artifacts that were downloaded (and verified) now
+    """
+    files: dict[str, Union[str, PathLike[str]]] = {}
+    checksums: dict[str, set[ChecksumInfo]] = {}
+
+    for dpi in artifacts:
+        if dpi.path.exists():
+            continue
+        files[dpi.url] = dpi.path
+        if dpi.has_checksums_to_match:
+            checksums[dpi.url] = dpi.checksums_to_match
+
+    download_files(files, checksums=checksums, discard_mismatches=True)
+    return {Path(path) for path in files.values()}
+
+
 def _process_vcs_req(
-    req: PipRequirement, pip_deps_dir: RootedPath, **kwargs: Any
+    req: PipRequirement, pip_deps_dir: RootedPath, download_info: dict[str, Any], **kwargs: Any
 ) -> dict[str, Any]:
-    return _process_req(
-        req,
-        pip_deps_dir=pip_deps_dir,
-        download_info=_download_vcs_package(req, pip_deps_dir),
-        **kwargs,
-    )
+    return _process_req(req, pip_deps_dir=pip_deps_dir, download_info=download_info, **kwargs)
 
 
 def _process_url_req(
@@ -1655,15 +1690,34 @@ def _download_dependencies(
     pip_deps_dir: RootedPath = output_dir.join_within_root("deps", "pip")
     pip_deps_dir.path.mkdir(parents=True, exist_ok=True)
 
+    vcs_reqs = [req for req in requirements_file.requirements if req.kind == "vcs"]
+    pypi_reqs = [req for req in requirements_file.requirements if req.kind == "pypi"]
+
+    with GitFetchPool.from_config() as git_pool:
+        # clone the VCS dependencies while the PyPI artifacts are being resolved and downloaded
+        vcs_downloads = [
+            git_pool.submit(req.url, _download_vcs_package, req, pip_deps_dir) for req in vcs_reqs
+        ]
+        pypi_artifacts = _resolve_pypi_reqs(
+            pypi_reqs,
+            pip_deps_dir,
+            allow_binary,
+            options["index_url"] or pypi_simple.PYPI_SIMPLE_ENDPOINT,
+        )
+        verified_paths = _download_pypi_artifacts(itertools.chain.from_iterable(pypi_artifacts))
+        vcs_download_infos = iter([future.result() for future in vcs_downloads])
+
+    artifacts_by_req = iter(pypi_artifacts)
+
     for req in requirements_file.requirements:
         log.info("-- Processing requirement line '%s'", req.download_line)
         if req.kind == "pypi":
             download_infos: list[dict[str, Any]] = _process_pypi_req(
                 req,
                 requirements_file=requirements_file,
-                index_url=options["index_url"] or pypi_simple.PYPI_SIMPLE_ENDPOINT,
+                artifacts=next(artifacts_by_req),
                 pip_deps_dir=pip_deps_dir,
-                allow_binary=allow_binary,
+                verified_paths=verified_paths,
             )
             processed.extend(download_infos)
         elif req.kind == "vcs":
@@ -1671,6 +1725,7 @@ def _download_dependencies(
                 req,
                 requirements_file=requirements_file,
                 pip_deps_dir=pip_deps_dir,
+                download_info=next(vcs_download_infos),
             )
             processed.append(download_info)
         elif req.kind == "url":
@@ -1918,13 +1973,6 @@ def _process_package_distributions(
     req_file_checksums = set(map(_to_checksum_info, requirement.hashes))
     wheels: list[DistributionPackageInfo] = []
 
-    try:
-        timeout = get_config().requests_timeout
-        project_page = client.get_project_page(name, timeout)
-        packages: list[pypi_simple.DistributionPackage] = project_page.packages
-    except (requests.RequestException, pypi_simple.NoSuchProjectError) as e:
-        raise FetchError(f"PyPI query failed: {e}")
-
     def _is_valid(pkg: pypi_simple.DistributionPackage) -> bool:
         return (
             pkg.version is not None
@@ -1933,6 +1981,21 @@ def _process_package_distributions(
             and pkg.package_type in allowed_distros
         )
 
+    def _has_valid_packages(page: pypi_simple.ProjectPage) -> bool:
+        return any(map(_is_valid, page.packages))
+
+    try:
+        timeout = get_config().requests_timeout
+        if page_cache := ProjectPageCache.from_config():
+            project_page = page_cache.get_project_page(
+                client, name, timeout, is_complete=_has_valid_packages
+            )
+        else:
+            project_page = client.get_project_page(name, timeout)
+        packages: list[pypi_simple.DistributionPackage] = project_page.packages
+    except (requests.RequestException, pypi_simple.NoSuchProjectError) as e:
+        raise FetchError(f"PyPI query failed: {e}")
+
     for package in packages:
         if not _is_valid(package):
             continue
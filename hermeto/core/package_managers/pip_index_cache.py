@@ -0,0 +1,152 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional, Union
+
+import pypi_simple
+import requests
+from packaging.utils import canonicalize_name
+
+from hermeto.core.config import get_config
+from hermeto.core.utils import get_cache_dir
+
+log = logging.getLogger(__name__)
+
+JSON_CONTENT_TYPE = "application/vnd.pypi.simple.v1+json"
+
+
+class _CachedPage(NamedTuple):
+    url: str
+    content_type: str
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    last_serial: Optional[str]
+
+    def parse(self, project: str) -> pypi_simple.ProjectPage:
+        """Parse the cached response the same way pypi_simple parses a live one."""
+        content_type = self.content_type.split(";")[0].strip()
+        if content_type == JSON_CONTENT_TYPE:
+            page = pypi_simple.ProjectPage.from_json_data(json.loads(self.body), self.url)
+        else:
+            page = pypi_simple.ProjectPage.from_html(project, self.body, self.url)
+        if page.last_serial is None:
+            page.last_serial = self.last_serial
+        return page
+
+
+class ProjectPageCache:
+    """An on-disk cache of PyPI Simple API project pages, shared across runs.
+
+    Pages are stored per (index URL, project) together with their ETag and Last-Modified
+    headers. Cached pages are revalidated with conditional requests, so an unchanged page
+    costs a 304 response instead of a full download. The PEP 691 JSON form of the pages
+    is preferred whenever the index offers it.
+
+    In offline mode, a cached page is used without revalidation as long as it is complete
+    enough for the caller, e.g. it lists the files of the pinned version being resolved.
+    A cached page is also used as a fallback when the index is unreachable.
+    """
+
+    def __init__(self, root: Path, offline: bool = False) -> None:
+        """Initialize a ProjectPageCache rooted at the specified directory."""
+        self.root = root
+        self.offline = offline
+
+    @classmethod
+    def from_config(cls) -> Optional["ProjectPageCache"]:
+        """Return the default cache if enabled in the configuration, None otherwise."""
+        config = get_config()
+        if not config.pypi_index_cache_enabled:
+            return None
+        return cls(get_cache_dir() / "pypi-simple", offline=config.pypi_index_cache_offline)
+
+    def _entry_path(self, index_url: str, project: str) -> Path:
+        index_key = hashlib.sha256(index_url.rstrip("/").encode()).hexdigest()[:16]
+        return self.root.joinpath(index_key, f"{canonicalize_name(project)}.json")
+
+    def _load(self, path: Path) -> Optional[_CachedPage]:
+        try:
+            return _CachedPage(**json.loads(path.read_text()))
+        except FileNotFoundError:
+            return None
+        except (ValueError, TypeError) as e:
+            log.debug("Ignoring malformed PyPI page cache entry %s: %s", path, e)
+            return None
+
+    def _save(self, path: Path, entry: _CachedPage) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # pages may be fetched from several threads at once, don't let them clash
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(entry._asdict()))
+        os.replace(tmp_path, path)
+
+    def get_project_page(
+        self,
+        client: pypi_simple.PyPISimple,
+        project: str,
+        timeout: Union[float, tuple[float, float], None] = None,
+        is_complete: Callable[[pypi_simple.ProjectPage], bool] = lambda page: True,
+    ) -> pypi_simple.ProjectPage:
+        """Get the project page from the cache or from the index the client points to.
+
+        :param client: the client for the index to query
+        :param project: the name of the project, does not need to be normalized
+        :param timeout: timeout for the request to the index
+        :param is_complete: whether a cached page has all the information the caller needs,
+            only complete pages are used without revalidation (offline) or as a fallback
+        :raises NoSuchProjectError: if the index responds with a 404
+        :raises requests.RequestException: if the request fails and there is no usable cached page
+        """
+        path = self._entry_path(client.endpoint, project)
+        cached = self._load(path)
+        cached_page = None
+        if cached:
+            try:
+                cached_page = cached.parse(project)
+            except Exception as e:
+                log.debug("Ignoring unparsable PyPI page cache entry %s: %s", path, e)
+                path.unlink(missing_ok=True)
+                cached = None
+
+        if self.offline and cached_page and is_complete(cached_page):
+            log.debug("Using the cached PyPI page of %s without revalidation", project)
+            return cached_page
+
+        headers = {"Accept": pypi_simple.ACCEPT_JSON_PREFERRED}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
+
+        url = client.get_project_url(project)
+        try:
+            response = client.s.get(url, timeout=timeout, headers=headers)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if cached_page and is_complete(cached_page):
+                log.warning("Failed to query %s (%s), using the cached page instead", url, e)
+                return cached_page
+            raise
+
+        if response.status_code == 304 and cached_page:
+            log.debug("The cached PyPI page of %s is up to date", project)
+            return cached_page
+        if response.status_code == 404:
+            raise pypi_simple.NoSuchProjectError(project, url)
+        response.raise_for_status()
+
+        page = pypi_simple.ProjectPage.from_response(response, project)
+        entry = _CachedPage(
+            url=response.url,
+            content_type=response.headers.get("Content-Type", "text/html"),
+            body=response.text,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+            last_serial=page.last_serial,
+        )
+        self._save(path, entry)
+        return page
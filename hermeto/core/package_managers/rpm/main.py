@@ -1,9 +1,9 @@
-import asyncio
-import hashlib
 import itertools
 import logging
+import os
 import shlex
 import ssl
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
 from dataclasses import dataclass
 from os import PathLike
@@ -15,12 +15,12 @@ from packageurl import PackageURL
 from pydantic import ValidationError
 
 from hermeto import APP_NAME
-from hermeto.core.config import get_config
+from hermeto.core.checksum import ChecksumInfo
 from hermeto.core.errors import PackageManagerError, PackageRejected
 from hermeto.core.models.input import ExtraOptions, Request, SSLOptions
 from hermeto.core.models.output import RequestOutput
 from hermeto.core.models.sbom import Component, Property
-from hermeto.core.package_managers.general import async_download_files
+from hermeto.core.package_managers.general import download_files
 from hermeto.core.package_managers.rpm.redhat import RedhatRpmsLock
 from hermeto.core.rooted_path import RootedPath
 from hermeto.core.utils import run_cmd
@@ -31,8 +31,9 @@ log = logging.getLogger(__name__)
 DEFAULT_LOCKFILE_NAME = "rpms.lock.yaml"
 DEFAULT_PACKAGE_DIR = "deps/rpm"
 
-# during the computing of file checksum read chunk of size 1 MB
-READ_CHUNK = 1048576
+# How many RPM files to query with a single rpm process, keeps the command line reasonably short
+_RPM_QUERY_CHUNK_SIZE = 256
+_RPM_RECORD_SEPARATOR = f"--- {APP_NAME} rpm header ---"
 
 
 @dataclass
@@ -51,10 +52,20 @@ class Package:
     summary: Optional[str] = None
 
     @classmethod
-    def from_filepath(cls, rpm_filepath: Path, rpm_download_metadata: dict[str, Any]) -> "Package":
-        """Instantiate a package dataclass instance from a download RPM file path."""
+    def from_filepath(
+        cls,
+        rpm_filepath: Path,
+        rpm_download_metadata: dict[str, Any],
+        rpm_fields: dict[str, str],
+    ) -> "Package":
+        """Instantiate a package dataclass instance from a download RPM file path.
+
+        :param rpm_filepath: path to the downloaded RPM file
+        :param rpm_download_metadata: download metadata of the RPM file
+        :param rpm_fields: RPM tags of the file, as returned by _query_rpm_fields
+        """
         kwargs: dict[str, Optional[str]] = {}
-        kwargs.update(cls._query_rpm_fields(rpm_filepath))
+        kwargs.update(rpm_fields)
 
         repoid = rpm_download_metadata.get("repoid")
         is_srpm = rpm_filepath.name.endswith("src.rpm")
@@ -76,39 +87,6 @@ class Package:
         log.debug("RPM package attributes for '%s': %s", rpm_filepath, package)
         return package
 
-    @staticmethod
-    def _query_rpm_fields(file_path: Path) -> dict[str, str]:
-        """Query a set of RPM tags.
-
-        Tags which are optional and not set won't be returned in the resulting dict.
-        """
-        ret = {}
-        query_format = (
-            # all nvra macros should be present/mandatory in RPM
-            "name=%{NAME}\n"
-            "version=%{VERSION}\n"
-            "release=%{RELEASE}\n"
-            "arch=%{ARCH}\n"
-            "summary=%{SUMMARY}\n"
-            # vendor and epoch are optional RPM tags; return "" if not set instead of "(None)"
-            "vendor=%|VENDOR?{%{VENDOR}}:{}|\n"
-            "epoch=%|EPOCH?{%{EPOCH}}:{}|\n"
-        )
-        rpm_args = [
-            "-q",
-            "--queryformat",
-            query_format.strip(),
-            str(file_path),
-        ]
-        rpm_fields = run_cmd(cmd=["rpm", *rpm_args], params={})
-        for entry in rpm_fields.split("\n"):
-            key, value = entry.partition("=")[::2]
-            if not value:
-                continue
-            ret[key] = value
-
-        return ret
-
     @property
     def purl(self) -> str:
         """Get the purl for this package."""
@@ -300,7 +278,6 @@ def _resolve_rpm_project(
 
         package_dir = output_dir.join_within_root(DEFAULT_PACKAGE_DIR)
         metadata = _download(redhat_rpms_lock, package_dir.path, ssl_options)
-        _verify_downloaded(metadata)
 
         lockfile_relative_path = source_dir.subpath_from_root / DEFAULT_LOCKFILE_NAME
         return _generate_sbom_components(metadata, lockfile_relative_path, include_summary_in_sbom)
@@ -315,15 +292,17 @@ def _download(
     Download packages and module metadata mentioned in the lockfile.
 
     Go through the parsed lockfile structure and find all RPM, SRPM and module metadata files.
-    Create a metadata structure indexed by destination path used
-    for later verification (size, checksum) after download.
-    Prepare a list of files to be downloaded, and then download files.
+    Create a metadata structure indexed by destination path.
+    Prepare a list of files to be downloaded, and then download files,
+    verifying their size and checksum (if present in the lockfile) along the way.
     """
     metadata = {}
     for arch in lockfile.arches:
         log.info(f"Downloading files for '{arch.arch}' architecture.")
         # files per URL for downloading packages & sources
         files: dict[str, Union[str, PathLike[str]]] = {}
+        checksums: dict[str, list[ChecksumInfo]] = {}
+        sizes: dict[str, int] = {}
         rpm_iterator = zip(itertools.repeat("rpm"), arch.packages)
         srpm_iterator = zip(itertools.repeat("srpm"), arch.source)
         mmd_iterator = zip(itertools.repeat("module_metadata"), arch.module_metadata)
@@ -344,57 +323,73 @@ def _download(
                 "size": pkg.size,
                 "checksum": pkg.checksum,
             }
+            if pkg.checksum:
+                algorithm, _, digest = pkg.checksum.partition(":")
+                checksums[pkg.url] = [ChecksumInfo(algorithm.lower(), digest)]
+            if pkg.size is not None:
+                sizes[pkg.url] = pkg.size
             Path.mkdir(dest.parent, parents=True, exist_ok=True)
 
-        asyncio.run(
-            async_download_files(
-                files,
-                get_config().concurrency_limit,
-                ssl_context=_get_ssl_context(ssl_options=ssl_options) if ssl_options else None,
-            )
+        download_files(
+            files,
+            ssl_context=_get_ssl_context(ssl_options=ssl_options) if ssl_options else None,
+            checksums=checksums,
+            sizes=sizes,
         )
     return metadata
 
 
-def _verify_downloaded(metadata: dict[Path, Any]) -> None:
-    """Use metadata structure with file sizes and checksums for verification \
-    of downloaded packages and sources."""
-    log.debug("Verification of downloaded files has started.")
+def _is_rpm_file(file_path: Path) -> bool:
+    """Check if it's a rpm file."""
+    return file_path.suffix == ".rpm"
 
-    def raise_exception(message: str) -> None:
-        raise PackageRejected(
-            f"Some RPM packages or sources weren't verified after being downloaded: '{message}'",
-            solution=(
-                "Check the source of the data or check the corresponding metadata "
-                "in the lockfile (size, checksum)."
-            ),
-        )
 
-    # check file size and checksum of downloaded files
-    for file_path, file_metadata in metadata.items():
-        # size is optional
-        if file_metadata["size"] is not None:
-            if file_path.stat().st_size != file_metadata["size"]:
-                raise_exception(f"Unexpected file size of '{file_path}' != {file_metadata['size']}")
-
-        # checksum is optional
-        if file_metadata["checksum"] is not None:
-            alg, digest = file_metadata["checksum"].split(":")
-            method = getattr(hashlib, alg.lower(), None)
-            if method is not None:
-                h = method(usedforsecurity=False)
-            else:
-                raise_exception(f"Unsupported hashing algorithm '{alg}' for '{file_path}'")
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(READ_CHUNK), b""):
-                    h.update(chunk)
-            if digest != h.hexdigest():
-                raise_exception(f"Unmatched checksum of '{file_path}' != '{digest}'")
+def _query_rpm_fields(file_paths: list[Path]) -> list[dict[str, str]]:
+    """Query a set of RPM tags of many RPM files.
 
+    The files are queried in chunks, with a single rpm process per chunk, rather than spawning
+    one process per file. Tags which are optional and not set won't be returned in the resulting
+    dicts.
 
-def _is_rpm_file(file_path: Path) -> bool:
-    """Check if it's a rpm file."""
-    return file_path.suffix == ".rpm"
+    :param file_paths: paths to the RPM files
+    :return: the RPM tags of each file, in the same order as file_paths
+    """
+    query_format = (
+        # rpm prints the query results of all the files one after another, mark where each starts
+        f"{_RPM_RECORD_SEPARATOR}\n"
+        # all nvra macros should be present/mandatory in RPM
+        "name=%{NAME}\n"
+        "version=%{VERSION}\n"
+        "release=%{RELEASE}\n"
+        "arch=%{ARCH}\n"
+        "summary=%{SUMMARY}\n"
+        # vendor and epoch are optional RPM tags; return "" if not set instead of "(None)"
+        "vendor=%|VENDOR?{%{VENDOR}}:{}|\n"
+        "epoch=%|EPOCH?{%{EPOCH}}:{}|\n"
+    )
+    results = []
+    for i in range(0, len(file_paths), _RPM_QUERY_CHUNK_SIZE):
+        chunk = file_paths[i : i + _RPM_QUERY_CHUNK_SIZE]
+        rpm_args = ["-qp", "--queryformat", query_format, *map(str, chunk)]
+        rpm_output = run_cmd(cmd=["rpm", *rpm_args], params={})
+
+        records = rpm_output.split(f"{_RPM_RECORD_SEPARATOR}\n")[1:]
+        if len(records) != len(chunk):
+            raise PackageManagerError(
+                f"Expected RPM tags of {len(chunk)} files, got {len(records)}",
+                solution="Please check that the downloaded RPM files are not corrupted.",
+            )
+
+        for record in records:
+            rpm_fields = {}
+            for entry in record.split("\n"):
+                key, value = entry.partition("=")[::2]
+                if not value:
+                    continue
+                rpm_fields[key] = value
+            results.append(rpm_fields)
+
+    return results
 
 
 def _generate_sbom_components(
@@ -402,11 +397,12 @@ def _generate_sbom_components(
     lockfile_path: Path,
     include_summary_in_sbom: bool = False,
 ) -> list[Component]:
+    rpm_files = [file_path for file_path in files_metadata if _is_rpm_file(file_path)]
+    all_rpm_fields = _query_rpm_fields(rpm_files)
+
     components = []
-    for file_path, file_metadata in files_metadata.items():
-        if not _is_rpm_file(file_path):
-            continue
-        package = Package.from_filepath(file_path, file_metadata)
+    for file_path, rpm_fields in zip(rpm_files, all_rpm_fields):
+        package = Package.from_filepath(file_path, files_metadata[file_path], rpm_fields)
         component = package.to_component(lockfile_path)
         if include_summary_in_sbom:
             summary = Property(name=f"{APP_NAME}:rpm_summary", value=str(package.summary))
@@ -426,20 +422,44 @@ def _generate_repos(from_output_dir: Path) -> None:
     """Search structure for all repoid dirs and create repository metadata \
     out of its RPMs (and SRPMs)."""
     package_dir = from_output_dir.joinpath(DEFAULT_PACKAGE_DIR)
+    repos = []
     for arch in package_dir.iterdir():
         if not arch.is_dir():
             continue
         for entry in arch.iterdir():
             if not entry.is_dir() or entry.name == "repos.d":
                 continue
-            repoid = entry.name
-            _createrepo(repoid, entry)
+            repos.append((entry.name, entry))
+
+    if not repos:
+        return
+
+    # createrepo_c is mostly busy checksumming the packages, run at most one process per CPU
+    # and split the CPUs between them instead of letting each of them use its default
+    cpu_count = os.cpu_count() or 1
+    max_parallel = min(cpu_count, len(repos))
+    workers = max(1, cpu_count // max_parallel)
+
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        futures = [
+            executor.submit(_createrepo, repoid, repodir, workers) for repoid, repodir in repos
+        ]
+        for future in futures:
+            # re-raise the first error, if any
+            future.result()
 
 
-def _createrepo(reponame: str, repodir: Path) -> None:
-    """Execute the createrepo utility."""
+def _createrepo(reponame: str, repodir: Path, workers: Optional[int] = None) -> None:
+    """Execute the createrepo utility.
+
+    The --update option makes createrepo_c reuse the metadata of packages that are already
+    in the existing repodata, so re-running it on an unchanged directory is cheap.
+    """
     log.info(f"Creating repository metadata for repoid '{reponame}': {repodir}")
-    cmd = ["createrepo_c", str(repodir)]
+    cmd = ["createrepo_c", "--update"]
+    if workers is not None:
+        cmd.extend(["--workers", str(workers)])
+    cmd.append(str(repodir))
     log.debug("$ " + shlex.join(cmd))
     stdout = run_cmd(cmd, params={})
     log.debug(stdout)
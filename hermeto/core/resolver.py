@@ -1,15 +1,23 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from tempfile import TemporaryDirectory
 from typing import Any, Callable
 
 from hermeto import APP_NAME
+from hermeto.core.config import get_config
 from hermeto.core.errors import UnsupportedFeature
+from hermeto.core.incremental import FetchManifest
 from hermeto.core.models.input import PackageManagerType, Request
 from hermeto.core.models.output import RequestOutput
 from hermeto.core.package_managers import bundler, cargo, generic, gomod, metayarn, npm, pip, rpm
+from hermeto.core.package_managers.general import shared_download_service
 from hermeto.core.rooted_path import RootedPath
 from hermeto.core.utils import copy_directory
 
+log = logging.getLogger(__name__)
+
 Handler = Callable[[Request], RequestOutput]
 
 _package_managers: dict[PackageManagerType, Handler] = {
@@ -28,6 +36,15 @@ _dev_package_managers: dict[PackageManagerType, Handler] = {
     "rpm": rpm.fetch_rpm_source,
 }
 
+# Package managers which run tools that can modify the source directory (e.g. update lockfiles
+# or move config files out of the way). Only these need to work in a copy of the source directory,
+# the others just read their lockfiles.
+_mutating_package_managers: set[PackageManagerType] = {"bundler", "cargo", "gomod", "yarn"}
+
+# Package managers which write into the same output subdirectories and must not run concurrently.
+# pip runs `cargo vendor` into deps/cargo for its Rust dependencies and writes .cargo/config.toml.
+_conflicting_package_managers: list[set[PackageManagerType]] = [{"cargo", "pip"}]
+
 # This is *only* used to provide a list for `hermeto --version`
 supported_package_managers = list(_package_managers)
 
@@ -37,15 +54,26 @@ def resolve_packages(request: Request) -> RequestOutput:
     Resolve all packages specified in a request.
 
     This function performs the operations in a working copy of the source directory in case
-    a package manager that can make unwanted modifications will be used.
+    a package manager that can make unwanted modifications will be used. If none of the
+    requested package managers can modify the source directory, the copy is skipped.
+
+    All package managers share a single download service, which keeps connections
+    to the same hosts alive across package managers.
     """
+    requested_types = set(pkg.type for pkg in request.packages)
+    if not requested_types & _mutating_package_managers:
+        log.debug("None of the package managers modifies the source directory, not copying it")
+        with shared_download_service():
+            return _resolve_packages(request)
+
     original_source_dir = request.source_dir
 
     with TemporaryDirectory(f".{APP_NAME}-source-copy", dir=".") as temp_dir:
         source_backup = copy_directory(original_source_dir.path, Path(temp_dir).resolve())
 
         request.source_dir = RootedPath(source_backup)
-        output = _resolve_packages(request)
+        with shared_download_service():
+            output = _resolve_packages(request)
         request.source_dir = original_source_dir
 
         # Update all project file paths that end up directly in the source repository
@@ -74,8 +102,69 @@ def _resolve_packages(request: Request) -> RequestOutput:
             # unknown package managers shouldn't get past input validation
             solution="But the good news is that we're already working on it!",
         )
-    pkg_managers = [_supported_package_managers[type_] for type_ in sorted(requested_types)]
-    return sum([pkg_manager(request) for pkg_manager in pkg_managers], RequestOutput.empty())
+    pkg_managers = [
+        (type_, _supported_package_managers[type_]) for type_ in sorted(requested_types)
+    ]
+
+    manifest = FetchManifest.from_config(request)
+    if manifest:
+        manifest.prune(requested_types)
+
+    def run_pkg_manager(type_and_handler: tuple[PackageManagerType, Handler]) -> RequestOutput:
+        type_, pkg_manager = type_and_handler
+        if manifest and (previous_output := manifest.load_output(type_)) is not None:
+            log.info("The inputs of %s didn't change, reusing the previous output", type_)
+            return previous_output
+
+        start = time.monotonic()
+        output = pkg_manager(request)
+        log.info("Package manager %s finished in %.2fs", type_, time.monotonic() - start)
+
+        if manifest:
+            manifest.save_output(type_, output, request.source_dir.path)
+        return output
+
+    if get_config().parallel_package_managers and len(pkg_managers) > 1:
+        # the package managers are mostly waiting for the network or for subprocesses, threads
+        # are good enough for them; those sharing output subdirectories run one after another
+        groups = _group_conflicting(pkg_managers)
+
+        def run_group(
+            group: list[tuple[PackageManagerType, Handler]],
+        ) -> list[tuple[PackageManagerType, RequestOutput]]:
+            return [(pkg_manager[0], run_pkg_manager(pkg_manager)) for pkg_manager in group]
+
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            outputs_by_type = dict(
+                output
+                for group_outputs in executor.map(run_group, groups)
+                for output in group_outputs
+            )
+        # merge the outputs in the sequential order, keeping the result deterministic
+        outputs = [outputs_by_type[type_] for type_, _ in pkg_managers]
+    else:
+        outputs = [run_pkg_manager(pkg_manager) for pkg_manager in pkg_managers]
+
+    return RequestOutput.merge_all(outputs)
+
+
+def _group_conflicting(
+    pkg_managers: list[tuple[PackageManagerType, Handler]],
+) -> list[list[tuple[PackageManagerType, Handler]]]:
+    """Split package managers into groups which can run concurrently with each other."""
+    groups: dict[PackageManagerType, list[tuple[PackageManagerType, Handler]]] = {}
+    for type_, handler in pkg_managers:
+        # the first member of the conflicting set (in sorted order) identifies the group
+        group_key = next(
+            (
+                min(conflicting)
+                for conflicting in _conflicting_package_managers
+                if type_ in conflicting
+            ),
+            type_,
+        )
+        groups.setdefault(group_key, []).append((type_, handler))
+    return list(groups.values())
 
 
 def inject_files_post(from_output_dir: Path, for_output_dir: Path, **kwargs: Any) -> None:
@@ -1,21 +1,45 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
+import fcntl
 import logging
+import os
 import re
+import shlex
+import shutil
+import struct
+import subprocess
 import tarfile
 import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from os import PathLike
 from pathlib import Path
-from typing import NamedTuple, Union
+from typing import IO, Any, Callable, Iterator, NamedTuple, Optional, TypeVar, Union
 from urllib.parse import ParseResult, SplitResult, urlparse, urlsplit
 
-from git.exc import InvalidGitRepositoryError, NoSuchPathError
+from git.exc import GitCommandError, InvalidGitRepositoryError, NoSuchPathError
 from git.repo import Repo
 
 from hermeto import APP_NAME
+from hermeto.core.config import get_config
 from hermeto.core.errors import FetchError, NotAGitRepo, UnsupportedFeature
+from hermeto.core.http_requests import DEFAULT_RETRY_OPTIONS
+from hermeto.core.utils import get_cache_dir
 
 log = logging.getLogger(__name__)
 
+READ_CHUNK = 1048576
+
+# the compression level of VCS tarballs, fixed to keep them reproducible
+_GZIP_LEVEL = 6
+# the size of the deflate sliding window, how far back the compressed data can refer
+_DEFLATE_WINDOW = 32768
+
+T = TypeVar("T")
+
 
 class RepoID(NamedTuple):
     """The properties which uniquely identify a repository at a specific commit."""
@@ -91,10 +115,135 @@ def _canonicalize_origin_url(url: str) -> str:
         )
 
 
+def _strip_credentials(url: str) -> str:
+    """Remove the credentials from the userinfo of a repository URL.
+
+    The user name of non-HTTP URLs (e.g. the git in ssh://git@host/repo) is not a secret
+    and is kept, only the password is removed.
+    """
+    parsed = urlsplit(url)
+    userinfo, _, hostport = parsed.netloc.rpartition("@")
+    if not userinfo:
+        return url
+    if parsed.scheme in ("http", "https") or not parsed.username:
+        netloc = hostport
+    else:
+        netloc = f"{parsed.username}@{hostport}"
+    return parsed._replace(netloc=netloc).geturl()
+
+
+class GitMirrorCache:
+    """Bare mirrors of remote git repositories, shared across runs and package managers.
+
+    Mirrors are stored as <root>/<host>/<path>.git and fetched incrementally, so that repeated
+    and duplicate VCS dependencies cost one (partial) fetch instead of a full clone each.
+    The credentials in repository URLs are used for fetching, but never stored in the mirrors.
+    """
+
+    def __init__(self, root: Path) -> None:
+        """Initialize a GitMirrorCache rooted at the specified directory."""
+        self.root = root
+
+    @classmethod
+    def from_config(cls) -> Optional["GitMirrorCache"]:
+        """Return the default cache if enabled in the configuration, None otherwise."""
+        if not get_config().git_mirror_cache_enabled:
+            return None
+        return cls(get_cache_dir() / "git")
+
+    def mirror_path(self, url: str) -> Path:
+        """Return the path of the mirror for a repository URL.
+
+        The credentials and the scheme don't matter, e.g. the ssh:// and https:// URLs of the
+        same repository share one mirror.
+        """
+        parsed = urlsplit(_canonicalize_origin_url(url))
+        if parsed.scheme == "file":
+            host = "file"
+        elif parsed.hostname:
+            host = f"{parsed.hostname}_{parsed.port}" if parsed.port else parsed.hostname
+        else:
+            raise UnsupportedFeature(f"Cannot cache git repository: {url}", solution=None)
+
+        path = parsed.path.strip("/").removesuffix(".git")
+        if not path or ".." in path.split("/"):
+            raise UnsupportedFeature(f"Cannot cache git repository: {url}", solution=None)
+        return self.root.joinpath(host, f"{path}.git")
+
+    @contextmanager
+    def _locked(self, mirror: Path) -> Iterator[None]:
+        mirror.parent.mkdir(parents=True, exist_ok=True)
+        with open(mirror.with_name(f"{mirror.name}.lock"), "w") as lockfile:
+            fcntl.flock(lockfile, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+    def update(self, url: str, ref: str) -> Path:
+        """Make sure the mirror of a repository contains the specified revision.
+
+        Creates the mirror on first use, otherwise fetches only what is missing. Commits which
+        are not reachable from any branch or tag are fetched directly and kept under a ref of
+        their own.
+
+        :param url: the URL of the repository
+        :param ref: the revision that needs to be in the mirror
+        :return: the path to the bare mirror
+        :raises GitCommandError: if git fails to clone or fetch the repository
+        """
+        mirror = self.mirror_path(url)
+        remote_url = _strip_credentials(url)
+        env = {"GIT_TERMINAL_PROMPT": "0"}
+
+        with self._locked(mirror):
+            if not mirror.exists():
+                log.debug("Creating a mirror of %s in %s", url, mirror)
+                temp_dir = Path(tempfile.mkdtemp(prefix=f"{mirror.name}.", dir=mirror.parent))
+                try:
+                    repo = Repo.clone_from(url, temp_dir, mirror=True, env=env)
+                    repo.remote().set_url(remote_url)
+                    # allow partial clones from the mirror
+                    with repo.config_writer() as config:
+                        config.set_value("uploadpack", "allowFilter", "true")
+                        config.set_value("uploadpack", "allowAnySHA1InWant", "true")
+                    temp_dir.rename(mirror)
+                except Exception:
+                    shutil.rmtree(temp_dir, ignore_errors=True)
+                    raise
+                return mirror
+
+            repo = Repo(mirror)
+            if repo.remote().url != remote_url:
+                # mirrors created by older versions may still hold the credentials
+                repo.remote().set_url(remote_url)
+            if _has_commit(repo, ref):
+                log.debug("Git mirror of %s already contains %s", url, ref)
+                return mirror
+
+            log.debug("Updating the mirror of %s in %s", url, mirror)
+            with repo.git.custom_environment(**env):
+                repo.git.fetch(url, "+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*")
+                if not _has_commit(repo, ref):
+                    repo.git.fetch(url, f"{ref}:refs/{APP_NAME}/{ref}")
+
+        return mirror
+
+
+def _has_commit(repo: Repo, ref: str) -> bool:
+    try:
+        repo.git.cat_file("-e", f"{ref}^{{commit}}")
+        return True
+    except GitCommandError:
+        return False
+
+
 def clone_as_tarball(url: str, ref: str, to_path: Path) -> None:
     """Clone a git repository, check out the specified revision and create a compressed tarball.
 
-    The repository content will be under the app/ directory in the tarball.
+    The repository content will be under the app/ directory in the tarball. By default, the
+    tarball includes the .git directory. If the git_archive_tarballs option is enabled, the
+    tarball is produced by `git archive` instead, without the .git directory.
 
     :param url: the URL of the repository
     :param ref: the revision to check out
@@ -105,18 +254,26 @@ def clone_as_tarball(url: str, ref: str, to_path: Path) -> None:
     if "ssh://" in url:
         list_url.append(url.replace("ssh://", "https://"))
 
+    mirror_cache = GitMirrorCache.from_config()
+    use_git_archive = get_config().git_archive_tarballs
+
     with tempfile.TemporaryDirectory(prefix="cachito-") as temp_dir:
-        for url in list_url:
-            log.debug("Cloning the Git repository from %s", url)
+        for i, url in enumerate(list_url):
+
+            def clone() -> Repo:
+                log.debug("Cloning the Git repository from %s", url)
+                # a failed attempt may leave some files behind, start from scratch every time
+                clone_dir = tempfile.mkdtemp(dir=temp_dir)
+                if use_git_archive:
+                    return _clone_bare(url, ref, clone_dir, mirror_cache)
+                return _clone_blobless(url, ref, clone_dir, mirror_cache)
+
             try:
-                repo = Repo.clone_from(
-                    url,
-                    temp_dir,
-                    no_checkout=True,
-                    filter="blob:none",
-                    # Don't allow git to prompt for a username if we don't have access
-                    env={"GIT_TERMINAL_PROMPT": "0"},
-                )
+                if i < len(list_url) - 1:
+                    # fail fast and fall back to the next URL instead of retrying this one
+                    repo = clone()
+                else:
+                    repo = retry_git_operation(clone, f"cloning {url}")
             except Exception as ex:
                 log.warning(
                     "Failed cloning the Git repository from %s, ref: %s, exception: %s, exception-msg: %s",
@@ -127,7 +284,14 @@ def clone_as_tarball(url: str, ref: str, to_path: Path) -> None:
                 )
                 continue
 
+            if use_git_archive:
+                _archive_as_tarball(repo, ref, to_path)
+                return
+
             _reset_git_head(repo, ref)
+            # the repository was cloned from the local mirror, make it look like a regular clone
+            if repo.remote().url != url:
+                repo.remote().set_url(url)
 
             with tarfile.open(to_path, mode="w:gz") as archive:
                 archive.add(repo.working_dir, "app")
@@ -137,6 +301,214 @@ def clone_as_tarball(url: str, ref: str, to_path: Path) -> None:
     raise FetchError("Failed cloning the Git repository")
 
 
+# Git errors caused by network issues or by the server being temporarily unavailable
+_TRANSIENT_GIT_ERRORS = re.compile(
+    r"early EOF|remote end hung up unexpectedly|unexpected disconnect|timed out"
+    r"|connection reset|connection refused|could not resolve host|failed to connect"
+    r"|RPC failed; curl \d+|(?:HTTP|error:) 5\d\d|gnutls_handshake|SSL_read|TLS connection",
+    re.IGNORECASE,
+)
+
+
+def _is_transient_git_error(ex: Exception) -> bool:
+    return isinstance(ex, GitCommandError) and bool(_TRANSIENT_GIT_ERRORS.search(str(ex.stderr)))
+
+
+def retry_git_operation(operation: Callable[[], T], description: str) -> T:
+    """Run a git operation, retry it with an exponential backoff if it fails transiently.
+
+    Uses the same number of attempts and backoff factor as HTTP requests (DEFAULT_RETRY_OPTIONS).
+    Only network errors, timeouts and server errors are retried, errors like failed
+    authentication, a missing repository or an unknown ref are raised right away.
+
+    :param operation: the function to run
+    :param description: what the operation does, for logging
+    :return: the return value of the operation
+    """
+    attempts = int(DEFAULT_RETRY_OPTIONS["total"])
+    backoff_factor = float(DEFAULT_RETRY_OPTIONS["backoff_factor"])
+
+    for attempt in range(1, attempts):
+        try:
+            return operation()
+        except Exception as ex:
+            if not _is_transient_git_error(ex):
+                raise
+            delay = backoff_factor * 2 ** (attempt - 1)
+            log.debug(
+                "Attempt %d/%d failed %s: %s, retrying in %.1fs",
+                attempt,
+                attempts,
+                description,
+                ex,
+                delay,
+            )
+            time.sleep(delay)
+
+    return operation()
+
+
+class GitFetchPool:
+    """Run git fetches in a pool of threads, limiting the concurrent fetches from each host.
+
+    Each host gets a pool of its own, so fetches waiting for a busy host don't hold up fetches
+    from other hosts. The overall number of concurrent fetches is limited as well.
+
+    Exiting the context waits for the submitted fetches to finish. If the context exits with an
+    error, the fetches which didn't start yet get cancelled.
+    """
+
+    def __init__(self, max_workers: int, max_workers_per_host: int) -> None:
+        """Initialize a GitFetchPool, the pool needs to be started using 'with'."""
+        self.max_workers_per_host = max_workers_per_host
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executors: dict[str, ThreadPoolExecutor] = {}
+
+    @classmethod
+    def from_config(cls) -> "GitFetchPool":
+        """Create a pool with the limits from the configuration."""
+        config = get_config()
+        return cls(config.concurrency_limit, config.git_concurrency_limit_per_host)
+
+    def __enter__(self) -> "GitFetchPool":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=True, cancel_futures=exc_type is not None)
+
+    def submit(self, url: str, fn: Callable[..., T], /, *args: Any, **kwargs: Any) -> "Future[T]":
+        """Schedule fn(*args, **kwargs) to run in the pool of the host of the repository URL.
+
+        :param url: the URL of the repository that fn fetches from
+        :return: the future result of fn
+        """
+        host = _get_host(url)
+        if host not in self._executors:
+            self._executors[host] = ThreadPoolExecutor(
+                max_workers=self.max_workers_per_host, thread_name_prefix=f"git-fetch-{host}"
+            )
+
+        def run() -> T:
+            with self._slots:
+                return fn(*args, **kwargs)
+
+        return self._executors[host].submit(run)
+
+
+def _get_host(url: str) -> str:
+    try:
+        return urlsplit(_canonicalize_origin_url(url)).hostname or ""
+    except UnsupportedFeature:
+        return ""
+
+
+def _clone_blobless(
+    url: str, ref: str, to_dir: str, mirror_cache: Optional[GitMirrorCache]
+) -> Repo:
+    clone_from = url
+    if mirror_cache:
+        try:
+            clone_from = mirror_cache.update(url, ref).as_uri()
+        except Exception as ex:
+            log.warning("Failed updating the git mirror of %s, cloning directly: %s", url, ex)
+
+    return Repo.clone_from(
+        clone_from,
+        to_dir,
+        no_checkout=True,
+        filter="blob:none",
+        # Don't allow git to prompt for a username if we don't have access
+        env={"GIT_TERMINAL_PROMPT": "0"},
+    )
+
+
+def _clone_bare(url: str, ref: str, to_dir: str, mirror_cache: Optional[GitMirrorCache]) -> Repo:
+    if mirror_cache:
+        try:
+            # archiving only reads the repository, no need to clone the mirror
+            return Repo(mirror_cache.update(url, ref))
+        except Exception as ex:
+            log.warning("Failed updating the git mirror of %s, cloning directly: %s", url, ex)
+
+    # not a partial clone, git archive would fetch the missing blobs one by one
+    return Repo.clone_from(url, to_dir, bare=True, env={"GIT_TERMINAL_PROMPT": "0"})
+
+
+def _archive_as_tarball(repo: Repo, ref: str, to_path: Path) -> None:
+    """Stream `git archive` of a revision into a gzip-compressed tarball.
+
+    git archive sets the mtime of all files to the commit time and orders them by path, and the
+    compression doesn't depend on the host (see _gzip_parallel), so the tarball is reproducible.
+    """
+    if not _has_commit(repo, ref):
+        raise _invalid_ref_error(ref)
+
+    archive_cmd = ["git", "archive", "--format=tar", "--prefix=app/", ref]
+    log.debug("$ %s (in %s)", shlex.join(archive_cmd), repo.git_dir)
+
+    with open(to_path, "wb") as f:
+        archive = subprocess.Popen(
+            archive_cmd, cwd=repo.git_dir, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+        )
+        assert archive.stdout and archive.stderr  # mypy: the pipes are there
+        _gzip_parallel(archive.stdout, f)
+
+        stderr = archive.stderr.read().decode(errors="replace")
+        if archive.wait() != 0:
+            log.error("Failed to archive the Git repository at %s: %s", ref, stderr)
+            raise FetchError(f"Failed to create a tarball of the Git repository at {ref}")
+
+
+def _gzip_parallel(src: IO[bytes], dst: IO[bytes], max_workers: Optional[int] = None) -> None:
+    """Compress a stream into the gzip format, compressing blocks of it in parallel threads.
+
+    Works like pigz: each block is compressed separately (primed with the end of the previous
+    block, to keep the compression ratio) and the raw deflate streams are concatenated. The
+    block size and compression level are fixed and the gzip header has no name or timestamp,
+    so the output only depends on the input (and the zlib version), not on the number of CPUs
+    or the tools installed on the host.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    crc, size = 0, 0
+    # the gzip header: magic, deflate, no flags, no mtime, no extra flags, unknown OS
+    dst.write(struct.pack("<BBBBIBB", 0x1F, 0x8B, 8, 0, 0, 0, 255))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: deque[Future[bytes]] = deque()
+        zdict = b""
+        while block := src.read(READ_CHUNK):
+            crc = zlib.crc32(block, crc)
+            size += len(block)
+            pending.append(executor.submit(_deflate_block, block, zdict))
+            zdict = block[-_DEFLATE_WINDOW:]
+            # keep the memory bounded, write the blocks out in order as they get done
+            if len(pending) >= 2 * max_workers:
+                dst.write(pending.popleft().result())
+        while pending:
+            dst.write(pending.popleft().result())
+
+    # an empty final block terminates the deflate stream
+    dst.write(zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS).flush())
+    dst.write(struct.pack("<II", crc, size & 0xFFFFFFFF))
+
+
+def _deflate_block(block: bytes, zdict: bytes) -> bytes:
+    if zdict:
+        compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=zdict)
+    else:
+        compressor = zlib.compressobj(_GZIP_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # a sync flush ends the block on a byte boundary without ending the deflate stream
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _invalid_ref_error(ref: str) -> FetchError:
+    return FetchError(
+        "Failed on checking out the Git repository. Please verify the supplied reference "
+        f'of "{ref}" is valid.'
+    )
+
+
 def _reset_git_head(repo: Repo, ref: str) -> None:
     try:
         repo.head.reference = repo.commit(ref)  # type: ignore # 'reference' is a weird property
@@ -149,7 +521,4 @@ def _reset_git_head(repo: Repo, ref: str) -> None:
         )
         # Not necessarily a FetchError, but the checkout *does* also fetch stuff
         #   (because we clone with --filter=blob:none)
-        raise FetchError(
-            "Failed on checking out the Git repository. Please verify the supplied reference "
-            f'of "{ref}" is valid.'
-        )
+        raise _invalid_ref_error(ref)
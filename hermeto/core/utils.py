@@ -1,3 +1,4 @@
+import codecs
 import errno
 import json
 import logging
@@ -6,10 +7,12 @@ import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
 from functools import cache
 from itertools import filterfalse, tee
 from pathlib import Path
-from typing import Any, Callable, Iterable, Iterator, Optional, Sequence
+from typing import Any, Callable, Generator, Iterable, Iterator, Optional, Sequence
 
 from hermeto import APP_NAME
 from hermeto.core.config import get_config
@@ -17,6 +20,9 @@ from hermeto.core.errors import BaseError
 
 log = logging.getLogger(__name__)
 
+# the maximum size of the chunks of output that stream_cmd reads (in bytes)
+STREAM_CHUNK = 65536
+
 
 class _FastCopyFailedFallback(Exception):
     """Signals a fall back from fast-in kernel copying to regular copy."""
@@ -39,18 +45,7 @@ def run_cmd(cmd: Sequence[str], params: dict) -> str:
     conf = get_config()
     params.setdefault("timeout", conf.subprocess_timeout)
 
-    executable, *args = cmd
-    executable_path = shutil.which(executable)
-    if executable_path is None:
-        raise BaseError(
-            f"{executable!r} executable not found in PATH",
-            solution=(
-                f"Please make sure that the {executable!r} executable is installed in your PATH.\n"
-                f"If you are using {APP_NAME} via its container image, this should not happen - please report this bug."
-            ),
-        )
-
-    response = subprocess.run([executable_path, *args], **params)
+    response = subprocess.run(_resolve_executable(cmd), **params)
 
     try:
         response.check_returncode()
@@ -64,6 +59,77 @@ def run_cmd(cmd: Sequence[str], params: dict) -> str:
     return response.stdout
 
 
+def stream_cmd(cmd: Sequence[str], params: dict) -> Generator[str, None, None]:
+    """
+    Run the given command and yield its output in chunks as the command produces it.
+
+    Unlike run_cmd, this never holds the whole output in memory. The command runs while the
+    caller processes the chunks, if the caller stops iterating early, the command gets killed.
+
+    :param iter cmd: iterable representing command to be executed
+    :param dict params: keyword parameters for command execution (e.g. env, cwd, timeout)
+    :returns: generator of the chunks of the command output
+    :raises CalledProcessError: if the command fails (after all its output was yielded)
+    :raises TimeoutExpired: if the command doesn't finish in time
+    """
+    params = dict(params)
+    timeout = params.pop("timeout", get_config().subprocess_timeout)
+    decoder = codecs.getincrementaldecoder(params.pop("encoding", "utf-8"))()
+
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as stderr:
+        proc = subprocess.Popen(
+            _resolve_executable(cmd), stdout=subprocess.PIPE, stderr=stderr, **params
+        )
+        timed_out = threading.Event()
+
+        def kill_on_timeout() -> None:
+            timed_out.set()
+            proc.kill()
+
+        timer = threading.Timer(timeout, kill_on_timeout)
+        timer.start()
+        finished = False
+        try:
+            # read1 returns whatever is available instead of waiting for a full chunk
+            while data := proc.stdout.read1(STREAM_CHUNK):  # type: ignore[union-attr]
+                if chunk := decoder.decode(data):
+                    yield chunk
+            if chunk := decoder.decode(b"", final=True):
+                yield chunk
+            finished = True
+        finally:
+            timer.cancel()
+            if not finished:
+                # the caller stopped early (or failed), nobody is going to read the rest
+                proc.kill()
+            returncode = proc.wait()
+            proc.stdout.close()  # type: ignore[union-attr]
+
+        if timed_out.is_set():
+            raise subprocess.TimeoutExpired(cmd, timeout)
+
+        if returncode != 0:
+            log.error('The command "%s" failed', " ".join(cmd))
+            stderr.seek(0)
+            _log_error_output("STDERR", stderr.read())
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def _resolve_executable(cmd: Sequence[str]) -> list[str]:
+    """Return the command with the full path of its executable."""
+    executable, *args = cmd
+    executable_path = shutil.which(executable)
+    if executable_path is None:
+        raise BaseError(
+            f"{executable!r} executable not found in PATH",
+            solution=(
+                f"Please make sure that the {executable!r} executable is installed in your PATH.\n"
+                f"If you are using {APP_NAME} via its container image, this should not happen - please report this bug."
+            ),
+        )
+    return [executable_path, *args]
+
+
 def _log_error_output(out_or_err: str, output: Optional[str]) -> None:
     if output:
         log.error("%s:\n%s", out_or_err, output.rstrip())
@@ -87,6 +153,37 @@ def load_json_stream(s: str) -> Iterator:
         yield obj
 
 
+def iter_json_stream(chunks: Iterable[str]) -> Iterator:
+    """
+    Load all JSON objects from a stream of string chunks, e.g. the output of stream_cmd.
+
+    Same as load_json_stream, but the objects get yielded as soon as they are complete and
+    only the incomplete object at the end of the received data is kept in memory.
+    """
+    decoder = json.JSONDecoder()
+    non_whitespace = re.compile(r"\S")
+    buffer = ""
+
+    for chunk in chunks:
+        buffer += chunk
+        i = 0
+        while match := non_whitespace.search(buffer, i):
+            try:
+                obj, end = decoder.raw_decode(buffer, match.start())
+            except json.JSONDecodeError:
+                # most likely an incomplete object, wait for the rest of it
+                break
+            if end == len(buffer) and buffer[-1] not in '}]"':
+                # a number or a literal might continue in the next chunk
+                break
+            i = end
+            yield obj
+        buffer = buffer[i:]
+
+    # whatever is left must be valid, let the decoder report it otherwise
+    yield from load_json_stream(buffer)
+
+
 @cache
 def _get_blocksize(fd: int) -> int:
     """Determine blocksize for fastcopying on Linux.
@@ -191,6 +288,29 @@ def copy_directory(origin: Path, destination: Path) -> Path:
     return destination
 
 
+def link_or_copy_file(origin: Path, destination: Path) -> None:
+    """
+    Hard-link a file to another path, fall back to copying it if linking is not possible.
+
+    Hard links fail across file systems (and on some file systems altogether), in which case
+    the file is copied using fast in-kernel copying (including reflinks) if possible.
+
+    :raise FileNotFoundError: if the origin file does not exist.
+    """
+    try:
+        os.link(origin, destination)
+        return
+    except OSError as ex:
+        if ex.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP):
+            raise
+
+    log.debug("Hard-linking %s to %s failed, copying instead.", origin, destination)
+    try:
+        _fast_copy(origin, destination)
+    except _FastCopyFailedFallback:
+        shutil.copyfile(origin, destination)
+
+
 def get_cache_dir() -> Path:
     """Return our application's global cache directory, useful for storing reusable data."""
     try:
@@ -13,16 +13,26 @@ import typer
 
 import hermeto.core.config as config
 from hermeto import APP_NAME
+from hermeto.core.artifact_cache import ArtifactCache
 from hermeto.core.errors import BaseError, InvalidInput, UnexpectedFormat
 from hermeto.core.extras.envfile import EnvFormat, generate_envfile
 from hermeto.core.models.input import Flag, PackageInput, Request, parse_user_input
 from hermeto.core.models.output import BuildConfig
-from hermeto.core.models.sbom import Sbom, SPDXSbom, spdx_now
+from hermeto.core.models.sbom import (
+    Sbom,
+    SPDXSbom,
+    spdx_now,
+    write_cyclonedx_json,
+    write_sbom_json,
+    write_spdx_json,
+)
 from hermeto.core.resolver import inject_files_post, resolve_packages, supported_package_managers
 from hermeto.core.rooted_path import RootedPath
 from hermeto.interface.logging import LogLevel, setup_logging
 
 app = typer.Typer(no_args_is_help=True, pretty_exceptions_show_locals=False)
+cache_app = typer.Typer(no_args_is_help=True, help="Manage the local artifact cache.")
+app.add_typer(cache_app, name="cache")
 log = logging.getLogger(__name__)
 
 DEFAULT_SOURCE = "."
@@ -308,7 +318,8 @@ def fetch_deps(  # noqa: D103; docstring becomes part of --help message
     )
 
     deps_dir = output / "deps"
-    if deps_dir.exists():
+    # with incremental fetching, the downloads of unchanged package managers get reused
+    if deps_dir.exists() and not config.get_config().incremental_fetch:
         log.debug(f"Removing existing deps directory '{deps_dir}'")
         shutil.rmtree(deps_dir, ignore_errors=True)
 
@@ -319,14 +330,16 @@ def fetch_deps(  # noqa: D103; docstring becomes part of --help message
         request_output.build_config.model_dump_json(indent=2, exclude_none=True)
     )
 
-    if sbom_type == SBOMFormat.cyclonedx:
-        sbom: Union[Sbom, SPDXSbom] = request_output.generate_sbom()
-    else:
-        sbom = request_output.generate_sbom().to_spdx(doc_namespace="NOASSERTION")
-    request.output_dir.join_within_root("bom.json").path.write_text(
-        # the Sbom model has camelCase aliases in some fields
-        sbom.model_dump_json(indent=2, by_alias=True, exclude_none=True)
-    )
+    # the merged components are written out as they are produced, the SBOM model is never built
+    components = request_output.iter_sbom_components()
+    with request.output_dir.join_within_root("bom.json").path.open("w") as f:
+        if sbom_type == SBOMFormat.cyclonedx:
+            write_cyclonedx_json(components, f)
+        else:
+            write_spdx_json(components, f, doc_namespace="NOASSERTION")
+
+    if artifact_cache := ArtifactCache.from_config():
+        artifact_cache.prune(config.get_config().artifact_cache_max_size)
 
     log.info(r"All dependencies fetched successfully \o/")
 
@@ -467,13 +480,41 @@ def merge_sboms(  # noqa: D103; docstring becomes part of --help message
         if sbom_name is not None:
             start_sbom.name = sbom_name
         start_sbom.creationInfo.created = spdx_now()
-    sbom = sum(sboms_to_merge[1:], start=start_sbom)
-    sbom_json = sbom.model_dump_json(indent=2, by_alias=True, exclude_none=True)
-
+    sbom = start_sbom.merge_all(sboms_to_merge[1:])
     if output_sbom_file_name is not None:
-        output_sbom_file_name.write_text(sbom_json)
+        with output_sbom_file_name.open("w") as f:
+            write_sbom_json(sbom, f)
     else:
-        print(sbom_json)
+        write_sbom_json(sbom, sys.stdout)
+        print()
+
+
+@cache_app.command("stats")
+@handle_errors
+def cache_stats() -> None:
+    """Show the number of cached artifacts and their total size."""
+    stats = ArtifactCache.default().stats()
+    print(f"Artifacts: {stats.artifacts}")
+    print(f"Size: {stats.size} bytes")
+
+
+@cache_app.command("prune")
+@handle_errors
+def cache_prune(
+    max_size: Optional[int] = typer.Option(
+        None,
+        "--max-size",
+        min=0,
+        help="Evict least recently used artifacts until the cache fits into this many bytes. "
+        "Defaults to the artifact_cache_max_size config option, use 0 to clear the cache.",
+    ),
+) -> None:
+    """Evict the least recently used artifacts from the cache."""
+    if max_size is None:
+        max_size = config.get_config().artifact_cache_max_size
+    evicted = ArtifactCache.default().prune(max_size)
+    print(f"Evicted artifacts: {evicted.artifacts}")
+    print(f"Freed: {evicted.size} bytes")
 
 
 def _get_build_config(output_dir: Path) -> BuildConfig:
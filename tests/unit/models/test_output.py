@@ -1,6 +1,6 @@
 from pathlib import Path
 from textwrap import dedent
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import pydantic
 import pytest
@@ -122,6 +122,39 @@ class TestRequestOutput:
         request_output = RequestOutput.from_obj_list(**input_data)
         assert request_output == expected_data
 
+    def test_merge_all(self) -> None:
+        def make_output(name: str, options: Optional[dict[str, Any]] = None) -> RequestOutput:
+            return RequestOutput(
+                components=[{"name": name, "purl": f"pkg:generic/{name}"}],
+                build_config=BuildConfig(
+                    environment_variables=[EnvironmentVariable(name="SHARED", value="y")],
+                    project_files=[ProjectFile(abspath=f"/{name}/path", template=name)],
+                    options=options,
+                ),
+            )
+
+        outputs = [
+            make_output("foo"),
+            make_output("bar", options={"a": {"x": 1}}),
+            make_output("baz", options={"b": 2}),
+            make_output("foo"),
+        ]
+        merged = RequestOutput.merge_all(outputs)
+
+        assert merged == outputs[0] + outputs[1] + outputs[2] + outputs[3]
+        assert [c.name for c in merged.components] == ["foo", "bar", "baz", "foo"]
+        assert merged.build_config.environment_variables == [
+            EnvironmentVariable(name="SHARED", value="y")
+        ]
+        assert len(merged.build_config.project_files) == 3
+        assert merged.build_config.options == {"a": {"x": 1}, "b": 2}
+        # options are copied, not shared with the merged outputs
+        merged.build_config.options["a"]["x"] = 2
+        assert outputs[1].build_config.options == {"a": {"x": 1}}
+
+    def test_merge_all_empty(self) -> None:
+        assert RequestOutput.merge_all([]) == RequestOutput.empty()
+
 
 ENVVAR_TEMPLATE_MAPPINGS = {
     "NESTED": "monty_${FOO}",
@@ -263,3 +263,24 @@ class TestPropertySet:
         self, set_a: PropertySet, set_b: PropertySet, expect_merged: PropertySet
     ) -> None:
         assert set_a.merge(set_b) == expect_merged
+
+
+def test_merge_component_properties_with_shared_property_sets() -> None:
+    dev = [Property(name=PropertyEnum.PROP_CDX_NPM_PACKAGE_DEVELOPMENT, value="true")]
+    components = [
+        Component(name=name, version="1.0.0", purl=f"pkg:npm/{name}@1.0.0", properties=props)
+        for name in ("foo", "bar", "baz")
+        for props in (list(dev), [])
+    ] + [Component(name="spam", version="1.0.0", purl="pkg:npm/spam@1.0.0", properties=list(dev))]
+
+    merged = merge_component_properties(components)
+
+    found_by = Property(name=PropertyEnum.PROP_FOUND_BY, value=f"{APP_NAME}")
+    assert [(c.name, c.properties) for c in merged] == [
+        ("bar", [found_by]),
+        ("baz", [found_by]),
+        ("foo", [found_by]),
+        ("spam", [*dev, found_by]),
+    ]
+    # components with the same properties don't share the list
+    assert merged[0].properties is not merged[1].properties
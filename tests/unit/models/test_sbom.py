@@ -1,5 +1,8 @@
 import datetime
+import io
 import json
+from pathlib import Path
+from typing import Union
 from unittest import mock
 
 import pydantic
@@ -19,7 +22,11 @@ from hermeto.core.models.sbom import (
     SPDXRelation,
     SPDXSbom,
     Tool,
+    iter_merged_components,
     merge_component_properties,
+    write_cyclonedx_json,
+    write_sbom_json,
+    write_spdx_json,
 )
 
 SPDX_EPOCH_STRFTIME = datetime.datetime.fromtimestamp(0).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -325,6 +332,25 @@ class TestSbom:
             ),
         ]
 
+    def test_merge_all(self, mock_spdx_now: str) -> None:
+        def sbom_with(*components: Component) -> Sbom:
+            return Sbom(components=list(components))
+
+        foo = Component(name="foo", version="1.0.0", purl="pkg:npm/foo@1.0.0")
+        bar = Component(name="bar", version="2.0.0", purl="pkg:npm/bar@2.0.0")
+        foo_dev = Component(
+            name="foo",
+            version="1.0.0",
+            purl="pkg:npm/foo@1.0.0",
+            properties=[Property(name="cdx:npm:package:development", value="true")],
+        )
+        sboms = [sbom_with(foo_dev), sbom_with(bar), sbom_with(foo, bar)]
+
+        merged = sbom_with(foo_dev).merge_all(sboms[1:] + [sbom_with(bar).to_spdx("NOASSERTION")])
+
+        assert merged == sboms[0] + sboms[1] + sboms[2]
+        assert merged.components == [bar, foo]
+
     # Handles generic PM use-case.
     def test_to_spdx_when_a_file_is_present(self, mock_spdx_now: str) -> None:
         sbom = Sbom(
@@ -1384,3 +1410,69 @@ def test_deduplicate_spdx_packages() -> None:
 
     assert len(deduped_packages) == len(expected_packages)
     assert deduped_packages == expected_packages
+
+
+@pytest.mark.parametrize(
+    "sbom",
+    [
+        pytest.param(SPDXSbom.from_file(Path("tests/unit/data/alpine.pretty.json")), id="spdx"),
+        pytest.param(
+            SPDXSbom.from_file(Path("tests/unit/data/alpine.pretty.json")).to_cyclonedx(),
+            id="cyclonedx",
+        ),
+        pytest.param(Sbom(), id="empty_cyclonedx"),
+        pytest.param(
+            SPDXSbom(documentNamespace="NOASSERTION", creationInfo={"created": "now"}),
+            id="empty_spdx",
+        ),
+    ],
+)
+def test_write_sbom_json(sbom: Union[Sbom, SPDXSbom]) -> None:
+    fileobj = io.StringIO()
+    write_sbom_json(sbom, fileobj)
+    assert fileobj.getvalue() == sbom.model_dump_json(indent=2, by_alias=True, exclude_none=True)
+
+
+STREAMED_COMPONENTS = [
+    Component(name="foo", version="1.0.0", purl="pkg:pypi/foo@1.0.0"),
+    Component(
+        name="foo",
+        version="1.0.0",
+        purl="pkg:pypi/foo@1.0.0",
+        properties=[Property(name=f"{APP_NAME}:pip:package:binary", value="true")],
+    ),
+    # the same package URL, the qualifiers in a different order
+    Component(name="bar", version="2.0", purl="pkg:npm/bar@2.0?a=1&b=2"),
+    Component(name="bar", version="2.0", purl="pkg:npm/bar@2.0?b=2&a=1"),
+    # the same name and version, a different package URL
+    Component(name="bar", version="2.0", purl="pkg:npm/bar@2.0?a=3"),
+    Component(name="baz", purl="pkg:generic/baz"),
+    Component(name="aaa", version="0.1", purl="pkg:cargo/aaa@0.1"),
+]
+
+
+@pytest.mark.parametrize(
+    "components",
+    [
+        pytest.param(STREAMED_COMPONENTS, id="components"),
+        pytest.param(
+            SPDXSbom.from_file(Path("tests/unit/data/alpine.pretty.json"))
+            .to_cyclonedx()
+            .components,
+            id="alpine",
+        ),
+        pytest.param([], id="empty"),
+    ],
+)
+@mock.patch("hermeto.core.models.sbom.spdx_now", return_value=SPDX_EPOCH_STRFTIME)
+def test_write_streamed_sbom_json(mock_spdx_now: mock.Mock, components: list[Component]) -> None:
+    sbom = Sbom(components=merge_component_properties(components))
+
+    cyclonedx = io.StringIO()
+    write_cyclonedx_json(iter_merged_components(components), cyclonedx)
+    assert cyclonedx.getvalue() == sbom.model_dump_json(indent=2, by_alias=True, exclude_none=True)
+
+    spdx = io.StringIO()
+    write_spdx_json(iter_merged_components(components), spdx, doc_namespace="NOASSERTION")
+    spdx_sbom = sbom.to_spdx(doc_namespace="NOASSERTION")
+    assert spdx.getvalue() == spdx_sbom.model_dump_json(indent=2, by_alias=True, exclude_none=True)
@@ -22,13 +22,13 @@ from tests.common_utils import GIT_REF
 
 @mock.patch("hermeto.core.package_managers.bundler.main._get_main_package_name_and_version")
 @mock.patch("hermeto.core.package_managers.bundler.main.parse_lockfile")
-@mock.patch("hermeto.core.package_managers.bundler.parser.GemDependency.download_to")
+@mock.patch("hermeto.core.package_managers.bundler.main.download_gems")
 @mock.patch("hermeto.core.package_managers.bundler.parser.GitDependency.download_to")
 @mock.patch("hermeto.core.package_managers.bundler.parser.PathDependency.download_to")
 def test_resolve_bundler_package(
     mock_path_dep_download_to: mock.Mock,
     mock_git_dep_download_to: mock.Mock,
-    mock_gem_dep_download_to: mock.Mock,
+    mock_download_gems: mock.Mock,
     mock_parse_lockfile: mock.Mock,
     mock_get_main_package_name_and_version: mock.Mock,
     rooted_tmp_path_repo: RootedPath,
@@ -66,7 +66,7 @@ def test_resolve_bundler_package(
 
     mock_parse_lockfile.assert_called_once_with(package_dir, False)
     mock_get_main_package_name_and_version.assert_called_once_with(package_dir, deps)
-    mock_gem_dep_download_to.assert_called_with(deps_dir)
+    mock_download_gems.assert_called_once_with([gem_dep], deps_dir)
     mock_git_dep_download_to.assert_called_with(deps_dir)
     mock_path_dep_download_to.assert_called_with(deps_dir)
 
@@ -75,6 +75,53 @@ def test_resolve_bundler_package(
     assert deps_dir.path.exists()
 
 
+@mock.patch("hermeto.core.package_managers.bundler.main._get_main_package_name_and_version")
+@mock.patch("hermeto.core.package_managers.bundler.main.parse_lockfile")
+@mock.patch("hermeto.core.package_managers.bundler.main.download_gems")
+@mock.patch("hermeto.core.package_managers.bundler.parser.GitDependency.download_to")
+@pytest.mark.parametrize(
+    "urls",
+    [
+        pytest.param(
+            ("https://github.com/rubygems/example.git", "https://github.com/rubygems/example.git"),
+            id="same_repository",
+        ),
+        pytest.param(
+            ("https://github.com/rubygems/example.git", "https://github.com/fork/example.git"),
+            id="forks_with_same_target_directory",
+        ),
+    ],
+)
+def test_resolve_bundler_package_clones_each_git_repo_once(
+    mock_git_dep_download_to: mock.Mock,
+    mock_download_gems: mock.Mock,
+    mock_parse_lockfile: mock.Mock,
+    mock_get_main_package_name_and_version: mock.Mock,
+    rooted_tmp_path_repo: RootedPath,
+    urls: tuple[str, str],
+) -> None:
+    Repo(rooted_tmp_path_repo).create_remote("origin", "git@github.com:user/repo.git")
+    output_dir = rooted_tmp_path_repo.join_within_root("hermeto-output")
+
+    # a single repository (or forks of it at one commit) can provide several gems
+    mock_parse_lockfile.return_value = [
+        GitDependency(name=name, version="0.1.0", url=url, ref=GIT_REF)
+        for name, url in zip(("first-gem", "second-gem"), urls)
+    ]
+    mock_get_main_package_name_and_version.return_value = ("name", None)
+
+    components, git_paths = _resolve_bundler_package(
+        package_dir=rooted_tmp_path_repo, output_dir=output_dir
+    )
+
+    mock_git_dep_download_to.assert_called_once_with(output_dir.join_within_root("deps", "bundler"))
+    assert len(components) == 3
+    assert git_paths == [
+        ("first-gem", f"example-{GIT_REF[:12]}"),
+        ("second-gem", f"example-{GIT_REF[:12]}"),
+    ]
+
+
 def test_get_main_package_name_and_version(rooted_tmp_path: RootedPath) -> None:
     dependencies: ParseResult = [
         GemDependency(
@@ -3,6 +3,7 @@ import re
 import subprocess
 from copy import deepcopy
 from pathlib import Path
+from textwrap import dedent
 from typing import Any, Iterable
 from unittest import mock
 
@@ -10,6 +11,7 @@ import pydantic
 import pytest
 from git.repo import Repo
 
+from hermeto.core.checksum import ChecksumInfo
 from hermeto.core.errors import PackageManagerError, PackageRejected, UnexpectedFormat
 from hermeto.core.package_managers.bundler.parser import (
     GEMFILE,
@@ -19,6 +21,7 @@ from hermeto.core.package_managers.bundler.parser import (
     GemPlatformSpecificDependency,
     GitDependency,
     PathDependency,
+    download_gems,
     parse_lockfile,
 )
 from hermeto.core.rooted_path import RootedPath
@@ -194,6 +197,74 @@ def test_parse_gemlock(
     assert result == expected_deps
 
 
+@mock.patch("hermeto.core.package_managers.bundler.parser.run_cmd")
+def test_parse_gemlock_with_checksums(
+    mock_run_cmd: mock.MagicMock,
+    empty_bundler_files: tuple[RootedPath, RootedPath],
+    rooted_tmp_path: RootedPath,
+) -> None:
+    sha_foo, sha_bar = "a" * 64, "b" * 64
+    empty_bundler_files[1].path.write_text(
+        dedent(
+            f"""
+            GEM
+              remote: https://rubygems.org/
+              specs:
+                bar (2.0.0-x86_64-linux)
+                foo (1.0.0)
+
+            CHECKSUMS
+              bar (2.0.0-x86_64-linux) sha256={sha_bar}
+              foo (1.0.0) sha256={sha_foo},md5=0123456789abcdef
+              pathgem (0.1.0)
+
+            BUNDLED WITH
+               2.5.10
+            """
+        )
+    )
+    mock_run_cmd.return_value = json.dumps(
+        {
+            "bundler_version": "2.5.10",
+            "dependencies": [
+                {
+                    "type": "rubygems",
+                    "name": name,
+                    "version": version,
+                    "source": "https://rubygems.org/",
+                    "platform": platform,
+                }
+                for name, version, platform in [
+                    ("bar", "2.0.0", "x86_64-linux"),
+                    ("foo", "1.0.0", "ruby"),
+                    ("baz", "3.0.0", "ruby"),
+                ]
+            ],
+        }
+    )
+
+    result = parse_lockfile(rooted_tmp_path, allow_binary=True)
+
+    assert [dep.checksums for dep in result if isinstance(dep, GemDependency)] == [
+        [ChecksumInfo("sha256", sha_bar)],
+        [ChecksumInfo("sha256", sha_foo), ChecksumInfo("md5", "0123456789abcdef")],
+        [],
+    ]
+
+
+@mock.patch("hermeto.core.package_managers.bundler.parser.run_cmd")
+def test_parse_gemlock_with_invalid_checksums(
+    mock_run_cmd: mock.MagicMock,
+    empty_bundler_files: tuple[RootedPath, RootedPath],
+    rooted_tmp_path: RootedPath,
+) -> None:
+    empty_bundler_files[1].path.write_text("CHECKSUMS\n  foo 1.0.0 sha256=abc\n")
+    mock_run_cmd.return_value = '{"bundler_version": "2.5.10", "dependencies": []}'
+
+    with pytest.raises(UnexpectedFormat, match="Invalid entry in the CHECKSUMS section"):
+        parse_lockfile(rooted_tmp_path)
+
+
 @mock.patch("hermeto.core.package_managers.bundler.parser.run_cmd")
 def test_parse_gemlock_empty(
     mock_run_cmd: mock.MagicMock,
@@ -215,7 +286,7 @@ def test_parse_gemlock_empty(
         "https://dedicatedprivategemrepo.com",
     ],
 )
-@mock.patch("hermeto.core.package_managers.bundler.parser.download_binary_file")
+@mock.patch("hermeto.core.package_managers.bundler.parser.download_files")
 def test_source_gem_dependencies_could_be_downloaded(
     mock_downloader: mock.MagicMock,
     caplog: pytest.LogCaptureFixture,
@@ -228,11 +299,13 @@ def test_source_gem_dependencies_could_be_downloaded(
 
     dependency.download_to(base_destination)
 
-    assert f"Downloading gem {dependency.name}" in caplog.messages
-    mock_downloader.assert_called_once_with(expected_source_url, expected_destination)
+    assert "Downloading gem foo-0.0.2" in caplog.messages
+    mock_downloader.assert_called_once_with(
+        {expected_source_url: expected_destination}, checksums={}
+    )
 
 
-@mock.patch("hermeto.core.package_managers.bundler.parser.download_binary_file")
+@mock.patch("hermeto.core.package_managers.bundler.parser.download_files")
 def test_binary_gem_dependencies_could_be_downloaded(
     mock_downloader: mock.MagicMock,
     caplog: pytest.LogCaptureFixture,
@@ -252,7 +325,41 @@ def test_binary_gem_dependencies_could_be_downloaded(
     dependency.download_to(base_destination)
 
     assert some_message_contains_substring("Downloading platform-specific gem", caplog.messages)
-    mock_downloader.assert_called_once_with(expected_source_url, expected_destination)
+    mock_downloader.assert_called_once_with(
+        {expected_source_url: expected_destination}, checksums={}
+    )
+
+
+@mock.patch("hermeto.core.package_managers.bundler.parser.download_files")
+def test_download_gems(mock_downloader: mock.MagicMock, caplog: pytest.LogCaptureFixture) -> None:
+    deps_dir = RootedPath("/tmp/foo")
+    checksum = ChecksumInfo("sha256", "a" * 64)
+    gems = [
+        GemDependency(
+            name="foo", version="0.0.2", source="https://rubygems.org", checksums=[checksum]
+        ),
+        GemPlatformSpecificDependency(
+            name="bar", version="1.0.0", source="https://rubygems.org", platform="x86_64-linux"
+        ),
+    ]
+
+    download_gems(gems, deps_dir)
+
+    mock_downloader.assert_called_once_with(
+        {
+            "https://rubygems.org/downloads/foo-0.0.2.gem": deps_dir.join_within_root(
+                "foo-0.0.2.gem"
+            ),
+            "https://rubygems.org/downloads/bar-1.0.0-x86_64-linux.gem": deps_dir.join_within_root(
+                "bar-1.0.0-x86_64-linux.gem"
+            ),
+        },
+        checksums={"https://rubygems.org/downloads/foo-0.0.2.gem": [checksum]},
+    )
+    assert (
+        "Missing checksum for gem bar-1.0.0-x86_64-linux, integrity check skipped."
+        in caplog.messages
+    )
 
 
 @mock.patch("hermeto.core.package_managers.bundler.parser.Repo.clone_from")
@@ -280,6 +387,33 @@ def test_download_git_dependency_works(
     assert dep_path.exists()
 
 
+@mock.patch("hermeto.core.package_managers.bundler.parser.GitMirrorCache.from_config")
+@mock.patch("hermeto.core.package_managers.bundler.parser.Repo.clone_from")
+def test_download_git_dependency_from_mirror(
+    mock_git_clone: mock.Mock,
+    mock_mirror_cache: mock.Mock,
+    rooted_tmp_path: RootedPath,
+) -> None:
+    dep = GitDependency(
+        name="example",
+        version="0.1.0",
+        url="https://github.com/user/repo.git",
+        ref=GIT_REF,
+    )
+    mirror = Path("/cache/git/github.com/user/repo.git")
+    mock_mirror_cache.return_value.update.return_value = mirror
+
+    dep.download_to(deps_dir=rooted_tmp_path)
+
+    mock_mirror_cache.return_value.update.assert_called_once_with(str(dep.url), GIT_REF)
+    mock_git_clone.assert_called_once_with(
+        url=str(mirror),
+        to_path=rooted_tmp_path.join_within_root(f"{dep.repo_name}-{dep.ref[:12]}").path,
+        env={"GIT_TERMINAL_PROMPT": "0"},
+    )
+    mock_git_clone.return_value.remote.return_value.set_url.assert_called_once_with(str(dep.url))
+
+
 @mock.patch("hermeto.core.package_managers.bundler.parser.Repo.clone_from")
 def test_download_duplicate_git_dependency_is_skipped(
     mock_git_clone: mock.Mock,
@@ -1,11 +1,16 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 import asyncio
+import hashlib
+import logging
 import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from os import PathLike
 from pathlib import Path
 from typing import Any, Dict, Optional, Union
 from unittest import mock
 from unittest.mock import MagicMock
+from urllib.parse import urlparse
 
 import aiohttp
 import aiohttp_retry
@@ -13,8 +18,11 @@ import pytest
 import requests
 from requests.auth import AuthBase, HTTPBasicAuth
 
+from hermeto.core.artifact_cache import ArtifactCache
+from hermeto.core.checksum import ChecksumInfo
 from hermeto.core.config import get_config
-from hermeto.core.errors import FetchError
+from hermeto.core.errors import FetchError, PackageRejected
+from hermeto.core.host_limits import HostLimits
 from hermeto.core.package_managers import general
 from hermeto.core.package_managers.general import (
     _async_download_binary_file,
@@ -183,6 +191,7 @@ async def test_async_download_binary_file(
         auth=None,
         raise_for_status=True,
         ssl=None,
+        headers={},
     )
 
 
@@ -205,6 +214,248 @@ async def test_async_download_binary_file_exception(
     assert str(exc_info.value) == f"exception_name: Exception, details: {exception_message}"
 
 
+def mock_session_with_chunks(*chunks: bytes) -> MagicMock:
+    response, session = MagicMock(), MagicMock()
+    response.content.read = mock.AsyncMock(side_effect=[*chunks, b""])
+
+    async def mock_aenter() -> MagicMock:
+        return response
+
+    session.get().__aenter__.side_effect = mock_aenter
+    return session
+
+
+CHUNKS = (b"first_chunk-", b"second_chunk-")
+CHUNKS_SHA256 = ChecksumInfo("sha256", hashlib.sha256(b"".join(CHUNKS)).hexdigest())
+
+
+@pytest.mark.asyncio
+async def test_async_download_binary_file_verified(tmp_path: Path) -> None:
+    download_path = tmp_path / "file.tar"
+    session = mock_session_with_chunks(*CHUNKS)
+
+    hexdigests = await _async_download_binary_file(
+        session,
+        "http://example.com/file.tar",
+        download_path,
+        checksums=[ChecksumInfo("sha512", "a" * 128), CHUNKS_SHA256],
+        size=len(b"".join(CHUNKS)),
+    )
+
+    assert download_path.read_bytes() == b"".join(CHUNKS)
+    assert not download_path.with_name("file.tar.part").exists()
+    assert hexdigests["sha256"] == CHUNKS_SHA256.hexdigest
+    assert hexdigests["sha512"] == hashlib.sha512(b"".join(CHUNKS)).hexdigest()
+
+
+@pytest.mark.parametrize(
+    "checksums, size, expect_error",
+    [
+        pytest.param(
+            [ChecksumInfo("sha256", "a" * 64)],
+            None,
+            "Failed to verify file.tar against any of the provided checksums.",
+            id="checksum_mismatch",
+        ),
+        pytest.param(
+            [CHUNKS_SHA256],
+            5,
+            "Unexpected size of file.tar: expected 5 bytes, got over 5",
+            id="file_too_big",
+        ),
+        pytest.param(
+            [CHUNKS_SHA256],
+            1000,
+            "Unexpected size of file.tar: expected 1000 bytes, got 25",
+            id="file_too_small",
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_async_download_binary_file_rejected(
+    checksums: list[ChecksumInfo], size: Optional[int], expect_error: str, tmp_path: Path
+) -> None:
+    download_path = tmp_path / "file.tar"
+    # a file from a previous run must not be replaced by the rejected download
+    download_path.write_bytes(b"previous content")
+    session = mock_session_with_chunks(*CHUNKS)
+
+    with pytest.raises(PackageRejected, match=expect_error):
+        await _async_download_binary_file(
+            session, "http://example.com/file.tar", download_path, checksums=checksums, size=size
+        )
+
+    assert download_path.read_bytes() == b"previous content"
+    assert not download_path.with_name("file.tar.part").exists()
+
+
+@pytest.mark.asyncio
+async def test_async_download_binary_file_stops_on_oversized_file(tmp_path: Path) -> None:
+    session = mock_session_with_chunks(*CHUNKS, b"more-", b"and more")
+
+    with pytest.raises(PackageRejected):
+        await _async_download_binary_file(
+            session, "http://example.com/file.tar", tmp_path / "file.tar", size=len(CHUNKS[0])
+        )
+
+    response = await session.get().__aenter__()
+    assert response.content.read.call_count == 2
+
+
+def mock_response(
+    *chunks: Union[bytes, Exception], status: int = 200, headers: Optional[dict[str, str]] = None
+) -> MagicMock:
+    """Mock a response which returns the chunks (or raises the exceptions) one by one."""
+    response = MagicMock(status=status, headers=headers or {})
+    response.content.read = mock.AsyncMock(side_effect=[*chunks, b""])
+    return response
+
+
+def mock_session_with_responses(*responses: MagicMock) -> MagicMock:
+    session = MagicMock()
+    session.get.return_value.__aenter__ = mock.AsyncMock(side_effect=responses)
+    session.get.return_value.__aexit__ = mock.AsyncMock(return_value=None)
+    return session
+
+
+BROKEN_OFF = aiohttp.ClientPayloadError("Response payload is not completed")
+
+
+@pytest.mark.parametrize(
+    "first_headers, expect_validator",
+    [
+        pytest.param({"ETag": '"abc"'}, '"abc"', id="etag"),
+        pytest.param(
+            {"ETag": 'W/"abc"', "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"},
+            "Wed, 21 Oct 2015 07:28:00 GMT",
+            id="weak_etag_and_last_modified",
+        ),
+    ],
+)
+@pytest.mark.asyncio
+@mock.patch("asyncio.sleep")
+async def test_async_download_binary_file_resumes(
+    mock_sleep: mock.AsyncMock,
+    first_headers: dict[str, str],
+    expect_validator: str,
+    tmp_path: Path,
+) -> None:
+    first_chunk, second_chunk = CHUNKS
+    session = mock_session_with_responses(
+        mock_response(first_chunk, BROKEN_OFF, headers=first_headers),
+        mock_response(
+            second_chunk,
+            status=206,
+            headers={"Content-Range": f"bytes {len(first_chunk)}-24/25", **first_headers},
+        ),
+    )
+
+    await _async_download_binary_file(
+        session, "http://example.com/file.tar", tmp_path / "file.tar", checksums=[CHUNKS_SHA256]
+    )
+
+    assert tmp_path.joinpath("file.tar").read_bytes() == b"".join(CHUNKS)
+    assert session.get.call_args.kwargs["headers"] == {
+        "Range": f"bytes={len(first_chunk)}-",
+        "If-Range": expect_validator,
+    }
+    mock_sleep.assert_awaited_once_with(1.3)
+
+
+@pytest.mark.parametrize(
+    "first_headers, expect_headers",
+    [
+        # the file changed in the meantime, the server ignores the Range
+        pytest.param({"ETag": '"abc"'}, {"Range": "bytes=12-", "If-Range": '"abc"'}, id="changed"),
+        # without a validator, the download can't be resumed safely
+        pytest.param({}, {}, id="no_validator"),
+    ],
+)
+@pytest.mark.asyncio
+@mock.patch("asyncio.sleep")
+async def test_async_download_binary_file_restarts(
+    mock_sleep: mock.AsyncMock,
+    first_headers: dict[str, str],
+    expect_headers: dict[str, str],
+    tmp_path: Path,
+) -> None:
+    session = mock_session_with_responses(
+        mock_response(b"old-content-", BROKEN_OFF, headers=first_headers),
+        mock_response(*CHUNKS, status=200),
+    )
+
+    await _async_download_binary_file(
+        session, "http://example.com/file.tar", tmp_path / "file.tar", checksums=[CHUNKS_SHA256]
+    )
+
+    assert tmp_path.joinpath("file.tar").read_bytes() == b"".join(CHUNKS)
+    assert session.get.call_args.kwargs["headers"] == expect_headers
+
+
+@pytest.mark.asyncio
+@mock.patch("asyncio.sleep")
+async def test_async_download_binary_file_unexpected_content_range(
+    mock_sleep: mock.AsyncMock, tmp_path: Path
+) -> None:
+    session = mock_session_with_responses(
+        mock_response(b"first_chunk-", BROKEN_OFF, headers={"ETag": '"abc"'}),
+        mock_response(b"chunk-", status=206, headers={"Content-Range": "bytes 0-5/25"}),
+    )
+
+    with pytest.raises(FetchError, match="Cannot resume the download from byte 12"):
+        await _async_download_binary_file(
+            session, "http://example.com/file.tar", tmp_path / "file.tar"
+        )
+
+    assert not tmp_path.joinpath("file.tar.part").exists()
+
+
+@pytest.mark.asyncio
+@mock.patch("asyncio.sleep")
+async def test_async_download_binary_file_gives_up_resuming(
+    mock_sleep: mock.AsyncMock, tmp_path: Path
+) -> None:
+    session = mock_session_with_responses(
+        *[mock_response(b"chunk-", BROKEN_OFF, headers={"ETag": '"abc"'}) for _ in range(5)]
+    )
+
+    with pytest.raises(FetchError, match="ClientPayloadError"):
+        await _async_download_binary_file(
+            session, "http://example.com/file.tar", tmp_path / "file.tar"
+        )
+
+    assert session.get.call_count == 5
+    assert mock_sleep.await_count == 4
+    assert not tmp_path.joinpath("file.tar.part").exists()
+
+
+@pytest.mark.parametrize("discard_mismatches", [True, False])
+@pytest.mark.asyncio
+@mock.patch("hermeto.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_mismatch(
+    mock_download_file: MagicMock,
+    discard_mismatches: bool,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    mock_download_file.side_effect = PackageRejected("checksum mismatch", solution=None)
+    files_to_download: Dict[str, Union[str, PathLike[str]]] = {
+        "https://example.org/file.tar": tmp_path / "file.tar"
+    }
+    checksums = {"https://example.org/file.tar": [CHUNKS_SHA256]}
+
+    if discard_mismatches:
+        await async_download_files(
+            files_to_download, 1, checksums=checksums, discard_mismatches=True
+        )
+        assert "Download 'file.tar' was removed from the output directory" in caplog.text
+    else:
+        with pytest.raises(PackageRejected):
+            await async_download_files(files_to_download, 1, checksums=checksums)
+
+    assert mock_download_file.call_args.kwargs["checksums"] == [CHUNKS_SHA256]
+
+
 @pytest.mark.asyncio
 @mock.patch("hermeto.core.package_managers.general._async_download_binary_file")
 async def test_async_download_files(
@@ -266,3 +517,220 @@ async def test_async_download_files_exception(
 
     assert f"Unsuccessful download: {url}" in caplog.text
     assert str(exc_info.value) == f"exception_name: Exception, details: {exception_message}"
+
+
+@pytest.mark.asyncio
+@mock.patch("hermeto.core.package_managers.general.ArtifactCache.from_config")
+@mock.patch("hermeto.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_artifact_cache(
+    mock_download_file: MagicMock,
+    mock_cache_from_config: MagicMock,
+    tmp_path: Path,
+) -> None:
+    cache = ArtifactCache(tmp_path / "cache")
+    mock_cache_from_config.return_value = cache
+
+    cached_content, new_content = b"cached content", b"new content"
+    cached_checksum = ChecksumInfo("sha256", hashlib.sha256(cached_content).hexdigest())
+    new_checksum = ChecksumInfo("sha256", hashlib.sha256(new_content).hexdigest())
+
+    seed = tmp_path / "seed"
+    seed.write_bytes(cached_content)
+    cache.store(seed, [cached_checksum])
+
+    async def mock_download_binary_file(
+        session: aiohttp_retry.RetryClient,
+        url: str,
+        download_path: str,
+        **kwargs: Any,
+    ) -> None:
+        Path(download_path).write_bytes(new_content)
+
+    mock_download_file.side_effect = mock_download_binary_file
+
+    files_to_download: Dict[str, Union[str, PathLike[str]]] = {
+        "https://example.org/cached": tmp_path / "cached",
+        "https://example.org/new": tmp_path / "new",
+    }
+    checksums = {
+        "https://example.org/cached": [cached_checksum],
+        "https://example.org/new": [new_checksum],
+    }
+
+    await async_download_files(files_to_download, 2, checksums=checksums)
+
+    assert tmp_path.joinpath("cached").read_bytes() == cached_content
+    assert tmp_path.joinpath("new").read_bytes() == new_content
+    mock_download_file.assert_called_once()
+    assert mock_download_file.call_args.args[1] == "https://example.org/new"
+    # the new file got cached as well
+    assert cache.lookup([new_checksum]) is not None
+
+
+@pytest.mark.asyncio
+@mock.patch("hermeto.core.package_managers.general.ArtifactCache.from_config")
+@mock.patch("hermeto.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_artifact_cache_mismatch(
+    mock_download_file: MagicMock,
+    mock_cache_from_config: MagicMock,
+    tmp_path: Path,
+) -> None:
+    cache = ArtifactCache(tmp_path / "cache")
+    mock_cache_from_config.return_value = cache
+
+    content = b"content"
+    checksum = ChecksumInfo("sha256", hashlib.sha256(content).hexdigest())
+    seed = tmp_path / "seed"
+    seed.write_bytes(content)
+    cache.store(seed, [checksum])
+    # the cached file got modified through a hard link
+    seed.write_bytes(b"modified")
+
+    async def mock_download_binary_file(
+        session: aiohttp_retry.RetryClient,
+        url: str,
+        download_path: str,
+        **kwargs: Any,
+    ) -> None:
+        Path(download_path).write_bytes(content)
+
+    mock_download_file.side_effect = mock_download_binary_file
+
+    url = "https://example.org/file"
+    await async_download_files({url: tmp_path / "file"}, 1, checksums={url: [checksum]})
+
+    mock_download_file.assert_called_once()
+    assert tmp_path.joinpath("file").read_bytes() == content
+    # the cache holds the good file again
+    entry = cache.lookup([checksum])
+    assert entry is not None and entry.read_bytes() == content
+
+
+@pytest.mark.asyncio
+@mock.patch("hermeto.core.package_managers.general.ArtifactCache.from_config")
+@mock.patch("hermeto.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_artifact_cache_store_error(
+    mock_download_file: MagicMock,
+    mock_cache_from_config: MagicMock,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    mock_cache = mock_cache_from_config.return_value
+    mock_cache.restore.return_value = False
+    mock_cache.store.side_effect = OSError("No space left on device")
+
+    async def mock_download_binary_file(
+        session: aiohttp_retry.RetryClient,
+        url: str,
+        download_path: str,
+        **kwargs: Any,
+    ) -> None:
+        Path(download_path).write_bytes(b"content")
+
+    mock_download_file.side_effect = mock_download_binary_file
+
+    url = "https://example.org/file"
+    checksum = ChecksumInfo("sha256", hashlib.sha256(b"content").hexdigest())
+    await async_download_files({url: tmp_path / "file"}, 1, checksums={url: [checksum]})
+
+    # the verified download is kept, the cache failure is only a warning
+    assert tmp_path.joinpath("file").read_bytes() == b"content"
+    assert "Failed to store file in the artifact cache: No space left on device" in caplog.text
+
+
+@pytest.mark.asyncio
+@mock.patch("hermeto.core.package_managers.general.HostLimits.from_config")
+@mock.patch("hermeto.core.package_managers.general._async_download_binary_file")
+async def test_async_download_files_per_host_limits(
+    mock_download_file: MagicMock,
+    mock_host_limits_from_config: MagicMock,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    host_limits = HostLimits(default_limit=4, per_host={"slow.example.org": 1})
+    mock_host_limits_from_config.return_value = host_limits
+    running: Counter[str] = Counter()
+    max_running: Counter[str] = Counter()
+
+    async def mock_download_binary_file(
+        session: aiohttp_retry.RetryClient, url: str, download_path: Path, **kwargs: Any
+    ) -> None:
+        host = urlparse(url).netloc
+        running[host] += 1
+        max_running[host] = max(max_running[host], running[host])
+        await asyncio.sleep(0.01)
+        running[host] -= 1
+        download_path.write_bytes(b"content")
+
+    mock_download_file.side_effect = mock_download_binary_file
+
+    # the downloads from the slow host come first, they must not block the other host
+    files_to_download: Dict[str, Union[str, PathLike[str]]] = {
+        f"https://{host}/{i}": tmp_path / f"{host}-{i}"
+        for host in ("slow.example.org", "fast.example.org")
+        for i in range(8)
+    }
+    with caplog.at_level(logging.INFO):
+        await async_download_files(files_to_download, 5)
+
+    assert max_running == {"slow.example.org": 1, "fast.example.org": 4}
+    assert host_limits.stats()["fast.example.org"].bytes == 8 * len(b"content")
+    assert "Downloaded 8 files (0.0 MiB) from fast.example.org" in caplog.text
+
+
+@mock.patch("hermeto.core.package_managers.general._async_download_binary_file")
+def test_shared_download_service(mock_download_file: MagicMock, tmp_path: Path) -> None:
+    with general.shared_download_service() as service:
+        general.download_files({"https://example.org/a": tmp_path / "a"})
+        general.download_files({"https://example.org/b": tmp_path / "b"})
+
+    assert general._download_service is None
+    # both batches were downloaded using the same session, i.e. the same connection pool
+    (session_a, *_), (session_b, *_) = [call.args for call in mock_download_file.call_args_list]
+    assert session_a is session_b
+    assert session_a._client.closed
+    assert service.concurrency_limit == get_config().concurrency_limit
+
+
+@mock.patch("hermeto.core.package_managers.general._async_download_binary_file")
+def test_shared_download_service_concurrency_budget(
+    mock_download_file: MagicMock, tmp_path: Path
+) -> None:
+    running, max_running = 0, 0
+
+    async def mock_download_binary_file(*args: Any, **kwargs: Any) -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    mock_download_file.side_effect = mock_download_binary_file
+
+    files_to_download: Dict[str, Union[str, PathLike[str]]] = {
+        f"https://example.org/{i}": tmp_path / str(i) for i in range(10)
+    }
+    with general.DownloadService(concurrency_limit=2) as service:
+        # submit from several threads at once, the budget is shared among them
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(service.download_files, [files_to_download] * 3))
+
+    assert mock_download_file.call_count == 30
+    assert max_running == 2
+
+
+@mock.patch("hermeto.core.package_managers.general.async_download_files")
+def test_download_files_without_service(mock_async_download: MagicMock, tmp_path: Path) -> None:
+    files_to_download: Dict[str, Union[str, PathLike[str]]] = {
+        "https://example.org/a": tmp_path / "a"
+    }
+    general.download_files(files_to_download, checksums={})
+
+    mock_async_download.assert_awaited_once_with(
+        files_to_download,
+        get_config().concurrency_limit,
+        ssl_context=None,
+        checksums={},
+        sizes=None,
+        discard_mismatches=False,
+    )
@@ -108,15 +108,6 @@ artifacts:
       checksum: md5:3a18656e1cea70504b905836dee14db0
 """
 
-LOCKFILE_WRONG_CHECKSUM = """
-metadata:
-    version: '1.0'
-artifacts:
-    - download_url: https://example.com/artifact
-      filename: archive.zip
-      checksum: md5:32112bed1914cfe3799600f962750b1d
-"""
-
 
 @pytest.mark.parametrize(
     ["model_input", "components"],
@@ -201,12 +192,6 @@ def test_resolve_generic_no_lockfile(mock_load: mock.Mock, rooted_tmp_path: Root
             "Duplicate download_urls",
             id="conflicting_urls",
         ),
-        pytest.param(
-            LOCKFILE_WRONG_CHECKSUM,
-            PackageRejected,
-            "Failed to verify archive.zip against any of the provided checksums.",
-            id="wrong_checksum",
-        ),
         pytest.param(
             LOCKFILE_WRONG_CHECKSUM_FORMAT,
             PackageRejected,
@@ -215,11 +200,9 @@ def test_resolve_generic_no_lockfile(mock_load: mock.Mock, rooted_tmp_path: Root
         ),
     ],
 )
-@mock.patch("hermeto.core.package_managers.generic.main.asyncio.run")
-@mock.patch("hermeto.core.package_managers.generic.main.async_download_files")
+@mock.patch("hermeto.core.package_managers.generic.main.download_files")
 def test_resolve_generic_lockfile_invalid(
     mock_download: mock.Mock,
-    mock_asyncio_run: mock.Mock,
     lockfile: str,
     expected_exception: Type[BaseError],
     expected_err: str,
@@ -306,13 +289,9 @@ def test_resolve_generic_lockfile_invalid(
         ),
     ],
 )
-@mock.patch("hermeto.core.package_managers.generic.main.asyncio.run")
-@mock.patch("hermeto.core.package_managers.generic.main.async_download_files")
-@mock.patch("hermeto.core.package_managers.generic.main.must_match_any_checksum")
+@mock.patch("hermeto.core.package_managers.generic.main.download_files")
 def test_resolve_generic_lockfile_valid(
-    mock_checksums: mock.Mock,
     mock_download: mock.Mock,
-    mock_asyncio_run: mock.Mock,
     lockfile_content: str,
     expected_components: list[dict[str, Any]],
     rooted_tmp_path: RootedPath,
@@ -326,7 +305,11 @@ def test_resolve_generic_lockfile_valid(
         c.model_dump(exclude_none=True)
         for c in _resolve_generic_lockfile(lockfile_path.path, rooted_tmp_path)
     ] == expected_components
-    mock_checksums.assert_called()
+    # checksums are verified while downloading
+    checksums = mock_download.call_args.kwargs["checksums"]
+    assert [str(checksum) for (checksum,) in checksums.values()] == [
+        component["purl"].split("checksum=")[1].split("&")[0] for component in expected_components
+    ]
 
 
 def test_load_generic_lockfile_valid(rooted_tmp_path: RootedPath) -> None:
@@ -4,6 +4,8 @@ import os
 import re
 import subprocess
 import textwrap
+import threading
+import time
 from pathlib import Path
 from string import Template
 from typing import Any, Iterator, Literal, Optional, Tuple, Union
@@ -14,12 +16,14 @@ import pytest
 from packaging import version
 
 from hermeto import APP_NAME
+from hermeto.core.config import Config
 from hermeto.core.errors import FetchError, PackageManagerError, PackageRejected, UnexpectedFormat
 from hermeto.core.models.input import Flag, Request
 from hermeto.core.models.output import BuildConfig, EnvironmentVariable, RequestOutput
 from hermeto.core.models.sbom import Component, Property
 from hermeto.core.package_managers.gomod import (
     Go,
+    GoModuleCache,
     GoWork,
     Module,
     ModuleDict,
@@ -299,9 +303,11 @@ def test_resolve_gomod(
 @mock.patch("hermeto.core.package_managers.gomod.ModuleVersionResolver")
 @mock.patch("hermeto.core.package_managers.gomod._validate_local_replacements")
 @mock.patch("hermeto.core.package_managers.gomod._vendor_changed")
+@mock.patch("hermeto.core.package_managers.gomod.stream_cmd")
 @mock.patch("subprocess.run")
 def test_resolve_gomod_vendor_dependencies(
     mock_run: mock.Mock,
+    mock_stream_cmd: mock.Mock,
     mock_vendor_changed: mock.Mock,
     mock_validate_local_replacements: mock.Mock,
     mock_version_resolver: mock.Mock,
@@ -330,22 +336,14 @@ def test_resolve_gomod_vendor_dependencies(
             ),
         )
     )
-    run_side_effects.append(
-        proc_mock(
-            "go list -e -deps -json all",
-            returncode=0,
-            stdout=get_mocked_data(data_dir, "vendored/go_list_deps_all.json"),
-        )
-    )
-    run_side_effects.append(
-        proc_mock(
-            "go list -e -deps -json ./...",
-            returncode=0,
-            stdout=get_mocked_data(data_dir, "vendored/go_list_deps_threedot.json"),
-        )
-    )
     mock_run.side_effect = run_side_effects
 
+    # "go list -e -deps -json all" and "go list -e -deps -json ./..."
+    mock_stream_cmd.side_effect = [
+        [get_mocked_data(data_dir, "vendored/go_list_deps_all.json")],
+        [get_mocked_data(data_dir, "vendored/go_list_deps_threedot.json")],
+    ]
+
     mock_version_resolver.get_golang_version.return_value = "v0.1.0"
     mock_go_release.return_value = "go0.1.0"
     mock_get_gomod_version.return_value = ("0.1.1", "0.1.2")
@@ -365,8 +363,8 @@ def test_resolve_gomod_vendor_dependencies(
 
     assert mock_run.call_args_list[0][0][0] == [GO_CMD_PATH, "mod", "vendor"]
     assert mock_run.call_args_list[0][1]["env"]["GOMODCACHE"] == f"{tmp_path}/vendor-cache"
-    assert mock_run.call_args_list[-2][0][0] == [
-        GO_CMD_PATH,
+    assert mock_stream_cmd.call_args_list[0][0][0] == [
+        "go",
         "list",
         "-e",
         "-deps",
@@ -388,9 +386,11 @@ def test_resolve_gomod_vendor_dependencies(
 @mock.patch("hermeto.core.package_managers.gomod.Go._locate_toolchain")
 @mock.patch("hermeto.core.package_managers.gomod._get_gomod_version")
 @mock.patch("hermeto.core.package_managers.gomod.ModuleVersionResolver")
+@mock.patch("hermeto.core.package_managers.gomod.stream_cmd")
 @mock.patch("subprocess.run")
 def test_resolve_gomod_no_deps(
     mock_run: mock.Mock,
+    mock_stream_cmd: mock.Mock,
     mock_version_resolver: mock.Mock,
     mock_get_gomod_version: mock.Mock,
     mock_go_locate_toolchain: mock.Mock,
@@ -440,13 +440,9 @@ def test_resolve_gomod_no_deps(
             stdout=mock_go_list_modules,
         )
     )
-    run_side_effects.append(
-        proc_mock("go list -e -deps -json all", returncode=0, stdout=mock_pkg_deps_no_deps)
-    )
-    run_side_effects.append(
-        proc_mock("go list -e -deps -json ./...", returncode=0, stdout=mock_pkg_deps_no_deps)
-    )
     mock_run.side_effect = run_side_effects
+    # "go list -e -deps -json all" and "go list -e -deps -json ./..."
+    mock_stream_cmd.side_effect = [[mock_pkg_deps_no_deps], [mock_pkg_deps_no_deps]]
 
     mock_version_resolver.get_golang_version.return_value = "v1.21.4"
     mock_go_release.return_value = "go1.21.0"
@@ -1108,6 +1104,51 @@ def test_create_packages_from_parsed_data() -> None:
     assert packages == expect_packages
 
 
+@pytest.mark.parametrize(
+    "import_path, expect_module, expect_relative_path",
+    [
+        pytest.param("github.com/foo/bar", "github.com/foo/bar", "", id="module_itself"),
+        pytest.param("github.com/foo/bar/pkg", "github.com/foo/bar", "pkg", id="package"),
+        pytest.param(
+            "github.com/foo/bar/nested/pkg/sub",
+            "github.com/foo/bar/nested",
+            "pkg/sub",
+            id="longest_match",
+        ),
+        pytest.param(
+            "github.com/foo/barbaz/pkg", "github.com/foo", "barbaz/pkg", id="whole_segments_only"
+        ),
+    ],
+)
+def test_create_packages_without_module_info(
+    import_path: str, expect_module: str, expect_relative_path: str
+) -> None:
+    modules = [
+        Module(name=name, version="v1.0.0", original_name=name, real_path=name)
+        for name in ["github.com/foo", "github.com/foo/bar", "github.com/foo/bar/nested"]
+    ]
+
+    packages = _create_packages_from_parsed_data(modules, [ParsedPackage(import_path=import_path)])
+
+    assert packages == [
+        Package(
+            relative_path=expect_relative_path,
+            module=next(module for module in modules if module.name == expect_module),
+        )
+    ]
+
+
+def test_create_packages_parent_module_not_found() -> None:
+    modules = [
+        Module(
+            name="github.com/foo", version="v1.0.0", original_name="github.com/foo", real_path=""
+        )
+    ]
+
+    with pytest.raises(RuntimeError, match="Package parent module was not found"):
+        _create_packages_from_parsed_data(modules, [ParsedPackage(import_path="example.org/pkg")])
+
+
 @pytest.mark.parametrize(
     "package, expected_component",
     (
@@ -1169,8 +1210,8 @@ def test_package_to_component(package: Package, expected_component: Component) -
 
 
 @pytest.mark.parametrize("pattern", ["./...", "all"])
-@mock.patch("hermeto.core.package_managers.gomod.run_cmd")
-def test_go_list_deps(mock_run_cmd: mock.Mock, pattern: Literal["all", "./..."]) -> None:
+@mock.patch("hermeto.core.package_managers.gomod.stream_cmd")
+def test_go_list_deps(mock_stream_cmd: mock.Mock, pattern: Literal["all", "./..."]) -> None:
     go_list_deps_json = """
         {
             "ImportPath": "time",
@@ -1207,22 +1248,24 @@ def test_go_list_deps(mock_run_cmd: mock.Mock, pattern: Literal["all", "./..."])
         ),
     ]
 
-    mock_run_cmd.return_value = go_list_deps_json
+    # the output arrives in arbitrary chunks, objects get split across them
+    mock_stream_cmd.return_value = iter(
+        go_list_deps_json[i : i + 50] for i in range(0, len(go_list_deps_json), 50)
+    )
     call_args = ["go", "list", "-e", "-deps", "-json=ImportPath,Module,Standard,Deps", pattern]
     assert list(_go_list_deps(Go(), pattern, {})) == parsed_packages
-    mock_run_cmd.assert_called_once_with(call_args, {})
+    mock_stream_cmd.assert_called_once_with(call_args, {})
 
 
-@mock.patch("hermeto.core.package_managers.gomod.run_cmd")
+@mock.patch("hermeto.core.package_managers.gomod.stream_cmd")
 def test_go_list_deps_fail(
-    mock_run_cmd: mock.Mock,
+    mock_stream_cmd: mock.Mock,
 ) -> None:
-    mock_run_cmd.side_effect = subprocess.CalledProcessError(1, cmd="foo")
-    expect_error = "Go execution failed: `go list -e -m -json` failed"
+    mock_stream_cmd.side_effect = subprocess.CalledProcessError(1, cmd="foo")
+    expect_error = "Go execution failed: `go list -e -deps -json=ImportPath,Module,Standard,Deps"
 
-    with pytest.raises(PackageManagerError) as ex:
-        _go_list_deps(Go(), "./...", {})
-        expect_error in str(ex)
+    with pytest.raises(PackageManagerError, match=re.escape(expect_error)):
+        list(_go_list_deps(Go(), "./...", {}))
 
 
 def test_deduplicate_resolved_modules() -> None:
@@ -1414,6 +1457,41 @@ def test_get_golang_version(
     assert version == expected
 
 
+def test_get_golang_version_lists_tags_once(golang_repo_path: Path) -> None:
+    module_dir = RootedPath(golang_repo_path)
+    repo = git.Repo(golang_repo_path)
+    ref = "5401bdd8a8ebfcccd2eea9451d407a5fdae6fc76"
+    repo.git.checkout(ref)
+    version_resolver = ModuleVersionResolver(repo, repo.commit(ref))
+
+    with mock.patch.object(
+        git.cmd.Git, "execute", autospec=True, side_effect=git.cmd.Git.execute
+    ) as mock_execute:
+        versions = [
+            version_resolver.get_golang_version(
+                "github.com/mprahl/test-golang-pseudo-versions/v2", module_dir
+            ),
+            version_resolver.get_golang_version(
+                "github.com/mprahl/test-golang-pseudo-versions/v2",
+                module_dir.join_within_root("submodule"),
+            ),
+            version_resolver.get_golang_version(
+                "github.com/mprahl/test-golang-pseudo-versions", module_dir
+            ),
+        ]
+
+    assert versions == [
+        "v2.5.1-0.20220106193123-5401bdd8a8eb",
+        "v2.5.3",
+        "v1.0.1-0.20220106193123-5401bdd8a8eb",
+    ]
+    # the other git commands only read the commit
+    tag_queries = [
+        call.args[1] for call in mock_execute.call_args_list if "cat-file" not in call.args[1]
+    ]
+    assert len(tag_queries) == 1
+
+
 def test_validate_local_replacements(tmpdir: Path) -> None:
     app_path = RootedPath(tmpdir).join_within_root("subpath")
 
@@ -1856,6 +1934,207 @@ def test_fetch_gomod_source(
     assert output == expected_output
 
 
+@mock.patch("hermeto.core.package_managers.gomod._get_repository_name")
+@mock.patch("hermeto.core.package_managers.gomod._resolve_gomod")
+@mock.patch("hermeto.core.package_managers.gomod.GoCacheTemporaryDirectory")
+@mock.patch("hermeto.core.package_managers.gomod.ModuleVersionResolver.from_repo_path")
+@mock.patch("hermeto.core.package_managers.gomod.GoWork")
+def test_fetch_gomod_source_package_listing_fails(
+    mock_go_work: mock.Mock,
+    mock_version_resolver: mock.Mock,
+    mock_tmp_dir: mock.Mock,
+    mock_resolve_gomod: mock.Mock,
+    mock_get_repository_name: mock.Mock,
+    gomod_request: Request,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    gomod_request.source_dir.join_within_root("go.mod").path.touch()
+    mock_tmp_dir.return_value.__enter__.return_value = str(tmp_path / "go-tmp")
+    mock_get_repository_name.return_value = "github.com/my-org/my-repo"
+
+    def list_packages() -> Iterator[ParsedPackage]:
+        # 'go list' runs while the packages are consumed, after _resolve_gomod returned
+        raise PackageManagerError("Go execution failed: `go list -e -deps -json=ImportPath`")
+        yield
+
+    mock_resolve_gomod.return_value = ResolvedGoModule(
+        parsed_main_module=ParsedModule(path="github.com/my-org/my-repo", version="v1.0.0"),
+        parsed_modules=[],
+        parsed_packages=list_packages(),
+        modules_in_go_sum=frozenset(),
+    )
+
+    with pytest.raises(PackageManagerError, match="go list"):
+        fetch_gomod_source(gomod_request)
+
+    assert "Failed to fetch gomod dependencies" in caplog.text
+
+
+@mock.patch("hermeto.core.package_managers.gomod.get_config")
+@mock.patch("hermeto.core.package_managers.gomod.get_cache_dir")
+@mock.patch("hermeto.core.package_managers.gomod._get_repository_name")
+@mock.patch("hermeto.core.package_managers.gomod._resolve_gomod")
+@mock.patch("hermeto.core.package_managers.gomod.GoCacheTemporaryDirectory")
+@mock.patch("hermeto.core.package_managers.gomod.ModuleVersionResolver.from_repo_path")
+@mock.patch("hermeto.core.package_managers.gomod.GoWork")
+def test_fetch_gomod_source_links_downloads(
+    mock_go_work: mock.Mock,
+    mock_version_resolver: mock.Mock,
+    mock_tmp_dir: mock.Mock,
+    mock_resolve_gomod: mock.Mock,
+    mock_get_repository_name: mock.Mock,
+    mock_get_cache_dir: mock.Mock,
+    mock_get_config: mock.Mock,
+    gomod_request: Request,
+    tmp_path: Path,
+) -> None:
+    gomod_request.source_dir.join_within_root("go.mod").path.touch()
+    go_tmp_dir = tmp_path / "go-tmp"
+    mock_tmp_dir.return_value.__enter__.return_value = str(go_tmp_dir)
+    mock_get_cache_dir.return_value = tmp_path / "cache"
+    mock_get_config.return_value = Config(gomod_cache_enabled=True)
+    mock_get_repository_name.return_value = "github.com/my-org/my-repo"
+
+    def resolve_gomod_mocked(*args: Any) -> ResolvedGoModule:
+        module_dir = go_tmp_dir / "pkg/mod/cache/download/golang.org/x/net"
+        module_dir.mkdir(parents=True)
+        write_file_tree({"@v": {"v0.1.0.zip": "zip", "list": ""}}, module_dir)
+        return ResolvedGoModule(
+            parsed_main_module=ParsedModule(path="github.com/my-org/my-repo", version="v1.0.0"),
+            parsed_modules=[],
+            parsed_packages=[],
+            modules_in_go_sum=frozenset(),
+        )
+
+    mock_resolve_gomod.side_effect = resolve_gomod_mocked
+
+    output_file = gomod_request.output_dir.path.joinpath(
+        "deps/gomod/pkg/mod/cache/download/golang.org/x/net/@v/v0.1.0.zip"
+    )
+    output_file.parent.mkdir(parents=True)
+    # a leftover from a previous run gets replaced
+    output_file.write_text("stale")
+
+    fetch_gomod_source(gomod_request)
+
+    downloaded_file = go_tmp_dir / "pkg/mod/cache/download/golang.org/x/net/@v/v0.1.0.zip"
+    cached_file = tmp_path / "cache/gomod/cache/download/golang.org/x/net/@v/v0.1.0.zip"
+    assert output_file.read_text() == "zip"
+    assert output_file.samefile(downloaded_file)
+    assert cached_file.samefile(downloaded_file)
+    # version lists are exported, but not cached
+    assert output_file.with_name("list").exists()
+    assert not cached_file.with_name("list").exists()
+
+
+@mock.patch("hermeto.core.package_managers.gomod.get_config")
+@mock.patch("hermeto.core.package_managers.gomod.get_cache_dir")
+@mock.patch("hermeto.core.package_managers.gomod._disable_telemetry")
+@mock.patch("hermeto.core.package_managers.gomod._setup_go_toolchain")
+def test_resolve_gomod_uses_module_cache(
+    mock_setup_go_toolchain: mock.Mock,
+    mock_disable_telemetry: mock.Mock,
+    mock_get_cache_dir: mock.Mock,
+    mock_get_config: mock.Mock,
+    gomod_request: Request,
+    tmp_path: Path,
+) -> None:
+    mock_get_cache_dir.return_value = tmp_path / "cache"
+    mock_get_config.return_value = Config(
+        gomod_cache_enabled=True, goproxy_url="https://goproxy.example.org"
+    )
+    # stop right after the environment is set up
+    mock_disable_telemetry.side_effect = RuntimeError("stop")
+
+    with pytest.raises(RuntimeError, match="stop"):
+        _resolve_gomod(gomod_request.source_dir, gomod_request, tmp_path, mock.Mock(), mock.Mock())
+
+    run_params = mock_disable_telemetry.call_args.args[1]
+    cache_uri = (tmp_path / "cache/gomod/cache/download").as_uri()
+    assert run_params["env"]["GOPROXY"] == f"{cache_uri},https://goproxy.example.org"
+
+
+class TestGoModuleCache:
+    @pytest.mark.parametrize(
+        "enabled",
+        [pytest.param(True, id="enabled"), pytest.param(False, id="disabled")],
+    )
+    @mock.patch("hermeto.core.package_managers.gomod.get_config")
+    @mock.patch("hermeto.core.package_managers.gomod.get_cache_dir")
+    def test_from_config(
+        self,
+        mock_get_cache_dir: mock.Mock,
+        mock_get_config: mock.Mock,
+        enabled: bool,
+        tmp_path: Path,
+    ) -> None:
+        mock_get_cache_dir.return_value = tmp_path
+        mock_get_config.return_value = Config(gomod_cache_enabled=enabled)
+
+        cache = GoModuleCache.from_config()
+
+        if enabled:
+            assert cache is not None
+            assert cache.root == tmp_path / "gomod"
+        else:
+            assert cache is None
+
+    @pytest.mark.parametrize(
+        "fallback, expect_fallback",
+        [
+            pytest.param(
+                "https://goproxy.example.org,direct", "https://goproxy.example.org,direct"
+            ),
+            pytest.param("", "https://proxy.golang.org,direct", id="default_proxy"),
+        ],
+    )
+    def test_goproxy(self, tmp_path: Path, fallback: str, expect_fallback: str) -> None:
+        cache = GoModuleCache(tmp_path / "gomod")
+
+        goproxy = cache.goproxy(fallback)
+
+        assert goproxy == f"file://{tmp_path}/gomod/cache/download,{expect_fallback}"
+        assert cache.download_dir.is_dir()
+
+    def test_store(self, tmp_path: Path) -> None:
+        download_dir = tmp_path / "download"
+        download_dir.joinpath("golang.org/x/net").mkdir(parents=True)
+        write_file_tree(
+            {
+                "golang.org/x/net/@v": {
+                    "v0.1.0.info": "info",
+                    "v0.1.0.mod": "mod",
+                    "v0.1.0.zip": "zip",
+                    "v0.1.0.ziphash": "h1:...",
+                    "v0.1.0.lock": "",
+                    "v0.2.0.zip12345.tmp": "partial",
+                    "list": "v0.1.0",
+                },
+                "sumdb": {"sum.golang.org": {"latest": "tree"}},
+            },
+            download_dir,
+            exist_ok=True,
+        )
+        cache = GoModuleCache(tmp_path / "gomod")
+        cache.download_dir.joinpath("golang.org/x/net/@v").mkdir(parents=True)
+        cache.download_dir.joinpath("golang.org/x/net/@v/v0.1.0.info").write_text("cached")
+
+        cache.store(download_dir)
+
+        cached_files = {
+            path.relative_to(cache.download_dir).as_posix(): path.read_text()
+            for path in cache.download_dir.rglob("*")
+            if path.is_file()
+        }
+        assert cached_files == {
+            # existing entries are kept
+            "golang.org/x/net/@v/v0.1.0.info": "cached",
+            "golang.org/x/net/@v/v0.1.0.mod": "mod",
+            "golang.org/x/net/@v/v0.1.0.zip": "zip",
+        }
+
+
 @pytest.mark.parametrize(
     "input_url",
     (
@@ -1919,8 +2198,33 @@ def test_fetch_tags(repo_remote_with_tag: tuple[RootedPath, RootedPath]) -> None
     _, local_repo_path = repo_remote_with_tag
     assert git.Repo(local_repo_path).tags == []
     version_resolver = ModuleVersionResolver.from_repo_path(local_repo_path)
-    assert version_resolver._commit_tags == ["v2.0.0"]
-    assert version_resolver._all_tags == ["v1.0.0", "v2.0.0"]
+    # v2.0.0 is on the current commit, v1.0.0 on the preceding one
+    assert version_resolver._reachable_tags == {"v1.0.0": False, "v2.0.0": True}
+    assert version_resolver._highest_semver_tags == {
+        (True, None, 1): "v1.0.0",
+        (True, None, 2): "v2.0.0",
+        (False, None, 2): "v2.0.0",
+    }
+
+
+@pytest.mark.parametrize("has_local_tags", [True, False])
+@mock.patch("hermeto.core.package_managers.gomod.get_config")
+def test_fetch_tags_skipped(
+    mock_get_config: mock.Mock,
+    repo_remote_with_tag: tuple[RootedPath, RootedPath],
+    has_local_tags: bool,
+) -> None:
+    mock_get_config.return_value = Config(gomod_skip_tag_fetch=True)
+    _, local_repo_path = repo_remote_with_tag
+    if has_local_tags:
+        git.Repo(local_repo_path).create_tag("v1.5.0")
+
+    version_resolver = ModuleVersionResolver.from_repo_path(local_repo_path)
+
+    if has_local_tags:
+        assert version_resolver._reachable_tags == {"v1.5.0": True}
+    else:
+        assert version_resolver._reachable_tags == {"v1.0.0": False, "v2.0.0": True}
 
 
 def test_fetch_tags_fail(repo_remote_with_tag: tuple[RootedPath, RootedPath]) -> None:
@@ -2080,8 +2384,8 @@ def test_parse_packages(
     """Test parsing of packages into ParsedPackage structures with real-like data.
 
     Calls into _go_list_deps. Low level go command interaction testing was already done in
-    test_go_list_deps. Note querying workspaces will return some data duplicated - that's
-    expected.
+    test_go_list_deps. Note querying workspaces returns some packages repeatedly, only their
+    first occurrences are expected in the output.
     """
     go_work: Union[mock.Mock, GoWork]
     mocked_indata: str
@@ -2096,9 +2400,9 @@ def test_parse_packages(
 
         go_work = mock.MagicMock()
         go_work.__bool__.return_value = False
-        go.return_value = mocked_indata
+        go.stream.return_value = [mocked_indata]
     else:
-        side_effects = []
+        outputs_by_cwd = {}
 
         mocked_go_work_json_path = get_mock_dir(data_dir) / f"{input_subdir}/go_work.json"
         mock_get_go_work_path.return_value = RootedPath(mocked_go_work_json_path)
@@ -2109,27 +2413,71 @@ def test_parse_packages(
         ws_paths = list(go_work.workspace_paths(go, {}))
         for wp in ws_paths:
             indata_relative = f"{input_subdir}/{wp.subpath_from_root}/go_list_deps_threedot.json"
-            mocked_indata = get_mocked_data(data_dir, indata_relative)
-            side_effects.append(mocked_indata)
+            outputs_by_cwd[wp.path] = get_mocked_data(data_dir, indata_relative)
 
-        go.side_effect = side_effects
+        # the workspace modules are queried concurrently, in no particular order
+        go.stream.side_effect = lambda cmd, params: [outputs_by_cwd[params["cwd"]]]
+        unique_packages: dict[str, ParsedPackage] = {}
+        for package in expected:
+            unique_packages.setdefault(package.import_path, package)
+        expected = list(unique_packages.values())
 
     run_params = {"env": {"GOMODCACHE": "foo"}}
     pkgs = _parse_packages(go_work, go, run_params)
 
-    calls = go.call_args_list
+    calls = go.stream.call_args_list
     if request.node.callspec.id == "without_workspaces":
-        go.assert_called_once()
+        go.stream.assert_called_once()
     else:
-        calls = go.call_args_list
-        assert go.call_count == len(ws_paths)
-        assert all([run_params | {"cwd": ws_paths[i].path} in c.args for i, c in enumerate(calls)])
+        assert go.stream.call_count == len(ws_paths)
+        assert sorted(c.args[1]["cwd"] for c in calls) == sorted(wp.path for wp in ws_paths)
+        assert all(c.args[1] == run_params | {"cwd": c.args[1]["cwd"]} for c in calls)
 
     # _parse_packages calls _go_list_deps always with the './...' pattern
     assert all("./..." in call.args[0] for call in calls)
     assert list(pkgs) == expected
 
 
+@mock.patch("hermeto.core.package_managers.gomod.get_config")
+def test_parse_packages_workspaces_concurrently(
+    mock_get_config: mock.Mock, rooted_tmp_path: RootedPath
+) -> None:
+    mock_get_config.return_value.concurrency_limit = 2
+    ws_paths = [rooted_tmp_path.join_within_root(name) for name in ["a", "b", "c"]]
+    go_work = mock.MagicMock()
+    go_work.workspace_paths.return_value = iter(ws_paths)
+
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def stream(cmd: list[str], params: dict[str, Any]) -> Iterator[str]:
+        nonlocal running, max_running
+        name = Path(params["cwd"]).name
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        # the first workspace module finishes last
+        time.sleep(0.1 if name == "a" else 0.01)
+        with lock:
+            running -= 1
+        yield json.dumps({"ImportPath": f"example.com/{name}"})
+        yield json.dumps({"ImportPath": "example.com/shared", "Module": {"Path": "example.com"}})
+
+    go = mock.Mock()
+    go.stream.side_effect = stream
+
+    packages = list(_parse_packages(go_work, go, {}))
+
+    assert [package.import_path for package in packages] == [
+        "example.com/a",
+        "example.com/shared",
+        "example.com/b",
+        "example.com/c",
+    ]
+    assert max_running == 2
+
+
 class TestGo:
     @pytest.mark.parametrize(
         "bin_, params",
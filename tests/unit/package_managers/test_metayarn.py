@@ -13,13 +13,13 @@ from hermeto.core.package_managers.yarn_classic.main import NotV1Lockfile
     (pytest.param([{"type": "yarn", "path": "."}], id="no_input_packages"),),
     indirect=["input_request"],
 )
-@mock.patch("hermeto.core.package_managers.metayarn.RequestOutput.__add__")
+@mock.patch("hermeto.core.package_managers.metayarn.RequestOutput.merge_all")
 @mock.patch("hermeto.core.package_managers.metayarn.fetch_yarnberry_source")
 @mock.patch("hermeto.core.package_managers.metayarn.fetch_yarn_classic_source")
 def test_fetch_yarn_source_detects_yarn_classic(
     mock_yarnclassic_fetch_source: mock.Mock,
     mock_yarnberry_fetch_source: mock.Mock,
-    mock_requestoutput_add_: mock.Mock,
+    mock_requestoutput_merge_all: mock.Mock,
     input_request: Request,
 ) -> None:
 
@@ -34,13 +34,13 @@ def test_fetch_yarn_source_detects_yarn_classic(
     (pytest.param([{"type": "yarn", "path": "."}], id="no_input_packages"),),
     indirect=["input_request"],
 )
-@mock.patch("hermeto.core.package_managers.metayarn.RequestOutput.__add__")
+@mock.patch("hermeto.core.package_managers.metayarn.RequestOutput.merge_all")
 @mock.patch("hermeto.core.package_managers.metayarn.fetch_yarnberry_source")
 @mock.patch("hermeto.core.package_managers.metayarn.fetch_yarn_classic_source")
 def test_fetch_yarn_source_detects_yarnberry(
     mock_yarnclassic_fetch_source: mock.Mock,
     mock_yarnberry_fetch_source: mock.Mock,
-    mock_requestoutput_add_: mock.Mock,
+    mock_requestoutput_merge_all: mock.Mock,
     input_request: Request,
 ) -> None:
     mock_yarnclassic_fetch_source.side_effect = NotV1Lockfile("/some/path")
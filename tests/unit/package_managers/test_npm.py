@@ -1605,15 +1605,13 @@ def test_should_replace_dependency(dependency_version: str, expected_result: boo
         ),
     ],
 )
-@mock.patch("hermeto.core.package_managers.npm.async_download_files")
-@mock.patch("hermeto.core.package_managers.npm.must_match_any_checksum")
+@mock.patch("hermeto.core.package_managers.npm.download_files")
 @mock.patch("hermeto.core.checksum.ChecksumInfo.from_sri")
 @mock.patch("hermeto.core.package_managers.npm.clone_as_tarball")
 def test_get_npm_dependencies(
     mock_clone_as_tarball: mock.Mock,
     mock_from_sri: mock.Mock,
-    mock_must_match_any_checksum: mock.Mock,
-    mock_async_download_files: mock.Mock,
+    mock_download_files: mock.Mock,
     rooted_tmp_path: RootedPath,
     deps_to_download: Dict[str, Dict[str, Optional[str]]],
     expected_download_subpaths: Dict[str, str],
@@ -1627,9 +1625,8 @@ def test_get_npm_dependencies(
             return ChecksumInfo("sha256", "YOLO")
 
     mock_from_sri.side_effect = args_based_return_checksum
-    mock_must_match_any_checksum.return_value = None
     mock_clone_as_tarball.return_value = None
-    mock_async_download_files.return_value = None
+    mock_download_files.return_value = None
 
     download_paths = _get_npm_dependencies(rooted_tmp_path, deps_to_download)
     expected_download_paths = {}
@@ -2747,6 +2747,41 @@ class TestDownload:
         assert len(artifacts) == 2
         assert f"No sdist found for package {package_name}=={version}" in caplog.text
 
+    @mock.patch("hermeto.core.package_managers.pip.ProjectPageCache.from_config")
+    @mock.patch.object(pypi_simple.PyPISimple, "get_project_page")
+    def test_process_package_with_page_cache(
+        self,
+        mock_get_project_page: mock.Mock,
+        mock_page_cache: mock.Mock,
+        rooted_tmp_path: RootedPath,
+    ) -> None:
+        package_name = "aiowsgi"
+        version = "0.1.0"
+        mock_requirement = self.mock_requirement(
+            package_name, "pypi", version_specs=[("==", version)]
+        )
+
+        page = pypi_simple.ProjectPage(
+            package_name,
+            [self.mock_pypi_simple_package(f"{package_name}-{version}.tar.gz", version)],
+            None,
+            None,
+        )
+        cache_get_project_page = mock_page_cache.return_value.get_project_page
+        cache_get_project_page.return_value = page
+
+        artifacts = pip._process_package_distributions(mock_requirement, rooted_tmp_path)
+
+        assert [artifact.path.name for artifact in artifacts] == [
+            f"{package_name}-{version}.tar.gz"
+        ]
+        mock_get_project_page.assert_not_called()
+
+        # a cached page is complete when it lists the pinned version
+        is_complete = cache_get_project_page.call_args.kwargs["is_complete"]
+        assert is_complete(page)
+        assert not is_complete(pypi_simple.ProjectPage(package_name, [], None, None))
+
     @pytest.mark.parametrize("allow_binary", (True, False))
     @mock.patch.object(pypi_simple.PyPISimple, "get_project_page")
     def test_process_existing_package_without_any_distributions(
@@ -3321,12 +3356,12 @@ class TestDownload:
     @mock.patch("hermeto.core.package_managers.pip._process_package_distributions")
     @mock.patch("hermeto.core.package_managers.pip.must_match_any_checksum")
     @mock.patch.object(Path, "unlink")
-    @mock.patch("hermeto.core.package_managers.pip.async_download_files")
+    @mock.patch("hermeto.core.package_managers.pip.download_files")
     @mock.patch("hermeto.core.package_managers.pip._check_metadata_in_sdist")
     def test_download_dependencies_pypi(
         self,
         mock_check_metadata_in_sdist: mock.Mock,
-        mock_async_download_files: mock.Mock,
+        mock_download_files: mock.Mock,
         mock_unlink: mock.Mock,
         mock_must_match_any_checksum: mock.Mock,
         mock_process_package_distributions: mock.Mock,
@@ -3453,12 +3488,19 @@ class TestDownload:
             mock_must_match_any_checksum.side_effect = [
                 None,  # sdist_download
             ]
+
+        # artifacts which are already present (e.g. from another requirements file) are not
+        # downloaded again, their checksums are verified after the fact
+        pip_deps.path.mkdir(parents=True)
+        for dpi in [sdist_DPI, *wheels_DPI]:
+            dpi.path.touch()
         # </setup>
 
         # <call>
         found_downloads = pip._download_dependencies(rooted_tmp_path, req_file, allow_binary)
         assert found_downloads == expected_downloads
         assert pip_deps.path.is_dir()
+        mock_download_files.assert_called_once_with({}, checksums={}, discard_mismatches=True)
         # </call>
 
         # <check calls that must always be made>
@@ -3515,12 +3557,12 @@ class TestDownload:
     @mock.patch("hermeto.core.package_managers.pip._download_url_package")
     @mock.patch("hermeto.core.package_managers.pip.must_match_any_checksum")
     @mock.patch.object(Path, "unlink")
-    @mock.patch("hermeto.core.package_managers.pip.async_download_files")
+    @mock.patch("hermeto.core.package_managers.pip.download_files")
     @mock.patch("hermeto.core.package_managers.pip.download_binary_file")
     def test_download_dependencies_url(
         self,
         mock_download_binary_file: mock.Mock,
-        mock_async_download_files: mock.Mock,
+        mock_download_files: mock.Mock,
         mock_unlink: mock.Mock,
         mock_must_match_any_checksum: mock.Mock,
         mock_download_url_package: mock.Mock,
@@ -3630,12 +3672,12 @@ class TestDownload:
 
     @mock.patch("hermeto.core.package_managers.pip._download_vcs_package")
     @mock.patch.object(Path, "unlink")
-    @mock.patch("hermeto.core.package_managers.pip.async_download_files")
+    @mock.patch("hermeto.core.package_managers.pip.download_files")
     @mock.patch("hermeto.core.scm.clone_as_tarball")
     def test_download_dependencies_vcs(
         self,
         mock_clone_as_tarball: mock.Mock,
-        mock_async_download_files: mock.Mock,
+        mock_download_files: mock.Mock,
         mock_unlink: mock.Mock,
         mock_download_vcs_package: mock.Mock,
         rooted_tmp_path: RootedPath,
@@ -3713,12 +3755,12 @@ class TestDownload:
         # </check basic logging output>
 
     @mock.patch("hermeto.core.package_managers.pip._process_package_distributions")
-    @mock.patch("hermeto.core.package_managers.pip.async_download_files")
+    @mock.patch("hermeto.core.package_managers.pip.download_files")
     @mock.patch("hermeto.core.package_managers.pip._check_metadata_in_sdist")
     def test_download_from_requirement_files(
         self,
         _check_metadata_in_sdist: mock.Mock,
-        async_download_files: mock.Mock,
+        download_files: mock.Mock,
         _process_package_distributions: mock.Mock,
         rooted_tmp_path: RootedPath,
     ) -> None:
@@ -3761,6 +3803,56 @@ class TestDownload:
             [mock.call(pypi_package1.path), mock.call(pypi_package2.path)], any_order=True
         )
 
+    @mock.patch("hermeto.core.package_managers.pip._process_package_distributions")
+    @mock.patch("hermeto.core.package_managers.pip.download_files")
+    @mock.patch("hermeto.core.package_managers.pip._check_metadata_in_sdist")
+    def test_download_dependencies_pypi_in_one_batch(
+        self,
+        _check_metadata_in_sdist: mock.Mock,
+        mock_download_files: mock.Mock,
+        mock_process_package_distributions: mock.Mock,
+        rooted_tmp_path: RootedPath,
+    ) -> None:
+        """Test that all PyPI requirements are resolved up front and downloaded together."""
+        reqs = [
+            self.mock_requirement(name, "pypi", download_line=f"{name}==1.0")
+            for name in ("foo", "bar", "baz")
+        ]
+        req_file = self.mock_requirements_file(requirements=reqs)
+
+        pip_deps = rooted_tmp_path.join_within_root("deps", "pip")
+        checksum = ChecksumInfo("sha256", "abcdef")
+        dpis = {
+            name: make_dpi(
+                name,
+                path=pip_deps.join_within_root(f"{name}-1.0.tar.gz").path,
+                url=f"https://example.org/{name}-1.0.tar.gz",
+                pypi_checksum={checksum},
+                req_file_checksums={checksum},
+            )
+            for name in ("foo", "bar", "baz")
+        }
+        mock_process_package_distributions.side_effect = lambda req, *args: [dpis[req.package]]
+
+        # already downloaded, e.g. by a previous requirements file
+        dpis["bar"].path.parent.mkdir(parents=True)
+        dpis["bar"].path.touch()
+
+        with mock.patch(
+            "hermeto.core.package_managers.pip.must_match_any_checksum"
+        ) as mock_must_match_any_checksum:
+            downloads = pip._download_dependencies(rooted_tmp_path, req_file)
+
+        # the results follow the order of the requirements file
+        assert [download["package"] for download in downloads] == ["foo", "bar", "baz"]
+        mock_download_files.assert_called_once_with(
+            {dpis["foo"].url: dpis["foo"].path, dpis["baz"].url: dpis["baz"].path},
+            checksums={dpis["foo"].url: {checksum}, dpis["baz"].url: {checksum}},
+            discard_mismatches=True,
+        )
+        # only the artifact which wasn't downloaded now needs to be verified
+        mock_must_match_any_checksum.assert_called_once_with(dpis["bar"].path, {checksum})
+
 
 @pytest.mark.parametrize("exists", [True, False])
 @pytest.mark.parametrize("devel", [True, False])
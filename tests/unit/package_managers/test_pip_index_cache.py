@@ -0,0 +1,203 @@
+import json
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+import pypi_simple
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from hermeto.core.package_managers.pip_index_cache import JSON_CONTENT_TYPE, ProjectPageCache
+
+INDEX_URL = "https://pypi.example.org/simple/"
+PROJECT_URL = f"{INDEX_URL}foo/"
+
+JSON_PAGE = {
+    "meta": {"api-version": "1.0", "_last-serial": 42},
+    "name": "foo",
+    "files": [
+        {
+            "filename": "foo-1.0.tar.gz",
+            "url": "https://files.example.org/foo-1.0.tar.gz",
+            "hashes": {"sha256": "abcdef"},
+        }
+    ],
+}
+HTML_PAGE = (
+    '<html><body><a href="/files/foo-2.0.tar.gz#sha256=fedcba">foo-2.0.tar.gz</a></body></html>'
+)
+
+
+def make_response(
+    status_code: int,
+    body: str = "",
+    content_type: str = JSON_CONTENT_TYPE,
+    headers: Optional[dict[str, str]] = None,
+) -> mock.Mock:
+    response = mock.Mock(spec=requests.Response)
+    response.status_code = status_code
+    response.url = PROJECT_URL
+    response.text = body
+    response.content = body.encode()
+    response.json.side_effect = lambda: json.loads(body)
+    response.headers = CaseInsensitiveDict({"Content-Type": content_type, **(headers or {})})
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.HTTPError(f"{status_code} error")
+    return response
+
+
+@pytest.fixture
+def session() -> mock.Mock:
+    return mock.Mock(spec=requests.Session)
+
+
+@pytest.fixture
+def client(session: mock.Mock) -> pypi_simple.PyPISimple:
+    return pypi_simple.PyPISimple(INDEX_URL, session=session)
+
+
+def filenames(page: pypi_simple.ProjectPage) -> list[str]:
+    return [package.filename for package in page.packages]
+
+
+def test_fetch_and_revalidate(
+    tmp_path: Path, client: pypi_simple.PyPISimple, session: mock.Mock
+) -> None:
+    cache = ProjectPageCache(tmp_path)
+    session.get.side_effect = [
+        make_response(200, json.dumps(JSON_PAGE), headers={"ETag": '"v1"', "Last-Modified": "x"}),
+        make_response(304),
+    ]
+
+    first = cache.get_project_page(client, "Foo", timeout=10)
+    second = cache.get_project_page(client, "foo", timeout=10)
+
+    assert filenames(first) == filenames(second) == ["foo-1.0.tar.gz"]
+    assert second.last_serial == "42"
+
+    first_headers = session.get.call_args_list[0].kwargs["headers"]
+    assert first_headers == {"Accept": pypi_simple.ACCEPT_JSON_PREFERRED}
+    second_headers = session.get.call_args_list[1].kwargs["headers"]
+    assert second_headers["If-None-Match"] == '"v1"'
+    assert second_headers["If-Modified-Since"] == "x"
+
+
+def test_html_page_is_replaced_when_modified(
+    tmp_path: Path, client: pypi_simple.PyPISimple, session: mock.Mock
+) -> None:
+    cache = ProjectPageCache(tmp_path)
+    session.get.side_effect = [
+        make_response(200, HTML_PAGE, content_type="text/html"),
+        make_response(200, json.dumps(JSON_PAGE)),
+        make_response(304),
+    ]
+
+    assert filenames(cache.get_project_page(client, "foo")) == ["foo-2.0.tar.gz"]
+    assert filenames(cache.get_project_page(client, "foo")) == ["foo-1.0.tar.gz"]
+    assert filenames(cache.get_project_page(client, "foo")) == ["foo-1.0.tar.gz"]
+
+
+@pytest.mark.parametrize("complete", [True, False])
+def test_offline(
+    tmp_path: Path, client: pypi_simple.PyPISimple, session: mock.Mock, complete: bool
+) -> None:
+    session.get.return_value = make_response(200, json.dumps(JSON_PAGE))
+    ProjectPageCache(tmp_path).get_project_page(client, "foo")
+    session.get.reset_mock()
+
+    cache = ProjectPageCache(tmp_path, offline=True)
+    page = cache.get_project_page(client, "foo", is_complete=lambda page: complete)
+
+    assert filenames(page) == ["foo-1.0.tar.gz"]
+    # incomplete pages have to be revalidated even in offline mode
+    assert session.get.called is not complete
+
+
+@pytest.mark.parametrize("complete", [True, False])
+def test_fallback_when_index_is_unreachable(
+    tmp_path: Path, client: pypi_simple.PyPISimple, session: mock.Mock, complete: bool
+) -> None:
+    cache = ProjectPageCache(tmp_path)
+    session.get.side_effect = [
+        make_response(200, json.dumps(JSON_PAGE)),
+        requests.ConnectionError("no network"),
+    ]
+    cache.get_project_page(client, "foo")
+
+    if complete:
+        page = cache.get_project_page(client, "foo")
+        assert filenames(page) == ["foo-1.0.tar.gz"]
+    else:
+        with pytest.raises(requests.ConnectionError):
+            cache.get_project_page(client, "foo", is_complete=lambda page: False)
+
+
+@pytest.mark.parametrize(
+    "status_code, expect_error",
+    [(404, pypi_simple.NoSuchProjectError), (500, requests.HTTPError)],
+)
+def test_errors_are_not_cached(
+    tmp_path: Path,
+    client: pypi_simple.PyPISimple,
+    session: mock.Mock,
+    status_code: int,
+    expect_error: type[Exception],
+) -> None:
+    cache = ProjectPageCache(tmp_path)
+    session.get.return_value = make_response(status_code)
+
+    with pytest.raises(expect_error):
+        cache.get_project_page(client, "foo")
+
+    assert not list(tmp_path.rglob("*.json"))
+
+
+def test_malformed_entry_is_ignored(
+    tmp_path: Path, client: pypi_simple.PyPISimple, session: mock.Mock
+) -> None:
+    cache = ProjectPageCache(tmp_path)
+    session.get.return_value = make_response(200, json.dumps(JSON_PAGE), headers={"ETag": "v1"})
+    cache.get_project_page(client, "foo")
+
+    (entry,) = tmp_path.rglob("foo.json")
+    entry.write_text("not json")
+
+    assert filenames(cache.get_project_page(client, "foo")) == ["foo-1.0.tar.gz"]
+    assert "If-None-Match" not in session.get.call_args.kwargs["headers"]
+
+
+def test_unparsable_entry_is_dropped(
+    tmp_path: Path, client: pypi_simple.PyPISimple, session: mock.Mock
+) -> None:
+    cache = ProjectPageCache(tmp_path, offline=True)
+    session.get.return_value = make_response(200, json.dumps(JSON_PAGE), headers={"ETag": "v1"})
+    cache.get_project_page(client, "foo")
+
+    # valid cache entry, but the page itself is not a valid PEP 691 response
+    (entry,) = tmp_path.rglob("foo.json")
+    cached = json.loads(entry.read_text())
+    cached["body"] = json.dumps({"meta": {"api-version": "2.0"}})
+    entry.write_text(json.dumps(cached))
+
+    assert filenames(cache.get_project_page(client, "foo")) == ["foo-1.0.tar.gz"]
+    # fetched unconditionally, even in offline mode, and the cache entry was replaced
+    assert session.get.call_count == 2
+    assert "If-None-Match" not in session.get.call_args.kwargs["headers"]
+    assert json.loads(entry.read_text())["body"] == json.dumps(JSON_PAGE)
+
+
+@mock.patch("hermeto.core.package_managers.pip_index_cache.get_config")
+def test_from_config(
+    mock_get_config: mock.Mock, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    mock_get_config.return_value.pypi_index_cache_enabled = False
+    assert ProjectPageCache.from_config() is None
+
+    mock_get_config.return_value.pypi_index_cache_enabled = True
+    mock_get_config.return_value.pypi_index_cache_offline = True
+    cache = ProjectPageCache.from_config()
+    assert cache is not None
+    assert cache.root == tmp_path / "hermeto" / "pypi-simple"
+    assert cache.offline
@@ -1,4 +1,5 @@
 import ssl
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
@@ -9,6 +10,7 @@ import yaml
 from _pytest.logging import LogCaptureFixture
 
 from hermeto import APP_NAME
+from hermeto.core.checksum import ChecksumInfo
 from hermeto.core.errors import PackageManagerError, PackageRejected
 from hermeto.core.models.input import ExtraOptions, RpmPackageInput, SSLOptions
 from hermeto.core.models.sbom import Component, Property
@@ -22,9 +24,9 @@ from hermeto.core.package_managers.rpm.main import (
     _generate_repos,
     _generate_sbom_components,
     _get_ssl_context,
+    _query_rpm_fields,
     _Repofile,
     _resolve_rpm_project,
-    _verify_downloaded,
 )
 from hermeto.core.package_managers.rpm.redhat import RedhatRpmsLock
 from hermeto.core.rooted_path import RootedPath
@@ -339,13 +341,11 @@ def test_resolve_rpm_project_correct_format(
     new_callable=mock.mock_open,
 )
 @mock.patch("hermeto.core.package_managers.rpm.main._download")
-@mock.patch("hermeto.core.package_managers.rpm.main._verify_downloaded")
 @mock.patch("hermeto.core.package_managers.rpm.main.RedhatRpmsLock.model_validate")
 @mock.patch("hermeto.core.package_managers.rpm.main._generate_sbom_components")
 def test_resolve_rpm_project(
     mock_generate_sbom_components: mock.Mock,
     mock_model_validate: mock.Mock,
-    mock_verify_downloaded: mock.Mock,
     mock_download: mock.Mock,
     mock_open: mock.Mock,
 ) -> None:
@@ -361,7 +361,6 @@ def test_resolve_rpm_project(
     mock_download.assert_called_once_with(
         mock_model_validate.return_value, mock_package_dir_path, None
     )
-    mock_verify_downloaded.assert_called_once_with({})
     mock_generate_sbom_components.assert_called_once_with({}, Path("rpms.lock.yaml"), False)
 
 
@@ -370,17 +369,76 @@ def test_createrepo(mock_run_cmd: mock.Mock, rooted_tmp_path: RootedPath) -> Non
     repodir = rooted_tmp_path
     repoid = "repo1"
     _createrepo(repoid, repodir.path)
-    mock_run_cmd.assert_called_once_with(["createrepo_c", str(repodir)], params={})
+    mock_run_cmd.assert_called_once_with(["createrepo_c", "--update", str(repodir)], params={})
+
+    mock_run_cmd.reset_mock()
+    _createrepo(repoid, repodir.path, workers=2)
+    mock_run_cmd.assert_called_once_with(
+        ["createrepo_c", "--update", "--workers", "2", str(repodir)], params={}
+    )
 
 
+@mock.patch("hermeto.core.package_managers.rpm.main.os.cpu_count", return_value=8)
 @mock.patch("hermeto.core.package_managers.rpm.main._createrepo")
-def test_generate_repos(mock_createrepo: mock.Mock, rooted_tmp_path: RootedPath) -> None:
+def test_generate_repos(
+    mock_createrepo: mock.Mock, mock_cpu_count: mock.Mock, rooted_tmp_path: RootedPath
+) -> None:
     package_dir = rooted_tmp_path.join_within_root(DEFAULT_PACKAGE_DIR)
     arch_dir = package_dir.path.joinpath("x86_64")
     arch_dir.joinpath("repo1").mkdir(parents=True)
     arch_dir.joinpath("repos.d").mkdir(parents=True)
     _generate_repos(rooted_tmp_path.path)
-    mock_createrepo.assert_called_once_with("repo1", arch_dir.joinpath("repo1"))
+    mock_createrepo.assert_called_once_with("repo1", arch_dir.joinpath("repo1"), 8)
+
+
+@mock.patch("hermeto.core.package_managers.rpm.main.os.cpu_count", return_value=8)
+@mock.patch("hermeto.core.package_managers.rpm.main._createrepo")
+def test_generate_repos_in_parallel(
+    mock_createrepo: mock.Mock, mock_cpu_count: mock.Mock, rooted_tmp_path: RootedPath
+) -> None:
+    package_dir = rooted_tmp_path.join_within_root(DEFAULT_PACKAGE_DIR)
+    repodirs = []
+    for arch in ["x86_64", "aarch64"]:
+        for repoid in ["repo1", "repo2"]:
+            repodirs.append(package_dir.path.joinpath(arch, repoid))
+            repodirs[-1].mkdir(parents=True)
+
+    _generate_repos(rooted_tmp_path.path)
+
+    # 4 repos, each of the 4 processes gets 8 CPUs / 4 processes
+    assert sorted(mock_createrepo.call_args_list) == sorted(
+        mock.call(repodir.name, repodir, 2) for repodir in repodirs
+    )
+
+
+@mock.patch("hermeto.core.package_managers.rpm.main.ThreadPoolExecutor", wraps=ThreadPoolExecutor)
+@mock.patch("hermeto.core.package_managers.rpm.main.os.cpu_count", return_value=2)
+@mock.patch("hermeto.core.package_managers.rpm.main._createrepo")
+def test_generate_repos_limited_by_cpus(
+    mock_createrepo: mock.Mock,
+    mock_cpu_count: mock.Mock,
+    mock_executor: mock.Mock,
+    rooted_tmp_path: RootedPath,
+) -> None:
+    package_dir = rooted_tmp_path.join_within_root(DEFAULT_PACKAGE_DIR)
+    for repoid in ["repo1", "repo2", "repo3", "repo4"]:
+        package_dir.path.joinpath("x86_64", repoid).mkdir(parents=True)
+
+    _generate_repos(rooted_tmp_path.path)
+
+    # no more processes than CPUs, regardless of the network concurrency limit
+    mock_executor.assert_called_once_with(max_workers=2)
+    assert [call.args[2] for call in mock_createrepo.call_args_list] == [1, 1, 1, 1]
+
+
+@mock.patch("hermeto.core.package_managers.rpm.main._createrepo")
+def test_generate_repos_error(mock_createrepo: mock.Mock, rooted_tmp_path: RootedPath) -> None:
+    package_dir = rooted_tmp_path.join_within_root(DEFAULT_PACKAGE_DIR)
+    package_dir.path.joinpath("x86_64", "repo1").mkdir(parents=True)
+    mock_createrepo.side_effect = PackageManagerError("createrepo_c failed")
+
+    with pytest.raises(PackageManagerError, match="createrepo_c failed"):
+        _generate_repos(rooted_tmp_path.path)
 
 
 @pytest.mark.parametrize(
@@ -533,7 +591,7 @@ def test_generate_sbom_components(
 
     files_metadata = {rpm_file_path: metadata}
 
-    mock_run_cmd.return_value = "\n".join([f"{k}={v}" for k, v in rpm_tags.items()])
+    mock_run_cmd.return_value = _rpm_query_output(rpm_tags)
     components = _generate_sbom_components(files_metadata, Path("rpms.lock.yaml"))
 
     assert components == [
@@ -546,6 +604,40 @@ def test_generate_sbom_components(
     ]
 
 
+def _rpm_query_output(*all_rpm_tags: dict[str, str]) -> str:
+    return "".join(
+        f"--- {APP_NAME} rpm header ---\n" + "".join(f"{k}={v}\n" for k, v in rpm_tags.items())
+        for rpm_tags in all_rpm_tags
+    )
+
+
+@mock.patch("hermeto.core.package_managers.rpm.main._RPM_QUERY_CHUNK_SIZE", new=2)
+@mock.patch("hermeto.core.package_managers.rpm.main.run_cmd")
+def test_query_rpm_fields_in_chunks(mock_run_cmd: mock.Mock) -> None:
+    file_paths = [Path(f"pkg{i}.rpm") for i in range(3)]
+    all_rpm_tags = [{"name": f"pkg{i}", "vendor": "", "epoch": "1"} for i in range(3)]
+    mock_run_cmd.side_effect = [
+        _rpm_query_output(*all_rpm_tags[:2]),
+        _rpm_query_output(*all_rpm_tags[2:]),
+    ]
+
+    assert _query_rpm_fields(file_paths) == [{"name": f"pkg{i}", "epoch": "1"} for i in range(3)]
+
+    assert mock_run_cmd.call_count == 2
+    first_cmd = mock_run_cmd.call_args_list[0].kwargs["cmd"]
+    assert first_cmd[:2] == ["rpm", "-qp"]
+    assert first_cmd[-2:] == ["pkg0.rpm", "pkg1.rpm"]
+    assert mock_run_cmd.call_args_list[1].kwargs["cmd"][-1] == "pkg2.rpm"
+
+
+@mock.patch("hermeto.core.package_managers.rpm.main.run_cmd")
+def test_query_rpm_fields_missing_output(mock_run_cmd: mock.Mock) -> None:
+    mock_run_cmd.return_value = _rpm_query_output({"name": "pkg0"})
+
+    with pytest.raises(PackageManagerError, match="Expected RPM tags of 2 files, got 1"):
+        _query_rpm_fields([Path("pkg0.rpm"), Path("pkg1.rpm")])
+
+
 @mock.patch("hermeto.core.package_managers.rpm.main.Path")
 @mock.patch("hermeto.core.package_managers.rpm.main._generate_repofiles")
 @mock.patch("hermeto.core.package_managers.rpm.main._generate_repos")
@@ -563,14 +655,11 @@ def test_inject_files_post(
 
 
 @mock.patch("ssl.create_default_context")
-@mock.patch("hermeto.core.package_managers.rpm.main.asyncio.run")
-@mock.patch("hermeto.core.package_managers.rpm.main.async_download_files")
-def test_download(
-    mock_async_download_files: mock.Mock, mock_asyncio: mock.Mock, rooted_tmp_path: RootedPath
-) -> None:
+@mock.patch("hermeto.core.package_managers.rpm.main.download_files")
+def test_download(mock_download_files: mock.Mock, rooted_tmp_path: RootedPath) -> None:
     lock = RedhatRpmsLock.model_validate(yaml.safe_load(RPM_LOCK_FILE_DATA))
     _download(lock, rooted_tmp_path.path)
-    mock_async_download_files.assert_called_once_with(
+    mock_download_files.assert_called_once_with(
         {
             "https://example.com/x86_64/Packages/v/vim-enhanced-9.1.158-1.fc38.x86_64.rpm": str(
                 rooted_tmp_path.path.joinpath(
@@ -586,40 +675,30 @@ def test_download(
                 )
             ),
         },
-        5,
         ssl_context=None,
+        checksums={
+            "https://example.com/x86_64/Packages/v/vim-enhanced-9.1.158-1.fc38.x86_64.rpm": [
+                ChecksumInfo(
+                    "sha256", "21bb2a09852e75a693d277435c162e1a910835c53c3cee7636dd552d450ed0f1"
+                )
+            ],
+            "https://example.com/source/tree/Packages/v/vim-9.1.158-1.fc38.src.rpm": [
+                ChecksumInfo(
+                    "sha256", "94803b5e1ff601bf4009f223cb53037cdfa2fe559d90251bbe85a3a5bc6d2aab"
+                )
+            ],
+            "https://example.com/x86_64/repodata/683718e724821ff45bf625a1b63f0431919bfff012af57589da57fd88dc6b445-modules.yaml.gz": [
+                ChecksumInfo(
+                    "sha256", "683718e724821ff45bf625a1b63f0431919bfff012af57589da57fd88dc6b445"
+                )
+            ],
+        },
+        sizes={
+            "https://example.com/x86_64/Packages/v/vim-enhanced-9.1.158-1.fc38.x86_64.rpm": 1976132,
+            "https://example.com/source/tree/Packages/v/vim-9.1.158-1.fc38.src.rpm": 14735448,
+            "https://example.com/x86_64/repodata/683718e724821ff45bf625a1b63f0431919bfff012af57589da57fd88dc6b445-modules.yaml.gz": 76926,
+        },
     )
-    mock_asyncio.assert_called_once()
-
-
-@mock.patch("pathlib.Path.stat")
-def test_verify_downloaded_unexpected_size(stat_mock: mock.Mock) -> None:
-    stat_mock.return_value = mock.Mock()
-    stat_mock.st_size = 0
-    metadata = {Path("foo"): {"size": 12345}}
-
-    with pytest.raises(PackageRejected) as exc_info:
-        _verify_downloaded(metadata)
-    assert "Unexpected file size of" in str(exc_info.value)
-
-
-def test_verify_downloaded_unsupported_hash_alg() -> None:
-    metadata = {Path("foo"): {"checksum": "noalg:unmatchedchecksum", "size": None}}
-    with pytest.raises(PackageRejected) as exc_info:
-        _verify_downloaded(metadata)
-    assert "Unsupported hashing algorithm" in str(exc_info.value)
-
-
-@mock.patch(
-    "hermeto.core.package_managers.rpm.main.open",
-    new_callable=mock.mock_open,
-    read_data=b"test",
-)
-def test_verify_downloaded_unmatched_checksum(mock_open: mock.Mock) -> None:
-    metadata = {Path("foo"): {"checksum": "sha256:unmatchedchecksum", "size": None}}
-    with pytest.raises(PackageRejected) as exc_info:
-        _verify_downloaded(metadata)
-    assert "Unmatched checksum of" in str(exc_info.value)
 
 
 class TestRedhatRpmsLock:
@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from unittest import mock
+
+import pytest
+
+from hermeto.core.artifact_cache import ArtifactCache, CacheStats
+from hermeto.core.checksum import ChecksumInfo
+
+CONTENT = b"some artifact content"
+SHA256 = ChecksumInfo("sha256", hashlib.sha256(CONTENT).hexdigest())
+SHA512 = ChecksumInfo("sha512", hashlib.sha512(CONTENT).hexdigest())
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> ArtifactCache:
+    return ArtifactCache(tmp_path / "cache")
+
+
+@pytest.fixture
+def artifact(tmp_path: Path) -> Path:
+    path = tmp_path / "artifact.tar.gz"
+    path.write_bytes(CONTENT)
+    return path
+
+
+def test_store_and_restore(cache: ArtifactCache, artifact: Path, tmp_path: Path) -> None:
+    cache.store(artifact, [SHA256])
+
+    entry = cache.root / "sha256" / SHA256.hexdigest[:2] / SHA256.hexdigest
+    assert entry.read_bytes() == CONTENT
+    assert cache.lookup([SHA512, SHA256]) == entry
+
+    restored = tmp_path / "restored.tar.gz"
+    assert cache.restore([SHA256], restored)
+    assert restored.read_bytes() == CONTENT
+
+
+def test_store_concurrently(cache: ArtifactCache, artifact: Path) -> None:
+    for _ in range(50):
+        barrier = threading.Barrier(4)
+
+        def store() -> None:
+            barrier.wait()
+            cache.store(artifact, [SHA256])
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            for future in [executor.submit(store) for _ in range(4)]:
+                future.result()
+
+        entry = cache.lookup([SHA256])
+        assert entry is not None and entry.read_bytes() == CONTENT
+        # no temporary files are left behind
+        assert os.listdir(entry.parent) == [entry.name]
+        entry.unlink()
+
+
+def test_store_under_all_matching_checksums(cache: ArtifactCache, artifact: Path) -> None:
+    cache.store(artifact, [SHA256, SHA512])
+
+    assert cache.lookup([SHA256]) is not None
+    assert cache.lookup([SHA512]) is not None
+    # both entries are the same artifact
+    assert cache.stats() == CacheStats(artifacts=1, size=len(CONTENT))
+
+
+@mock.patch("hermeto.core.artifact_cache._get_hexdigest")
+def test_store_with_known_digests(
+    mock_get_hexdigest: mock.Mock, cache: ArtifactCache, artifact: Path
+) -> None:
+    cache.store(artifact, [SHA256, SHA512], hexdigests={"sha256": SHA256.hexdigest})
+
+    # only the missing digest had to be computed
+    mock_get_hexdigest.assert_called_once_with(artifact, "sha512")
+    assert cache.lookup([SHA256]) is not None
+
+
+def test_store_with_mismatching_digests(cache: ArtifactCache, artifact: Path) -> None:
+    cache.store(artifact, [SHA256], hexdigests={"sha256": "a" * 64})
+
+    assert cache.lookup([SHA256]) is None
+
+
+@pytest.mark.parametrize(
+    "checksum",
+    [
+        ChecksumInfo("sha256", "a" * 64),
+        ChecksumInfo("sha0", "a" * 40),
+        ChecksumInfo("sha256", "../../etc/passwd"),
+    ],
+)
+def test_store_refuses_unverified_file(
+    cache: ArtifactCache, artifact: Path, checksum: ChecksumInfo
+) -> None:
+    cache.store(artifact, [checksum])
+
+    assert cache.lookup([checksum]) is None
+    assert cache.stats() == CacheStats(artifacts=0, size=0)
+
+
+def test_restore_cache_miss(cache: ArtifactCache, tmp_path: Path) -> None:
+    restored = tmp_path / "restored.tar.gz"
+    assert not cache.restore([SHA256], restored)
+    assert not restored.exists()
+
+
+def test_restore_replaces_existing_file(
+    cache: ArtifactCache, artifact: Path, tmp_path: Path
+) -> None:
+    cache.store(artifact, [SHA256])
+
+    restored = tmp_path / "restored.tar.gz"
+    restored.write_bytes(b"stale content")
+    assert cache.restore([SHA256], restored)
+    assert restored.read_bytes() == CONTENT
+
+
+@pytest.mark.parametrize(
+    "modify_entry, size",
+    [
+        pytest.param(True, None, id="modified_content"),
+        pytest.param(False, len(CONTENT) + 1, id="unexpected_size"),
+    ],
+)
+def test_restore_removes_mismatching_entry(
+    cache: ArtifactCache, artifact: Path, tmp_path: Path, modify_entry: bool, size: Optional[int]
+) -> None:
+    cache.store(artifact, [SHA256])
+    entry = cache.lookup([SHA256])
+    assert entry is not None
+    if modify_entry:
+        # e.g. a hard link to the entry in an output directory was modified in place
+        entry.write_bytes(b"tampered content")
+
+    restored = tmp_path / "restored.tar.gz"
+    assert not cache.restore([SHA256], restored, size=size)
+    assert not restored.exists()
+    assert cache.lookup([SHA256]) is None
+
+
+def test_restore_checks_all_checksums(cache: ArtifactCache, artifact: Path, tmp_path: Path) -> None:
+    cache.store(artifact, [SHA256, SHA512])
+    sha256_entry = cache.lookup([SHA256])
+    assert sha256_entry is not None
+    # break the hard link, then corrupt only the sha256 entry
+    sha256_entry.unlink()
+    sha256_entry.write_bytes(b"tampered content")
+
+    restored = tmp_path / "restored.tar.gz"
+    assert cache.restore([SHA256, SHA512], restored, size=len(CONTENT))
+    assert restored.read_bytes() == CONTENT
+    assert not sha256_entry.exists()
+
+
+@mock.patch("hermeto.core.artifact_cache.get_config")
+def test_from_config(mock_get_config: mock.Mock) -> None:
+    mock_get_config.return_value.artifact_cache_enabled = False
+    assert ArtifactCache.from_config() is None
+
+    mock_get_config.return_value.artifact_cache_enabled = True
+    assert isinstance(ArtifactCache.from_config(), ArtifactCache)
+
+
+def test_prune_least_recently_used(cache: ArtifactCache, tmp_path: Path) -> None:
+    checksums = []
+    for i in range(3):
+        content = f"artifact {i}".encode()
+        path = tmp_path / f"artifact-{i}"
+        path.write_bytes(content)
+        checksum = ChecksumInfo("sha256", hashlib.sha256(content).hexdigest())
+        cache.store(path, [checksum])
+        entry = cache.lookup([checksum])
+        assert entry is not None
+        os.utime(entry, (i, i))
+        checksums.append(checksum)
+
+    # artifact 0 is the oldest, but it was just used
+    cache.restore([checksums[0]], tmp_path / "restored")
+
+    artifact_size = len(b"artifact 0")
+    evicted = cache.prune(max_size=artifact_size)
+
+    assert evicted == CacheStats(artifacts=2, size=2 * artifact_size)
+    assert cache.lookup([checksums[0]]) is not None
+    assert cache.lookup([checksums[1]]) is None
+    assert cache.lookup([checksums[2]]) is None
+
+
+def test_prune_nonexistent_cache(cache: ArtifactCache) -> None:
+    assert cache.prune(max_size=0) == CacheStats(artifacts=0, size=0)
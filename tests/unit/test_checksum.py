@@ -3,7 +3,12 @@ from typing import Literal
 
 import pytest
 
-from hermeto.core.checksum import SUPPORTED_ALGORITHMS, ChecksumInfo, must_match_any_checksum
+from hermeto.core.checksum import (
+    SUPPORTED_ALGORITHMS,
+    ChecksumInfo,
+    IncrementalChecksums,
+    must_match_any_checksum,
+)
 from hermeto.core.errors import PackageRejected
 
 FILE_CONTENT = "Beetlejuice! Beetlejuice! Beetlejuice!"
@@ -151,6 +156,34 @@ def test_verify_checksum_failure(
     assert caplog.messages == expect_messages
 
 
+def test_incremental_checksums(caplog: pytest.LogCaptureFixture) -> None:
+    checksums = IncrementalChecksums([wrong("sha512"), unknown, correct("sha256")])
+    for i in range(0, len(FILE_CONTENT), 5):
+        checksums.update(FILE_CONTENT[i : i + 5].encode())
+    caplog.set_level("DEBUG")
+
+    checksums.must_match_any("spells.txt")
+
+    assert caplog.messages == [
+        "Verifying checksums of spells.txt",
+        f"spells.txt: sha256 checksum matches: {SHA256}",
+    ]
+
+
+def test_incremental_checksums_failure(caplog: pytest.LogCaptureFixture) -> None:
+    checksums = IncrementalChecksums([wrong("md5"), unknown])
+    checksums.update(FILE_CONTENT.encode())
+    caplog.set_level("WARNING")
+
+    with pytest.raises(PackageRejected, match="Failed to verify spells.txt"):
+        checksums.must_match_any("spells.txt")
+
+    assert caplog.messages == [
+        f"spells.txt: md5 checksum does not match (got: {MD5})",
+        f"spells.txt: sha0 checksum not supported (supported: {SUPPORTED_ALG_STR})",
+    ]
+
+
 @pytest.mark.parametrize(
     "checksum, algorithm, expected",
     [
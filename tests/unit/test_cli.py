@@ -1030,3 +1030,52 @@ class TestMergeSboms:
                 ["merge-sboms", "-o", fp.name, "--sbom-output-type", "spdx", *sbom_files_to_merge],
             )
             assert Path(fp.name).lstat().st_size > 0, "SBOM failed to be written to output file!"
+
+
+class TestCache:
+    @pytest.fixture
+    def cache_home(self, tmp_path: Path) -> Iterator[Path]:
+        with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": str(tmp_path)}):
+            yield tmp_path / APP_NAME / "artifacts"
+
+    def populate(self, cache_home: Path, n_artifacts: int) -> None:
+        for i in range(n_artifacts):
+            entry = cache_home / "sha256" / "aa" / f"aa{i}"
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            entry.write_text("0123456789")
+            os.utime(entry, (i, i))
+
+    def test_stats(self, cache_home: Path) -> None:
+        self.populate(cache_home, 3)
+
+        result = invoke_expecting_sucess(app, ["cache", "stats"])
+
+        assert result.output == "Artifacts: 3\nSize: 30 bytes\n"
+
+    def test_prune(self, cache_home: Path) -> None:
+        self.populate(cache_home, 3)
+
+        result = invoke_expecting_sucess(app, ["cache", "prune", "--max-size", "15"])
+
+        assert result.output == "Evicted artifacts: 2\nFreed: 20 bytes\n"
+        assert [p.name for p in cache_home.rglob("aa*") if p.is_file()] == ["aa2"]
+
+    def test_prune_to_configured_size(self, cache_home: Path) -> None:
+        self.populate(cache_home, 3)
+
+        with mock.patch("hermeto.core.config.get_config") as mock_get_config:
+            mock_get_config.return_value.artifact_cache_max_size = 0
+            result = invoke_expecting_sucess(app, ["cache", "prune"])
+
+        assert result.output == "Evicted artifacts: 3\nFreed: 30 bytes\n"
+
+    def test_fetch_deps_prunes_enabled_cache(self, cache_home: Path, tmp_cwd: Path) -> None:
+        self.populate(cache_home, 3)
+        tmp_cwd.joinpath("config.yaml").write_text(
+            "artifact_cache_enabled: true\nartifact_cache_max_size: 10"
+        )
+
+        with mock_fetch_deps():
+            invoke_expecting_sucess(app, ["--config-file", "config.yaml", "fetch-deps", "pip"])
+
+        assert [p.name for p in cache_home.rglob("aa*") if p.is_file()] == ["aa2"]
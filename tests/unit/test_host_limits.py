@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Optional
+from unittest import mock
+
+import pytest
+
+from hermeto.core.config import Config
+from hermeto.core.host_limits import HostLimits
+
+
+async def run_downloads(limits: HostLimits, hosts: list[str]) -> Counter[str]:
+    running: Counter[str] = Counter()
+    max_running: Counter[str] = Counter()
+
+    async def download(host: str) -> None:
+        async with limits.acquire(host):
+            running[host] += 1
+            max_running[host] = max(max_running[host], running[host])
+            await asyncio.sleep(0.01)
+            running[host] -= 1
+            limits.record_download(host, 1024)
+
+    await asyncio.gather(*(download(host) for host in hosts))
+    return max_running
+
+
+@pytest.mark.asyncio
+async def test_per_host_limits() -> None:
+    limits = HostLimits(default_limit=3, per_host={"registry.npmjs.org": 1})
+
+    max_running = await run_downloads(limits, ["registry.npmjs.org", "example.org"] * 10)
+
+    assert max_running == {"registry.npmjs.org": 1, "example.org": 3}
+    stats = limits.stats()
+    assert stats["example.org"].files == 10
+    assert stats["example.org"].bytes == 10 * 1024
+    assert stats["example.org"].max_concurrency == 3
+    assert stats["example.org"].throughput > 0
+
+
+@mock.patch("hermeto.core.host_limits.get_config")
+def test_from_config(mock_get_config: mock.Mock) -> None:
+    mock_get_config.return_value = Config(
+        concurrency_limit=10,
+        download_concurrency_limits={"artifactory.example.com": 64},
+        adaptive_download_concurrency=True,
+    )
+    limits = HostLimits.from_config()
+
+    assert limits.default_limit == 10
+    assert limits.per_host == {"artifactory.example.com": 64}
+    assert limits.adaptive
+
+
+@pytest.mark.asyncio
+async def test_adaptive_slow_start_and_additive_increase() -> None:
+    limits = HostLimits(default_limit=16, adaptive=True)
+    assert limits.limit("example.org") == 2
+
+    # +1 per response until the first congestion
+    for expect_limit in range(3, 17):
+        await limits.on_response("example.org", 200, started=0, latency=0.1)
+        assert limits.limit("example.org") == expect_limit
+    # never more than the configured limit
+    await limits.on_response("example.org", 200, started=0, latency=0.1)
+    assert limits.limit("example.org") == 16
+
+    await limits.on_response("example.org", 429, started=float("inf"), latency=0.1)
+    assert limits.limit("example.org") == 8
+    # after the congestion, about +1 per round of (8) responses
+    for _ in range(9):
+        await limits.on_response("example.org", 200, started=0, latency=0.1)
+    assert limits.limit("example.org") == 9
+
+
+@pytest.mark.parametrize(
+    "status, latency",
+    [
+        pytest.param(429, 0.1, id="too_many_requests"),
+        pytest.param(503, 0.1, id="service_unavailable"),
+        pytest.param(None, 0.1, id="no_response"),
+        pytest.param(200, 5.0, id="slow_response"),
+    ],
+)
+@pytest.mark.asyncio
+async def test_adaptive_decrease(status: Optional[int], latency: float) -> None:
+    limits = HostLimits(default_limit=8, per_host={"example.org": 64}, adaptive=True)
+    for _ in range(30):
+        await limits.on_response("example.org", 200, started=0, latency=0.1)
+    assert limits.limit("example.org") == 32
+
+    with mock.patch("hermeto.core.host_limits.time.monotonic", return_value=100):
+        await limits.on_response("example.org", status, started=50, latency=latency)
+    assert limits.limit("example.org") == 16
+
+    # requests that started before the decrease don't decrease the limit again
+    await limits.on_response("example.org", status, started=99, latency=latency)
+    assert limits.limit("example.org") == 16
+    await limits.on_response("example.org", status, started=101, latency=latency)
+    assert limits.limit("example.org") == 8
+
+
+@pytest.mark.asyncio
+async def test_not_adaptive_only_counts_throttling() -> None:
+    limits = HostLimits(default_limit=4)
+    await limits.on_response("example.org", 429, started=0, latency=0.1)
+
+    assert limits.limit("example.org") == 4
+    assert limits.stats()["example.org"].throttled == 1
+
+
+@pytest.mark.asyncio
+async def test_log_stats(caplog: pytest.LogCaptureFixture) -> None:
+    limits = HostLimits(default_limit=2)
+    await run_downloads(limits, ["example.org"] * 4)
+    # a host without any completed downloads isn't worth mentioning
+    await limits.on_response("failing.example.org", None, started=0, latency=0.1)
+
+    with caplog.at_level(logging.INFO):
+        limits.log_stats()
+
+    assert len(caplog.messages) == 1
+    assert caplog.messages[0].startswith("Downloaded 4 files (0.0 MiB) from example.org in ")
+    assert caplog.messages[0].endswith("up to 2 concurrent downloads, throttled 0 times")
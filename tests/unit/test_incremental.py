@@ -0,0 +1,256 @@
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+import git
+import pytest
+
+from hermeto.core.incremental import FetchManifest
+from hermeto.core.models.input import Request
+from hermeto.core.models.output import BuildConfig, ProjectFile, RequestOutput
+from hermeto.core.models.sbom import Component
+
+NPM_OUTPUT = RequestOutput.from_obj_list(
+    components=[Component(name="foo", version="1.0.0", purl="pkg:npm/foo@1.0.0")]
+)
+
+
+@pytest.fixture
+def source_dir(tmp_path: Path) -> Path:
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    source_dir.joinpath("package.json").write_text("{}")
+    source_dir.joinpath("package-lock.json").write_text('{"lockfileVersion": 3}')
+    source_dir.joinpath("README.md").write_text("hello")
+    repo = git.Repo.init(source_dir)
+    repo.create_remote("origin", "https://github.com/org/repo.git")
+    commit(repo, "Initial commit")
+    return source_dir
+
+
+def commit(repo: git.Repo, message: str) -> str:
+    repo.git.add("--all")
+    author = git.Actor("Test", "test@example.org")
+    return repo.index.commit(message, author=author, committer=author).hexsha
+
+
+@pytest.fixture
+def output_dir(tmp_path: Path) -> Path:
+    output_dir = tmp_path / "output"
+    output_dir.joinpath("deps", "npm").mkdir(parents=True)
+    output_dir.joinpath("deps", "npm", "foo-1.0.0.tgz").write_text("foo tarball")
+    return output_dir
+
+
+def make_request(source_dir: Path, output_dir: Path) -> Request:
+    return Request(source_dir=source_dir, output_dir=output_dir, packages=[{"type": "npm"}])
+
+
+def test_reuse_unchanged_output(source_dir: Path, output_dir: Path) -> None:
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", NPM_OUTPUT, source_dir)
+
+    assert FetchManifest(make_request(source_dir, output_dir)).load_output("npm") == NPM_OUTPUT
+    assert output_dir.joinpath("deps", "npm", "foo-1.0.0.tgz").exists()
+
+
+def test_unrelated_uncommitted_change_keeps_output(source_dir: Path, output_dir: Path) -> None:
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", NPM_OUTPUT, source_dir)
+    source_dir.joinpath("README.md").write_text("hello world")
+
+    assert FetchManifest(make_request(source_dir, output_dir)).load_output("npm") == NPM_OUTPUT
+
+
+def test_new_commit_invalidates_output(source_dir: Path, output_dir: Path) -> None:
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", NPM_OUTPUT, source_dir)
+    source_dir.joinpath("README.md").write_text("hello world")
+    # the SBOM of the main package refers to the commit, even if the lockfiles didn't change
+    commit(git.Repo(source_dir), "Update README")
+
+    assert FetchManifest(make_request(source_dir, output_dir)).load_output("npm") is None
+
+
+def test_changed_origin_invalidates_output(source_dir: Path, output_dir: Path) -> None:
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", NPM_OUTPUT, source_dir)
+    git.Repo(source_dir).remote("origin").set_url("https://github.com/fork/repo.git")
+
+    assert FetchManifest(make_request(source_dir, output_dir)).load_output("npm") is None
+
+
+@pytest.mark.parametrize("skip_tag_fetch", [True, False])
+@mock.patch("hermeto.core.incremental.get_config")
+def test_gomod_output_depends_on_tags(
+    mock_get_config: mock.Mock, skip_tag_fetch: bool, source_dir: Path, output_dir: Path
+) -> None:
+    mock_get_config.return_value.gomod_skip_tag_fetch = skip_tag_fetch
+    mock_get_config.return_value.model_dump.return_value = {}
+    source_dir.joinpath("go.mod").write_text("module github.com/org/repo")
+    repo = git.Repo(source_dir)
+    repo.create_tag("v1.0.0")
+
+    def make_gomod_request() -> Request:
+        packages = [{"type": "gomod"}]
+        return Request(source_dir=source_dir, output_dir=output_dir, packages=packages)
+
+    FetchManifest(make_gomod_request()).save_output("gomod", RequestOutput.empty(), source_dir)
+    reused = FetchManifest(make_gomod_request()).load_output("gomod")
+    # the tags fetched from the remote may change the versions of the modules at any time
+    assert (reused is not None) is skip_tag_fetch
+
+    # a new tag changes the version of the main module
+    FetchManifest(make_gomod_request()).save_output("gomod", RequestOutput.empty(), source_dir)
+    repo.create_tag("v1.0.1")
+    assert FetchManifest(make_gomod_request()).load_output("gomod") is None
+
+
+@pytest.mark.parametrize(
+    "change",
+    [
+        pytest.param(
+            lambda source_dir, output_dir: source_dir.joinpath("package-lock.json").write_text(
+                "{}"
+            ),
+            id="lockfile_changed",
+        ),
+        pytest.param(
+            lambda source_dir, output_dir: output_dir.joinpath(
+                "deps", "npm", "foo-1.0.0.tgz"
+            ).write_text("tampered"),
+            id="download_modified",
+        ),
+        pytest.param(
+            lambda source_dir, output_dir: output_dir.joinpath(
+                "deps", "npm", "foo-1.0.0.tgz"
+            ).unlink(),
+            id="download_removed",
+        ),
+    ],
+)
+def test_changed_inputs_or_downloads(source_dir: Path, output_dir: Path, change: Any) -> None:
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", NPM_OUTPUT, source_dir)
+    change(source_dir, output_dir)
+
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    assert manifest.load_output("npm") is None
+    # the stale downloads and fragment make room for a fresh run
+    assert not output_dir.joinpath("deps", "npm").exists()
+    assert not manifest._fragment_path("npm").exists()
+
+
+@mock.patch("hermeto.core.incremental.get_config")
+def test_changed_config(mock_get_config: mock.Mock, source_dir: Path, output_dir: Path) -> None:
+    mock_get_config.return_value.model_dump.return_value = {"concurrency_limit": 5}
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", NPM_OUTPUT, source_dir)
+
+    mock_get_config.return_value.model_dump.return_value = {"concurrency_limit": 10}
+    assert FetchManifest(make_request(source_dir, output_dir)).load_output("npm") is None
+
+
+def test_explicit_lockfile_is_an_input(tmp_path: Path, output_dir: Path) -> None:
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    lockfile = tmp_path / "my-artifacts.lock.yaml"
+    lockfile.write_text("metadata: {version: '1.0'}")
+
+    def make_generic_request() -> Request:
+        packages = [{"type": "generic", "lockfile": str(lockfile)}]
+        return Request(source_dir=source_dir, output_dir=output_dir, packages=packages)
+
+    manifest = FetchManifest(make_generic_request())
+    manifest.save_output("generic", RequestOutput.empty(), source_dir)
+    assert FetchManifest(make_generic_request()).load_output("generic") == RequestOutput.empty()
+
+    lockfile.write_text("metadata: {version: '2.0'}")
+    assert FetchManifest(make_generic_request()).load_output("generic") is None
+
+
+def test_project_files_are_relative_to_source_dir(
+    source_dir: Path, output_dir: Path, tmp_path: Path
+) -> None:
+    work_copy = tmp_path / "copy"
+    output = RequestOutput(
+        components=[],
+        build_config=BuildConfig(
+            project_files=[
+                ProjectFile(abspath=work_copy / ".npmrc", template="foo"),
+                ProjectFile(abspath=output_dir / "some-file", template="bar"),
+            ]
+        ),
+    )
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", output, work_copy)
+
+    reused = FetchManifest(make_request(source_dir, output_dir)).load_output("npm")
+    assert reused is not None
+    assert [f.abspath for f in reused.build_config.project_files] == [
+        source_dir / ".npmrc",
+        output_dir / "some-file",
+    ]
+
+
+def test_prune(source_dir: Path, output_dir: Path) -> None:
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", NPM_OUTPUT, source_dir)
+    output_dir.joinpath("deps", "pip").mkdir()
+
+    manifest.prune(["npm"])
+    assert output_dir.joinpath("deps", "npm").exists()
+    assert not output_dir.joinpath("deps", "pip").exists()
+
+    manifest.prune(["pip"])
+    assert not output_dir.joinpath("deps", "npm").exists()
+    assert not manifest._fragment_path("npm").exists()
+
+
+def test_prune_keeps_shared_dirs(source_dir: Path, output_dir: Path) -> None:
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    for deps_dir in ("deps/pip", "deps/cargo", ".cargo"):
+        output_dir.joinpath(deps_dir).mkdir(parents=True)
+
+    # deps/cargo is written by both pip and cargo
+    manifest.prune(["cargo"])
+    assert not output_dir.joinpath("deps", "pip").exists()
+    assert not output_dir.joinpath(".cargo").exists()
+    assert output_dir.joinpath("deps", "cargo").exists()
+
+
+def test_shared_dirs_are_not_reused(source_dir: Path, output_dir: Path) -> None:
+    source_dir.joinpath("Cargo.toml").write_text("")
+    source_dir.joinpath("requirements.txt").write_text("")
+    request = Request(
+        source_dir=source_dir,
+        output_dir=output_dir,
+        packages=[{"type": "cargo"}, {"type": "pip"}],
+    )
+    stale_crate = output_dir.joinpath("deps", "cargo", "foo-1.0.0", "Cargo.toml")
+    stale_crate.parent.mkdir(parents=True)
+    stale_crate.write_text("")
+
+    manifest = FetchManifest(request)
+    manifest.save_output("cargo", RequestOutput.empty(), source_dir)
+    manifest.save_output("pip", RequestOutput.empty(), source_dir)
+
+    manifest = FetchManifest(request)
+    assert manifest.load_output("cargo") is None
+    # the shared directory is cleared before the first of its package managers runs
+    assert not stale_crate.parent.exists()
+
+    # but not again before the second one, which would remove the files of the first one
+    new_crate = output_dir.joinpath("deps", "cargo", "bar-1.0.0", "Cargo.toml")
+    new_crate.parent.mkdir(parents=True)
+    new_crate.write_text("")
+    assert manifest.load_output("pip") is None
+    assert new_crate.exists()
+
+
+def test_malformed_fragment_is_ignored(source_dir: Path, output_dir: Path) -> None:
+    manifest = FetchManifest(make_request(source_dir, output_dir))
+    manifest.save_output("npm", NPM_OUTPUT, source_dir)
+    manifest._fragment_path("npm").write_text("{}")
+
+    assert FetchManifest(make_request(source_dir, output_dir)).load_output("npm") is None
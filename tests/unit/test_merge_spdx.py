@@ -287,6 +287,35 @@ def test_merging_spdx_on_self_does_not_modify_the_sbom(
     _assert_sbom_is_well_formed(merged_sbom)
 
 
+@pytest.mark.parametrize(
+    "sboms_to_merge",
+    [
+        pytest.param(
+            (
+                "./tests/unit/data/alpine.pretty.json",
+                "./tests/unit/data/something.simple0.100.0.spdx.pretty.json",
+                "./tests/unit/data/something.more.simple.0.100.0.spdx.pretty.json",
+                "./tests/unit/data/something.simple0.100.0.spdx.pretty.json",
+            ),
+            id="three unique SBOMs and a duplicate",
+        ),
+    ],
+)
+def test_merging_all_spdx_sboms_at_once_matches_merging_them_one_by_one(
+    sboms_to_merge: list[Any],  # 'Any' is used to prevent mypy from having a fit over re-binding
+) -> None:
+    sboms_to_merge = [SPDXSbom.from_file(Path(s)) for s in sboms_to_merge]
+
+    merged_sbom = sboms_to_merge[0].merge_all(sboms_to_merge[1:])
+    expected_sbom = reduce(add, sboms_to_merge)
+
+    assert merged_sbom.packages == expected_sbom.packages
+    assert set(merged_sbom.relationships) == set(expected_sbom.relationships)
+    _assert_no_relationship_is_duplicated(merged_sbom)
+    _assert_root_was_inherited_from_left_sbom(merged_sbom, sboms_to_merge[0])
+    _assert_sbom_is_well_formed(merged_sbom)
+
+
 def _same_relationship_order(sbom1: SPDXSbom, sbom2: SPDXSbom) -> bool:
     for r1, r2 in zip(sbom1.relationships, sbom2.relationships):
         if r1 != r2:
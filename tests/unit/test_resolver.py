@@ -1,10 +1,13 @@
 import re
+import threading
+import time
 from pathlib import Path
 from unittest import mock
 
 import pytest
 
 from hermeto.core import resolver
+from hermeto.core.config import Config
 from hermeto.core.errors import UnsupportedFeature
 from hermeto.core.models.input import Request
 from hermeto.core.models.output import BuildConfig, EnvironmentVariable, ProjectFile, RequestOutput
@@ -129,6 +132,27 @@ def test_source_dir_copy(
     assert request.source_dir == RootedPath(tmp_path)
 
 
+@mock.patch("hermeto.core.resolver.copy_directory")
+@mock.patch("hermeto.core.resolver._resolve_packages")
+def test_no_source_dir_copy_for_read_only_package_managers(
+    mock_resolve_packages: mock.Mock,
+    mock_copy_directory: mock.Mock,
+    tmp_path: Path,
+) -> None:
+    request = Request(
+        source_dir=tmp_path,
+        output_dir=tmp_path,
+        packages=[{"type": "pip"}, {"type": "npm"}, {"type": "generic"}],
+    )
+    mock_resolve_packages.return_value = RequestOutput.empty()
+
+    resolver.resolve_packages(request)
+
+    mock_copy_directory.assert_not_called()
+    mock_resolve_packages.assert_called_once_with(request)
+    assert request.source_dir == RootedPath(tmp_path)
+
+
 @pytest.mark.parametrize(
     "with_path_replacement",
     (
@@ -242,3 +266,113 @@ def test_resolve_with_released_and_dev_package_managers(tmp_path: Path) -> None:
 
         mock_resolve_gomod.assert_has_calls([mock.call(request)])
         mock_resolve_pip.assert_has_calls([mock.call(request)])
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+@mock.patch("hermeto.core.resolver.get_config")
+def test_resolve_packages_in_parallel(
+    mock_get_config: mock.Mock,
+    parallel: bool,
+    tmp_path: Path,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    mock_get_config.return_value.parallel_package_managers = parallel
+    running: set[str] = set()
+    overlapping = threading.Event()
+
+    def make_handler(name: str, output: RequestOutput) -> mock.Mock:
+        def handler(request: Request) -> RequestOutput:
+            running.add(name)
+            if len(running) > 1:
+                overlapping.set()
+            # give the other handlers a chance to start
+            overlapping.wait(timeout=0.1)
+            running.discard(name)
+            return output
+
+        return mock.Mock(side_effect=handler)
+
+    with mock.patch.dict(
+        resolver._package_managers,
+        values={
+            "pip": make_handler("pip", PIP_OUTPUT),
+            "npm": make_handler("npm", NPM_OUTPUT),
+            "gomod": make_handler("gomod", GOMOD_OUTPUT),
+        },
+        clear=True,
+    ):
+        request = mock.Mock()
+        request.flags = []
+        request.packages = [mock.Mock(type=type_) for type_ in ("pip", "npm", "gomod")]
+
+        # outputs are merged in the same order regardless of which handler finishes first
+        assert resolver._resolve_packages(request) == COMBINED_OUTPUT
+
+    assert overlapping.is_set() is parallel
+    for type_ in ("gomod", "npm", "pip"):
+        assert re.search(rf"Package manager {type_} finished in \d+\.\d\ds", caplog.text)
+
+
+@mock.patch("hermeto.core.resolver.get_config")
+def test_resolve_conflicting_packages_in_parallel(mock_get_config: mock.Mock) -> None:
+    mock_get_config.return_value.parallel_package_managers = True
+    running: set[str] = set()
+    overlaps: list[set[str]] = []
+
+    def make_handler(name: str) -> mock.Mock:
+        def handler(request: Request) -> RequestOutput:
+            running.add(name)
+            time.sleep(0.05)
+            overlaps.append(set(running))
+            running.discard(name)
+            return RequestOutput.empty()
+
+        return mock.Mock(side_effect=handler)
+
+    with mock.patch.dict(
+        resolver._package_managers,
+        values={type_: make_handler(type_) for type_ in ("cargo", "npm", "pip")},
+        clear=True,
+    ):
+        request = mock.Mock()
+        request.flags = []
+        request.packages = [mock.Mock(type=type_) for type_ in ("cargo", "npm", "pip")]
+        resolver._resolve_packages(request)
+
+    # npm runs alongside the others, but pip and cargo share deps/cargo
+    assert any(
+        "npm" in running_together and len(running_together) > 1 for running_together in overlaps
+    )
+    assert not any({"cargo", "pip"} <= running_together for running_together in overlaps)
+
+
+@mock.patch("hermeto.core.config.config", new=Config(incremental_fetch=True))
+def test_resolve_packages_incrementally(tmp_path: Path) -> None:
+    source_dir = tmp_path / "source"
+    source_dir.mkdir()
+    requirements = source_dir / "requirements.txt"
+    requirements.write_text("spam==1.0.0")
+
+    pip_handler = mock.Mock(return_value=RequestOutput.from_obj_list(PIP_OUTPUT.components))
+    npm_handler = mock.Mock(return_value=RequestOutput.from_obj_list(NPM_OUTPUT.components))
+
+    def resolve() -> RequestOutput:
+        request = Request(
+            source_dir=source_dir,
+            output_dir=tmp_path / "output",
+            packages=[{"type": "pip"}, {"type": "npm"}],
+        )
+        with mock.patch.dict(
+            resolver._package_managers, values={"pip": pip_handler, "npm": npm_handler}
+        ):
+            return resolver._resolve_packages(request)
+
+    first_output = resolve()
+    assert resolve() == first_output
+    assert pip_handler.call_count == 1
+    assert npm_handler.call_count == 1
+
+    requirements.write_text("spam==2.0.0")
+    assert resolve() == first_output
+    assert pip_handler.call_count == 2
+    assert npm_handler.call_count == 1
@@ -1,6 +1,8 @@
 import errno
 import io
+import json
 import subprocess
+import time
 from pathlib import Path
 from typing import Optional
 from unittest import mock
@@ -14,7 +16,10 @@ from hermeto.core.utils import (
     _FastCopyFailedFallback,
     copy_directory,
     get_cache_dir,
+    iter_json_stream,
+    link_or_copy_file,
     run_cmd,
+    stream_cmd,
 )
 
 
@@ -91,6 +96,63 @@ def test_run_cmd_executable_not_found(
         run_cmd(["foo"], params={})
 
 
+def test_stream_cmd_yields_output_while_running(tmp_path: Path) -> None:
+    # the command waits for the file, which is only created after the first chunk was received
+    flag = tmp_path / "flag"
+    script = f"echo first; while [ ! -e {flag} ]; do sleep 0.01; done; echo second"
+    chunks = stream_cmd(["sh", "-c", script], {})
+
+    assert next(chunks) == "first\n"
+    flag.touch()
+    assert "".join(chunks) == "second\n"
+
+
+def test_stream_cmd_logs_stderr_on_failure(caplog: pytest.LogCaptureFixture) -> None:
+    with pytest.raises(subprocess.CalledProcessError):
+        list(stream_cmd(["sh", "-c", "echo out; echo failed >&2; exit 1"], {}))
+
+    assert caplog.messages == [
+        'The command "sh -c echo out; echo failed >&2; exit 1" failed',
+        "STDERR:\nfailed",
+    ]
+
+
+def test_stream_cmd_timeout() -> None:
+    with pytest.raises(subprocess.TimeoutExpired):
+        list(stream_cmd(["sleep", "10"], {"timeout": 0.1}))
+
+
+def test_stream_cmd_stopped_early() -> None:
+    start = time.monotonic()
+    chunks = stream_cmd(["sh", "-c", "echo first; exec sleep 10"], {})
+
+    assert next(chunks) == "first\n"
+    chunks.close()
+    # the command got killed instead of waited for
+    assert time.monotonic() - start < 5
+
+
+def test_stream_cmd_decodes_split_characters() -> None:
+    # a single character of two bytes, written in two parts
+    chunks = stream_cmd(["sh", "-c", "printf '\\303'; sleep 0.1; printf '\\251'"], {})
+
+    assert "".join(chunks) == "\u00e9"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000])
+def test_iter_json_stream(chunk_size: int) -> None:
+    objects = [{"a": [1, 2, {"b": "} {"}]}, {}, "string", 42, [None]]
+    stream = "\n".join(json.dumps(obj) for obj in objects) + "\n  \n"
+    chunks = (stream[i : i + chunk_size] for i in range(0, len(stream), chunk_size))
+
+    assert list(iter_json_stream(chunks)) == objects
+
+
+def test_iter_json_stream_invalid() -> None:
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_stream(['{"a": 1} {"b":', " }"]))
+
+
 @mock.patch("hermeto.core.utils._get_blocksize")
 def test_fast_copy(mock_blocksize: mock.Mock, tmp_path: Path) -> None:
     mock_blocksize.return_value = 4
@@ -183,6 +245,38 @@ def test_copy_directory(
     mock_shutil_copy2.assert_called_once()
 
 
+def test_link_or_copy_file(tmp_path: Path) -> None:
+    origin = tmp_path.joinpath("origin")
+    origin.write_text("foo")
+    destination = tmp_path.joinpath("destination")
+
+    link_or_copy_file(origin, destination)
+
+    assert destination.read_text() == "foo"
+    assert destination.samefile(origin)
+
+
+@mock.patch("os.link")
+def test_link_or_copy_file_across_file_systems(mock_link: mock.Mock, tmp_path: Path) -> None:
+    mock_link.side_effect = OSError(errno.EXDEV, "Invalid cross-device link")
+    origin = tmp_path.joinpath("origin")
+    origin.write_text("foo")
+    destination = tmp_path.joinpath("destination")
+
+    link_or_copy_file(origin, destination)
+
+    assert destination.read_text() == "foo"
+    assert not destination.samefile(origin)
+
+
+@mock.patch("os.link")
+def test_link_or_copy_file_unexpected_error(mock_link: mock.Mock, tmp_path: Path) -> None:
+    mock_link.side_effect = OSError(errno.EACCES, "Permission denied")
+
+    with pytest.raises(OSError, match="Permission denied"):
+        link_or_copy_file(tmp_path.joinpath("origin"), tmp_path.joinpath("destination"))
+
+
 @pytest.mark.parametrize("environ", [{"XDG_CACHE_HOME": "/tmp/xdg_home/"}, {}])
 @mock.patch("pathlib.Path.home")
 @mock.patch("os.environ")